@@ -11,14 +11,23 @@ Este script genera:
 
 import pandas as pd
 import numpy as np
+import io
+import time
 from datetime import datetime, timedelta
 import random
 from faker import Faker
 import psycopg2
 from psycopg2.extras import execute_batch
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from dotenv import load_dotenv
 from tqdm import tqdm
+from almacenamiento_parquet import (
+    guardar_parquet, guardar_transacciones_parquet,
+    RUTA_USUARIOS_PARQUET, RUTA_METRICAS_PARQUET
+)
+from sketch_cuantiles import sketches_por_grupo, sketches_desde_histograma
+from instrumentacion import conectar, crear_pool
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -27,13 +36,15 @@ load_dotenv()
 
 # Inicializar Faker
 fake = Faker('es_AR')  # Español Argentina
-Faker.seed(42)
-np.random.seed(42)
-random.seed(42)
+SEED = 42
+Faker.seed(SEED)
+np.random.seed(SEED)
+random.seed(SEED)
 
 # Configuración
 NUM_USUARIOS = 10000
 NUM_TRANSACCIONES = 100000
+CHUNK_SIZE = 250000  # filas por chunk en modo streaming
 FECHA_INICIO = datetime(2024, 7, 1)
 FECHA_FIN = datetime(2024, 12, 31)
 
@@ -132,212 +143,247 @@ def generar_usuarios(n=NUM_USUARIOS):
 # GENERACIÓN DE TRANSACCIONES
 # ============================================
 
-def generar_transacciones(df_usuarios, n=NUM_TRANSACCIONES):
+# Parámetros de generación de transacciones
+TIPOS_OPERACION = ['compra', 'venta', 'swap', 'retiro']
+PROB_OPERACION = [0.45, 0.35, 0.15, 0.05]
+
+CRIPTOS = ['BTC', 'ETH', 'USDT', 'USDC', 'BNB', 'ADA', 'SOL']
+PROB_CRIPTOS = [0.30, 0.25, 0.20, 0.15, 0.05, 0.03, 0.02]
+
+METODOS_PAGO = ['transferencia', 'tarjeta', 'wallet_crypto']
+PROB_METODOS = [0.50, 0.35, 0.15]
+
+NETWORKS = ['Bitcoin', 'Ethereum', 'Binance Smart Chain', 'Polygon', 'Tron']
+NETWORKS_STABLECOIN = ['Ethereum', 'Polygon', 'Binance Smart Chain']
+
+# Precios aproximados en USD (para simulación)
+PRECIOS_CRIPTO = {
+    'BTC': 45000,
+    'ETH': 2500,
+    'USDT': 1,
+    'USDC': 1,
+    'BNB': 350,
+    'ADA': 0.5,
+    'SOL': 100
+}
+
+# Rango de montos (USD) según nivel de verificación
+RANGOS_MONTO = {
+    'basico': (10, 1000),
+    'intermedio': (100, 5000),
+    'completo': (500, 20000)
+}
+
+MOTIVOS_FALLO = [
+    'Fondos insuficientes',
+    'Límite diario excedido',
+    'Validación de identidad fallida',
+    'Timeout de la red blockchain',
+    'Error en validación antifraude',
+    'Método de pago rechazado'
+]
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X)',
+    'Mozilla/5.0 (Android 11; Mobile)',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)'
+]
+
+DISPOSITIVOS = ['Desktop', 'Mobile Android', 'Mobile iOS', 'Tablet']
+
+# Tablas de lookup para construir hashes e IPs sin iterar fila por fila
+_HEX_BYTE = np.array([f'{i:02x}' for i in range(256)], dtype='S2')
+_OCTETOS = np.array([str(i) for i in range(256)], dtype=object)
+
+def _elegir(rng, valores, n, p=None):
+    """Elige n valores (array object) con probabilidades p"""
+    return np.array(valores, dtype=object)[rng.choice(len(valores), size=n, p=p)]
+
+def _hashes_sha256(rng, n):
+    """Genera n hashes hexadecimales de 64 caracteres (formato sha256)"""
+    bytes_aleatorios = rng.integers(0, 256, size=(n, 32), dtype=np.uint8)
+    return _HEX_BYTE[bytes_aleatorios].view('S64').ravel().astype(str).astype(object)
+
+def _direcciones_ipv4(rng, n):
+    """Genera n direcciones IPv4 como strings"""
+    octetos = _OCTETOS[rng.integers(0, 256, size=(n, 4))]
+    return octetos[:, 0] + '.' + octetos[:, 1] + '.' + octetos[:, 2] + '.' + octetos[:, 3]
+
+def _generar_bloque_transacciones(rng, usuarios_activos, id_inicio, n):
+    """
+    Genera n transacciones como arrays NumPy (sin bucles por fila)
+
+    usuarios_activos: DataFrame con user_id, nivel_verificacion y fecha_registro
+    de las cuentas activas. Los atributos del usuario se obtienen por posición,
+    sin escanear el DataFrame de usuarios por cada transacción.
+    """
+    # Seleccionar usuario y traer sus atributos por índice posicional
+    pos_usuario = rng.integers(0, len(usuarios_activos), size=n)
+    user_id = usuarios_activos['user_id'].to_numpy()[pos_usuario]
+    nivel = usuarios_activos['nivel_verificacion'].to_numpy()[pos_usuario]
+    fecha_registro = usuarios_activos['fecha_registro'].to_numpy(dtype='datetime64[s]')[pos_usuario]
+
+    # Fecha y hora de la transacción
+    # Más transacciones en horario 18-23hs
+    dias_desde_inicio = rng.integers(0, (FECHA_FIN - FECHA_INICIO).days + 1, size=n)
+    fecha_base = np.datetime64(FECHA_INICIO, 's') + dias_desde_inicio.astype('timedelta64[D]')
+
+    # Asegurarse que la transacción es después del registro del usuario
+    antes_registro = fecha_base < fecha_registro
+    fecha_base[antes_registro] = (
+        fecha_registro[antes_registro]
+        + rng.integers(0, 31, size=antes_registro.sum()).astype('timedelta64[D]')
+    )
+    fecha_base = fecha_base.astype('datetime64[D]').astype('datetime64[s]')
+
+    # Distribución de horas (60% en horario pico)
+    en_pico = rng.random(n) < 0.6
+    hora = np.where(en_pico, rng.integers(18, 24, size=n), rng.integers(0, 24, size=n))
+
+    timestamp_inicio = (
+        fecha_base
+        + hora.astype('timedelta64[h]')
+        + rng.integers(0, 60, size=n).astype('timedelta64[m]')
+        + rng.integers(0, 60, size=n).astype('timedelta64[s]')
+    )
+
+    # Tipo de operación y cripto
+    tipo_operacion = _elegir(rng, TIPOS_OPERACION, n, PROB_OPERACION)
+    idx_cripto = rng.choice(len(CRIPTOS), size=n, p=PROB_CRIPTOS)
+    cripto = np.array(CRIPTOS, dtype=object)[idx_cripto]
+
+    # Monto según nivel de verificación
+    monto_min = np.select([nivel == k for k in RANGOS_MONTO], [v[0] for v in RANGOS_MONTO.values()])
+    monto_max = np.select([nivel == k for k in RANGOS_MONTO], [v[1] for v in RANGOS_MONTO.values()])
+    monto_usd = np.round(rng.uniform(monto_min, monto_max), 2)
+
+    # Calcular cantidad de cripto (variación ±2% del precio)
+    precios = np.array([PRECIOS_CRIPTO[c] for c in CRIPTOS], dtype=float)
+    precio_unitario = precios[idx_cripto] * rng.uniform(0.98, 1.02, size=n)
+    cantidad_cripto = monto_usd / precio_unitario
+
+    # Comisión (0.5%)
+    comision_usd = np.round(monto_usd * 0.005, 2)
+    monto_total_usd = monto_usd + comision_usd
+
+    # Tiempo de procesamiento
+    # Horario pico: más lento. Montos altos: requieren validación, más lentos
+    es_hora_pico = (hora >= 18) & (hora <= 23)
+    requiere_validacion = monto_usd > 5000
+
+    tiempo_base = np.where(es_hora_pico, rng.integers(60, 151, size=n), rng.integers(20, 61, size=n))
+    tiempo_base = tiempo_base + np.where(requiere_validacion, rng.integers(30, 121, size=n), 0)
+
+    # Añadir variabilidad (int() trunca hacia cero, igual que np.trunc)
+    tiempo_procesamiento = np.maximum(10, np.trunc(rng.normal(tiempo_base, 20)).astype(np.int64))
+    timestamp_completado = timestamp_inicio + tiempo_procesamiento.astype('timedelta64[s]')
+
+    # Estado de la transacción
+    # Mayor tasa de error en hora pico y transacciones grandes
+    tasa_error = 0.05 + 0.10 * es_hora_pico + 0.05 * requiere_validacion
+    fallida = rng.random(n) < tasa_error
+    n_fallidas = int(fallida.sum())
+
+    estado = np.where(fallida, 'fallida', 'exitosa').astype(object)
+    motivo_fallo = np.full(n, None, dtype=object)
+    motivo_fallo[fallida] = _elegir(rng, MOTIVOS_FALLO, n_fallidas)
+    timestamp_completado[fallida] = (
+        timestamp_inicio[fallida] + rng.integers(5, 31, size=n_fallidas).astype('timedelta64[s]')
+    )
+
+    # Método de pago
+    metodo_pago = _elegir(rng, METODOS_PAGO, n, PROB_METODOS)
+
+    # Network blockchain
+    network = _elegir(rng, NETWORKS, n)
+    es_stablecoin = np.isin(cripto, ['ETH', 'USDT', 'USDC'])
+    network[es_stablecoin] = _elegir(rng, NETWORKS_STABLECOIN, int(es_stablecoin.sum()))
+    network[cripto == 'BTC'] = 'Bitcoin'
+
+    # Hash blockchain (solo si exitosa)
+    exitosa = ~fallida
+    hash_blockchain = np.full(n, None, dtype=object)
+    hash_blockchain[exitosa] = _hashes_sha256(rng, n - n_fallidas)
+    confirmaciones = np.where(exitosa, rng.integers(1, 13, size=n), 0)
+
+    # Score de fraude
+    score_fraude = rng.uniform(0, 100, size=n)
+    monto_alto = monto_usd > 10000
+    score_fraude[monto_alto] = np.minimum(
+        100, score_fraude[monto_alto] + rng.uniform(10, 30, size=monto_alto.sum())
+    )
+    flagged_fraude = score_fraude > 75
+
+    # IP, user agent y dispositivo
+    ip_address = _direcciones_ipv4(rng, n)
+    user_agent = _elegir(rng, USER_AGENTS, n)
+    dispositivo = _elegir(rng, DISPOSITIVOS, n)
+
+    # Cripto destino para swaps (cualquier cripto distinta a la de origen)
+    es_swap = tipo_operacion == 'swap'
+    cripto_destino = np.full(n, None, dtype=object)
+    idx_destino = rng.integers(0, len(CRIPTOS) - 1, size=es_swap.sum())
+    idx_destino += idx_destino >= idx_cripto[es_swap]
+    cripto_destino[es_swap] = np.array(CRIPTOS, dtype=object)[idx_destino]
+
+    return pd.DataFrame({
+        'transaction_id': np.arange(id_inicio, id_inicio + n),
+        'user_id': user_id,
+        'tipo_operacion': tipo_operacion,
+        'cripto': cripto,
+        'cripto_destino': cripto_destino,
+        'cantidad_cripto': np.round(cantidad_cripto, 8),
+        'precio_unitario_usd': np.round(precio_unitario, 2),
+        'monto_usd': monto_usd,
+        'comision_usd': comision_usd,
+        'monto_total_usd': monto_total_usd,
+        'timestamp_inicio': timestamp_inicio,
+        'timestamp_completado': timestamp_completado,
+        'tiempo_procesamiento': tiempo_procesamiento,
+        'estado': estado,
+        'motivo_fallo': motivo_fallo,
+        'requiere_validacion_manual': requiere_validacion,
+        'metodo_pago': metodo_pago,
+        'network': network,
+        'hash_blockchain': hash_blockchain,
+        'confirmaciones_blockchain': confirmaciones,
+        'score_fraude': np.round(score_fraude, 2),
+        'flagged_fraude': flagged_fraude,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'dispositivo': dispositivo
+    })
+
+def _usuarios_activos(df_usuarios):
+    """Usuarios activos (solo cuentas activas) con los atributos que usa el generador"""
+    return df_usuarios.loc[
+        df_usuarios['estado_cuenta'] == 'activa',
+        ['user_id', 'nivel_verificacion', 'fecha_registro']
+    ].reset_index(drop=True)
+
+def generar_transacciones(df_usuarios, n=NUM_TRANSACCIONES, seed=SEED):
     """
     Genera transacciones con patrones realistas:
     - Más actividad en horas pico (18-23hs)
     - Usuarios verificados hacen más transacciones
     - Mayor tasa de error en horas pico
     - Diferentes velocidades de procesamiento
+
+    La generación es vectorizada (NumPy): todas las columnas se sortean como
+    arrays completos, lo que permite generar millones de filas en segundos.
+    El resultado es reproducible para un mismo seed.
     """
     print(f"\n{'='*80}")
     print(f"GENERANDO {n:,} TRANSACCIONES")
     print(f"{'='*80}")
     
-    transacciones = []
-    
-    # Parámetros
-    tipos_operacion = ['compra', 'venta', 'swap', 'retiro']
-    prob_operacion = [0.45, 0.35, 0.15, 0.05]
-    
-    criptos = ['BTC', 'ETH', 'USDT', 'USDC', 'BNB', 'ADA', 'SOL']
-    prob_criptos = [0.30, 0.25, 0.20, 0.15, 0.05, 0.03, 0.02]
-    
-    metodos_pago = ['transferencia', 'tarjeta', 'wallet_crypto']
-    prob_metodos = [0.50, 0.35, 0.15]
-    
-    networks = ['Bitcoin', 'Ethereum', 'Binance Smart Chain', 'Polygon', 'Tron']
-    
-    # Precios aproximados en USD (para simulación)
-    precios_cripto = {
-        'BTC': 45000,
-        'ETH': 2500,
-        'USDT': 1,
-        'USDC': 1,
-        'BNB': 350,
-        'ADA': 0.5,
-        'SOL': 100
-    }
-    
-    # Usuarios activos (solo cuentas activas)
-    usuarios_activos = df_usuarios[df_usuarios['estado_cuenta'] == 'activa']['user_id'].tolist()
+    rng = np.random.default_rng(seed)
+    usuarios_activos = _usuarios_activos(df_usuarios)
     
     print("Generando transacciones con patrones realistas...")
     
-    for i in tqdm(range(1, n + 1), desc="Transacciones"):
-        # Seleccionar usuario (usuarios con nivel superior hacen más transacciones)
-        user_id = random.choice(usuarios_activos)
-        usuario = df_usuarios[df_usuarios['user_id'] == user_id].iloc[0]
-        
-        # Fecha y hora de la transacción
-        # Más transacciones en días de semana y horario 18-23hs
-        dias_desde_inicio = random.randint(0, (FECHA_FIN - FECHA_INICIO).days)
-        fecha_base = FECHA_INICIO + timedelta(days=dias_desde_inicio)
-        
-        # Asegurarse que la transacción es después del registro del usuario
-        if fecha_base < usuario['fecha_registro']:
-            fecha_base = usuario['fecha_registro'] + timedelta(days=random.randint(0, 30))
-        
-        # Distribución de horas (más actividad en horario pico)
-        if random.random() < 0.6:  # 60% en horario pico
-            hora = random.randint(18, 23)
-        else:
-            hora = random.randint(0, 23)
-        
-        timestamp_inicio = fecha_base.replace(
-            hour=hora,
-            minute=random.randint(0, 59),
-            second=random.randint(0, 59)
-        )
-        
-        # Tipo de operación y cripto
-        tipo_operacion = np.random.choice(tipos_operacion, p=prob_operacion)
-        cripto = np.random.choice(criptos, p=prob_criptos)
-        
-        # Monto según nivel de verificación
-        if usuario['nivel_verificacion'] == 'basico':
-            monto_usd = round(random.uniform(10, 1000), 2)
-        elif usuario['nivel_verificacion'] == 'intermedio':
-            monto_usd = round(random.uniform(100, 5000), 2)
-        else:  # completo
-            monto_usd = round(random.uniform(500, 20000), 2)
-        
-        # Calcular cantidad de cripto
-        precio_unitario = precios_cripto[cripto] * random.uniform(0.98, 1.02)  # variación ±2%
-        cantidad_cripto = monto_usd / precio_unitario
-        
-        # Comisión (0.5%)
-        comision_usd = round(monto_usd * 0.005, 2)
-        monto_total_usd = monto_usd + comision_usd
-        
-        # Tiempo de procesamiento
-        # Horario pico: más lento
-        # Montos altos: requieren validación, más lentos
-        es_hora_pico = hora >= 18 and hora <= 23
-        requiere_validacion = monto_usd > 5000
-        
-        if es_hora_pico:
-            tiempo_base = random.randint(60, 150)
-        else:
-            tiempo_base = random.randint(20, 60)
-        
-        if requiere_validacion:
-            tiempo_base += random.randint(30, 120)
-        
-        # Añadir variabilidad
-        tiempo_procesamiento = max(10, int(np.random.normal(tiempo_base, 20)))
-        
-        timestamp_completado = timestamp_inicio + timedelta(seconds=tiempo_procesamiento)
-        
-        # Estado de la transacción
-        # Mayor tasa de error en hora pico y transacciones grandes
-        tasa_base_error = 0.05
-        if es_hora_pico:
-            tasa_base_error += 0.10
-        if requiere_validacion:
-            tasa_base_error += 0.05
-        
-        if random.random() < tasa_base_error:
-            estado = 'fallida'
-            motivos_fallo = [
-                'Fondos insuficientes',
-                'Límite diario excedido',
-                'Validación de identidad fallida',
-                'Timeout de la red blockchain',
-                'Error en validación antifraude',
-                'Método de pago rechazado'
-            ]
-            motivo_fallo = random.choice(motivos_fallo)
-            timestamp_completado = timestamp_inicio + timedelta(seconds=random.randint(5, 30))
-        else:
-            estado = 'exitosa'
-            motivo_fallo = None
-        
-        # Método de pago
-        metodo_pago = np.random.choice(metodos_pago, p=prob_metodos)
-        
-        # Network blockchain
-        if cripto in ['BTC']:
-            network = 'Bitcoin'
-        elif cripto in ['ETH', 'USDT', 'USDC']:
-            network = random.choice(['Ethereum', 'Polygon', 'Binance Smart Chain'])
-        else:
-            network = random.choice(networks)
-        
-        # Hash blockchain (solo si exitosa)
-        hash_blockchain = None
-        confirmaciones = 0
-        if estado == 'exitosa':
-            hash_blockchain = fake.sha256()
-            confirmaciones = random.randint(1, 12)
-        
-        # Score de fraude
-        score_fraude = random.uniform(0, 100)
-        if monto_usd > 10000:
-            score_fraude = min(100, score_fraude + random.uniform(10, 30))
-        
-        flagged_fraude = score_fraude > 75
-        
-        # IP y user agent
-        ip_address = fake.ipv4()
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X)',
-            'Mozilla/5.0 (Android 11; Mobile)',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)'
-        ]
-        user_agent = random.choice(user_agents)
-        
-        dispositivos = ['Desktop', 'Mobile Android', 'Mobile iOS', 'Tablet']
-        dispositivo = random.choice(dispositivos)
-        
-        # Cripto destino para swaps
-        cripto_destino = None
-        if tipo_operacion == 'swap':
-            criptos_swap = [c for c in criptos if c != cripto]
-            cripto_destino = random.choice(criptos_swap)
-        
-        transaccion = {
-            'transaction_id': i,
-            'user_id': user_id,
-            'tipo_operacion': tipo_operacion,
-            'cripto': cripto,
-            'cripto_destino': cripto_destino,
-            'cantidad_cripto': round(cantidad_cripto, 8),
-            'precio_unitario_usd': round(precio_unitario, 2),
-            'monto_usd': monto_usd,
-            'comision_usd': comision_usd,
-            'monto_total_usd': monto_total_usd,
-            'timestamp_inicio': timestamp_inicio,
-            'timestamp_completado': timestamp_completado,
-            'tiempo_procesamiento': tiempo_procesamiento,
-            'estado': estado,
-            'motivo_fallo': motivo_fallo,
-            'requiere_validacion_manual': requiere_validacion,
-            'metodo_pago': metodo_pago,
-            'network': network,
-            'hash_blockchain': hash_blockchain,
-            'confirmaciones_blockchain': confirmaciones,
-            'score_fraude': round(score_fraude, 2),
-            'flagged_fraude': flagged_fraude,
-            'ip_address': ip_address,
-            'user_agent': user_agent,
-            'dispositivo': dispositivo
-        }
-        
-        transacciones.append(transaccion)
-    
-    df_transacciones = pd.DataFrame(transacciones)
+    df_transacciones = _generar_bloque_transacciones(rng, usuarios_activos, 1, n)
     
     # Estadísticas
     print(f"\n {len(df_transacciones):,} transacciones generadas")
@@ -352,13 +398,39 @@ def generar_transacciones(df_usuarios, n=NUM_TRANSACCIONES):
     
     return df_transacciones
 
+def generar_transacciones_por_chunks(df_usuarios, n=NUM_TRANSACCIONES, chunk_size=CHUNK_SIZE, seed=SEED):
+    """
+    Igual que generar_transacciones pero produce (yield) DataFrames de
+    chunk_size filas, para generar datasets grandes con memoria acotada.
+
+    Los transaction_id son correlativos entre chunks. El resultado es
+    reproducible para un mismo (seed, chunk_size).
+    """
+    rng = np.random.default_rng(seed)
+    usuarios_activos = _usuarios_activos(df_usuarios)
+    
+    for id_inicio in range(1, n + 1, chunk_size):
+        filas = min(chunk_size, n + 1 - id_inicio)
+        yield _generar_bloque_transacciones(rng, usuarios_activos, id_inicio, filas)
+
 # ============================================
 # GENERACIÓN DE MÉTRICAS OPERATIVAS
 # ============================================
 
+def _columna_tipo_operacion(tipo):
+    """Nombre de la columna de conteo por tipo (num_compra, ..., num_transferencias)"""
+    return 'num_' + tipo if tipo != 'transferencia' else 'num_transferencias'
+
 def generar_metricas_operativas(df_transacciones):
     """
     Genera métricas agregadas por hora para análisis de performance
+
+    Un solo groupby por hora (timestamp truncado, clave datetime64 en vez
+    de fecha/hora como objetos) con agregaciones con nombre sobre columnas
+    booleanas precalculadas (estado, tipo de operación, validación manual,
+    fraude); el p95 usa el quantile vectorizado del mismo groupby.
+    sketch_tiempo guarda el sketch combinable de los tiempos de cada hora
+    (ver sketch_cuantiles.py).
     """
     print(f"\n{'='*80}")
     print("GENERANDO MÉTRICAS OPERATIVAS")
@@ -370,139 +442,382 @@ def generar_metricas_operativas(df_transacciones):
     
     print("Agregando métricas por fecha-hora...")
     
-    # Agrupar por fecha y hora
-    metricas = df_transacciones.groupby(['fecha', 'hora']).agg({
-        'transaction_id': 'count',
-        'user_id': 'nunique',
-        'tiempo_procesamiento': ['mean', 'median', lambda x: x.quantile(0.95), 'max'],
-        'monto_usd': ['sum', 'mean'],
-        'comision_usd': 'sum'
-    }).reset_index()
-    
-    # Aplanar columnas
-    metricas.columns = [
+    # Indicadores por fila: se suman dentro del mismo groupby
+    tipos = sorted(df_transacciones['tipo_operacion'].dropna().unique())
+    indicadores = {
+        'num_transacciones_exitosas': df_transacciones['estado'] == 'exitosa',
+        'num_transacciones_fallidas': df_transacciones['estado'] == 'fallida',
+        'num_validaciones_manuales': df_transacciones['requiere_validacion_manual'].astype(bool),
+        'num_fraudes': df_transacciones['flagged_fraude'].astype(bool)
+    }
+    for tipo in tipos:
+        indicadores[_columna_tipo_operacion(tipo)] = df_transacciones['tipo_operacion'] == tipo
+    
+    columnas = ['transaction_id', 'user_id', 'tiempo_procesamiento', 'monto_usd', 'comision_usd']
+    bucket = df_transacciones['timestamp_inicio'].dt.floor('h').rename('bucket')
+    grupos = df_transacciones[columnas].assign(**indicadores).groupby(bucket)
+    
+    metricas = grupos.agg(
+        num_transacciones=('transaction_id', 'count'),
+        num_usuarios_activos=('user_id', 'nunique'),
+        tiempo_promedio_procesamiento=('tiempo_procesamiento', 'mean'),
+        tiempo_mediano_procesamiento=('tiempo_procesamiento', 'median'),
+        tiempo_max_procesamiento=('tiempo_procesamiento', 'max'),
+        volumen_total_usd=('monto_usd', 'sum'),
+        volumen_promedio_usd=('monto_usd', 'mean'),
+        comisiones_totales_usd=('comision_usd', 'sum'),
+        **{nombre: (nombre, 'sum') for nombre in indicadores}
+    )
+    metricas['tiempo_p95_procesamiento'] = grupos['tiempo_procesamiento'].quantile(0.95)
+    metricas['sketch_tiempo'] = sketches_por_grupo(bucket, df_transacciones['tiempo_procesamiento'])
+    
+    # Tasas
+    n = metricas['num_transacciones']
+    metricas['tasa_error'] = (metricas['num_transacciones_fallidas'] / n * 100).round(2)
+    metricas['tasa_validacion_manual'] = (metricas['num_validaciones_manuales'] / n * 100).round(2)
+    metricas['tasa_fraude'] = (metricas['num_fraudes'] / n * 100).round(2)
+    
+    metricas = metricas.reset_index()
+    metricas['fecha'] = metricas['bucket'].dt.date
+    metricas['hora'] = metricas['bucket'].dt.hour.astype(df_transacciones['hora'].dtype)
+    metricas = metricas[[
         'fecha', 'hora', 'num_transacciones', 'num_usuarios_activos',
         'tiempo_promedio_procesamiento', 'tiempo_mediano_procesamiento',
         'tiempo_p95_procesamiento', 'tiempo_max_procesamiento',
-        'volumen_total_usd', 'volumen_promedio_usd', 'comisiones_totales_usd'
-    ]
+        'volumen_total_usd', 'volumen_promedio_usd', 'comisiones_totales_usd',
+        'num_transacciones_exitosas', 'num_transacciones_fallidas', 'tasa_error',
+        *[_columna_tipo_operacion(tipo) for tipo in tipos],
+        'num_validaciones_manuales', 'tasa_validacion_manual',
+        'num_fraudes', 'tasa_fraude', 'sketch_tiempo'
+    ]]
     
-    # Contar por estado
-    exitosas = df_transacciones[df_transacciones['estado'] == 'exitosa'].groupby(['fecha', 'hora']).size()
-    fallidas = df_transacciones[df_transacciones['estado'] == 'fallida'].groupby(['fecha', 'hora']).size()
+    print(f"\n {len(metricas):,} registros de métricas generados")
+    print(f"Periodo: {metricas['fecha'].min()} a {metricas['fecha'].max()}")
     
-    metricas = metricas.merge(
-        exitosas.reset_index(name='num_transacciones_exitosas'),
-        on=['fecha', 'hora'],
-        how='left'
-    )
-    metricas = metricas.merge(
-        fallidas.reset_index(name='num_transacciones_fallidas'),
-        on=['fecha', 'hora'],
-        how='left'
-    )
+    return metricas
+
+class AgregadorMetricas:
+    """
+    Agregador incremental de métricas operativas para el modo streaming
+
+    Acumula por bucket (fecha, hora) los contadores y sumas de cada chunk,
+    un histograma de tiempo_procesamiento (entero, en segundos) para obtener
+    mediana y p95 exactos, y una matriz bucket x usuario para contar usuarios
+    únicos. La memoria depende del número de buckets y usuarios, no del
+    número de transacciones.
+
+    resultado() devuelve las mismas columnas que generar_metricas_operativas.
+    """
     
-    metricas['num_transacciones_exitosas'].fillna(0, inplace=True)
-    metricas['num_transacciones_fallidas'].fillna(0, inplace=True)
+    def __init__(self, fecha_inicio=FECHA_INICIO):
+        self.fecha_inicio = np.datetime64(fecha_inicio, 'D')
+        self.tipos = sorted(TIPOS_OPERACION)
+        self.num_buckets = 0
+        self.contadores = {}
+        self.histograma = np.zeros((0, 1), dtype=np.int64)
+        self.usuarios = np.zeros((0, 1), dtype=bool)
     
-    # Calcular tasas
-    metricas['tasa_error'] = (
-        metricas['num_transacciones_fallidas'] / metricas['num_transacciones'] * 100
-    ).round(2)
+    def _asegurar_capacidad(self, num_buckets, tiempo_max, user_id_max):
+        """Agranda los arrays internos si el chunk trae buckets/valores nuevos"""
+        filas = max(num_buckets, self.num_buckets)
+        for nombre, valores in self.contadores.items():
+            self.contadores[nombre] = np.pad(valores, (0, filas - len(valores)))
+        
+        alto, ancho = self.histograma.shape
+        self.histograma = np.pad(self.histograma, ((0, filas - alto), (0, max(0, tiempo_max + 1 - ancho))))
+        
+        alto, ancho = self.usuarios.shape
+        self.usuarios = np.pad(self.usuarios, ((0, filas - alto), (0, max(0, user_id_max + 1 - ancho))))
+        
+        self.num_buckets = filas
     
-    # Contar por tipo de operación
-    por_tipo = df_transacciones.groupby(['fecha', 'hora', 'tipo_operacion']).size().unstack(fill_value=0)
-    por_tipo.columns = ['num_' + col if col != 'transferencia' else 'num_transferencias' for col in por_tipo.columns]
-    por_tipo = por_tipo.reset_index()
+    def _sumar(self, nombre, bucket, pesos=None):
+        """Suma pesos (o cuenta filas) por bucket en el contador indicado"""
+        acumulado = np.bincount(bucket, weights=pesos, minlength=self.num_buckets)
+        if nombre not in self.contadores:
+            self.contadores[nombre] = np.zeros(self.num_buckets)
+        self.contadores[nombre] += acumulado
     
-    metricas = metricas.merge(por_tipo, on=['fecha', 'hora'], how='left')
+    def actualizar(self, df):
+        """Incorpora un chunk de transacciones al agregado"""
+        inicio = df['timestamp_inicio'].to_numpy(dtype='datetime64[s]')
+        dias = (inicio.astype('datetime64[D]') - self.fecha_inicio).astype(np.int64)
+        bucket = dias * 24 + df['timestamp_inicio'].dt.hour.to_numpy()
+        tiempo = df['tiempo_procesamiento'].to_numpy(dtype=np.int64)
+        user_id = df['user_id'].to_numpy(dtype=np.int64)
+        
+        self._asegurar_capacidad(int(bucket.max()) + 1, int(tiempo.max()), int(user_id.max()))
+        
+        self._sumar('num_transacciones', bucket)
+        self._sumar('suma_tiempo', bucket, tiempo)
+        self._sumar('volumen_total_usd', bucket, df['monto_usd'].to_numpy())
+        self._sumar('comisiones_totales_usd', bucket, df['comision_usd'].to_numpy())
+        self._sumar('num_transacciones_exitosas', bucket, (df['estado'] == 'exitosa').to_numpy())
+        self._sumar('num_transacciones_fallidas', bucket, (df['estado'] == 'fallida').to_numpy())
+        self._sumar('num_validaciones_manuales', bucket, df['requiere_validacion_manual'].to_numpy())
+        self._sumar('num_fraudes', bucket, df['flagged_fraude'].to_numpy())
+        for tipo in self.tipos:
+            self._sumar(f'num_{tipo}', bucket, (df['tipo_operacion'] == tipo).to_numpy())
+        
+        np.add.at(self.histograma, (bucket, tiempo), 1)
+        self.usuarios[bucket, user_id] = True
     
-    # Rellenar NaNs
-    for col in metricas.columns:
-        if 'num_' in col:
-            metricas[col].fillna(0, inplace=True)
+    def _cuantil(self, acumulado, total, q):
+        """Cuantil por fila desde histogramas acumulados (interpolación lineal como pandas)"""
+        posicion = (total - 1) * q
+        inferior = np.floor(posicion).astype(np.int64)
+        superior = np.minimum(inferior + 1, total - 1)
+        valor_inf = (acumulado > inferior[:, None]).argmax(axis=1)
+        valor_sup = (acumulado > superior[:, None]).argmax(axis=1)
+        return valor_inf + (posicion - inferior) * (valor_sup - valor_inf)
+    
+    def resultado(self):
+        """Devuelve el DataFrame de métricas de los buckets con actividad"""
+        total = self.contadores['num_transacciones']
+        activos = np.flatnonzero(total > 0)
+        c = {nombre: valores[activos] for nombre, valores in self.contadores.items()}
+        n = c['num_transacciones'].astype(np.int64)
+        
+        histograma = self.histograma[activos]
+        acumulado = histograma.cumsum(axis=1)
+        
+        fechas = self.fecha_inicio + (activos // 24).astype('timedelta64[D]')
+        
+        metricas = pd.DataFrame({
+            'fecha': pd.to_datetime(fechas).date,
+            'hora': activos % 24,
+            'num_transacciones': n,
+            'num_usuarios_activos': self.usuarios[activos].sum(axis=1),
+            'tiempo_promedio_procesamiento': c['suma_tiempo'] / n,
+            'tiempo_mediano_procesamiento': self._cuantil(acumulado, n, 0.5),
+            'tiempo_p95_procesamiento': self._cuantil(acumulado, n, 0.95),
+            'tiempo_max_procesamiento': histograma.shape[1] - 1 - (histograma[:, ::-1] > 0).argmax(axis=1),
+            'volumen_total_usd': c['volumen_total_usd'],
+            'volumen_promedio_usd': c['volumen_total_usd'] / n,
+            'comisiones_totales_usd': c['comisiones_totales_usd'],
+            'num_transacciones_exitosas': c['num_transacciones_exitosas'],
+            'num_transacciones_fallidas': c['num_transacciones_fallidas']
+        })
+        
+        metricas['tasa_error'] = (metricas['num_transacciones_fallidas'] / n * 100).round(2)
+        
+        # Solo tipos de operación presentes (igual que el unstack del modo en memoria)
+        for tipo in self.tipos:
+            if self.contadores[f'num_{tipo}'].sum() > 0:
+                metricas[f'num_{tipo}'] = c[f'num_{tipo}']
+        
+        metricas['num_validaciones_manuales'] = c['num_validaciones_manuales']
+        metricas['tasa_validacion_manual'] = (metricas['num_validaciones_manuales'] / n * 100).round(2)
+        metricas['num_fraudes'] = c['num_fraudes']
+        metricas['tasa_fraude'] = (metricas['num_fraudes'] / n * 100).round(2)
+        metricas['sketch_tiempo'] = sketches_desde_histograma(histograma)
+        
+        return metricas
+
+# Columnas que usa el cálculo de métricas
+COLUMNAS_METRICAS_ORIGEN = [
+    'transaction_id', 'user_id', 'timestamp_inicio', 'tiempo_procesamiento', 'monto_usd',
+    'comision_usd', 'estado', 'tipo_operacion', 'requiere_validacion_manual', 'flagged_fraude'
+]
+
+def benchmark_metricas(n_transacciones=10_000_000, chunk_size=CHUNK_SIZE):
+    """
+    Mide generar_metricas_operativas sobre n_transacciones y lo contrasta
+    con AgregadorMetricas (modo streaming) sobre los mismos datos
+
+    Las transacciones se generan por chunks y solo se conservan las columnas
+    que usan las métricas, para que 10M de filas entren en memoria. La
+    generación no se incluye en los tiempos.
+    """
+    print(f"\n{'='*80}")
+    print(f"BENCHMARK DE MÉTRICAS OPERATIVAS ({n_transacciones:,} transacciones)")
+    print(f"{'='*80}")
     
-    # Validaciones manuales y fraude
-    validaciones_manuales = df_transacciones[
-        df_transacciones['requiere_validacion_manual']
-    ].groupby(['fecha', 'hora']).size()
+    df_usuarios = generar_usuarios()
+    agregador = AgregadorMetricas()
+    tiempo_agregador = 0.0
+    chunks = []
     
-    metricas = metricas.merge(
-        validaciones_manuales.reset_index(name='num_validaciones_manuales'),
-        on=['fecha', 'hora'],
-        how='left'
-    )
-    metricas['num_validaciones_manuales'].fillna(0, inplace=True)
+    for df_chunk in tqdm(generar_transacciones_por_chunks(df_usuarios, n_transacciones, chunk_size),
+                         total=(n_transacciones + chunk_size - 1) // chunk_size, desc="Chunks"):
+        df_chunk = df_chunk[COLUMNAS_METRICAS_ORIGEN].astype({'estado': 'category', 'tipo_operacion': 'category'})
+        inicio = time.perf_counter()
+        agregador.actualizar(df_chunk)
+        tiempo_agregador += time.perf_counter() - inicio
+        chunks.append(df_chunk)
     
-    metricas['tasa_validacion_manual'] = (
-        metricas['num_validaciones_manuales'] / metricas['num_transacciones'] * 100
-    ).round(2)
+    df_transacciones = pd.concat(chunks, ignore_index=True)
+    del chunks
     
-    fraudes = df_transacciones[
-        df_transacciones['flagged_fraude']
-    ].groupby(['fecha', 'hora']).size()
+    inicio = time.perf_counter()
+    df_metricas = generar_metricas_operativas(df_transacciones)
+    tiempo_groupby = time.perf_counter() - inicio
     
-    metricas = metricas.merge(
-        fraudes.reset_index(name='num_fraudes'),
-        on=['fecha', 'hora'],
-        how='left'
-    )
-    metricas['num_fraudes'].fillna(0, inplace=True)
+    inicio = time.perf_counter()
+    df_streaming = agregador.resultado()
+    tiempo_agregador += time.perf_counter() - inicio
     
-    metricas['tasa_fraude'] = (
-        metricas['num_fraudes'] / metricas['num_transacciones'] * 100
-    ).round(2)
+    # Mismas métricas en ambos motores (el agregador nombra num_<tipo> sin plural)
+    comunes = [
+        c for c in df_metricas.columns
+        if c in df_streaming.columns and c not in ('fecha', 'hora', 'sketch_tiempo')
+    ]
+    diferencia = (df_metricas[comunes].astype(float) - df_streaming[comunes].astype(float)).abs().max().max()
+    sketches_iguales = (df_metricas['sketch_tiempo'] == df_streaming['sketch_tiempo']).mean() * 100
     
-    print(f"\n {len(metricas):,} registros de métricas generados")
-    print(f"Periodo: {metricas['fecha'].min()} a {metricas['fecha'].max()}")
+    print(f"\n   generar_metricas_operativas: {tiempo_groupby:.2f}s "
+          f"({n_transacciones / tiempo_groupby:,.0f} filas/s)")
+    print(f"   AgregadorMetricas (streaming): {tiempo_agregador:.2f}s "
+          f"({n_transacciones / tiempo_agregador:,.0f} filas/s)")
+    print(f"   Máxima diferencia entre motores: {diferencia:.6f} (sketches iguales: {sketches_iguales:.1f}%)")
     
-    return metricas
+    return tiempo_groupby, tiempo_agregador
 
 # ============================================
 # CARGA DE DATOS A BASE DE DATOS
 # ============================================
 
-def cargar_usuarios_db(df_usuarios):
+# Columnas destino de cada tabla (en el orden del COPY / INSERT)
+COLUMNAS_USUARIOS_DB = [
+    'username', 'email', 'fecha_registro', 'pais', 'ciudad', 'nivel_verificacion',
+    'fecha_ultima_verificacion', 'estado_cuenta'
+]
+
+COLUMNAS_TRANSACCIONES_DB = [
+    'user_id', 'tipo_operacion', 'cripto', 'cripto_destino', 'cantidad_cripto',
+    'precio_unitario_usd', 'monto_usd', 'comision_usd', 'monto_total_usd',
+    'timestamp_inicio', 'timestamp_completado', 'tiempo_procesamiento',
+    'estado', 'motivo_fallo', 'requiere_validacion_manual', 'metodo_pago',
+    'network', 'hash_blockchain', 'confirmaciones_blockchain',
+    'score_fraude', 'flagged_fraude', 'ip_address', 'user_agent', 'dispositivo'
+]
+
+COLUMNAS_METRICAS_DB = [
+    'fecha', 'hora', 'num_transacciones', 'num_transacciones_exitosas',
+    'num_transacciones_fallidas', 'num_usuarios_activos',
+    'tiempo_promedio_procesamiento', 'tiempo_mediano_procesamiento',
+    'tiempo_p95_procesamiento', 'tiempo_max_procesamiento',
+    'tasa_error', 'tasa_validacion_manual', 'tasa_fraude',
+    'volumen_total_usd', 'volumen_promedio_usd', 'comisiones_totales_usd',
+    'num_compras', 'num_ventas', 'num_swaps', 'num_retiros', 'sketch_tiempo'
+]
+
+# 'copy' (COPY FROM STDIN) o 'batch' (INSERT con execute_batch)
+METODO_CARGA = 'copy'
+
+def _reportar_velocidad(filas, segundos):
+    """Imprime el throughput de una carga"""
+    print(f"   {filas:,} filas en {segundos:.2f}s ({filas / max(segundos, 1e-9):,.0f} filas/s)")
+
+def copiar_dataframe(cursor, df, tabla, columnas):
+    """
+    Envía un DataFrame a la tabla con COPY FROM STDIN
+
+    Las filas se serializan a un buffer CSV en memoria (sin iterrows);
+    los valores nulos (None/NaN/NaT) viajan como campo vacío = NULL.
+    """
+    buffer = io.StringIO()
+    df[columnas].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {tabla} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+    return len(df)
+
+def diferir_indices_y_triggers(conn, tabla):
+    """
+    Elimina los índices secundarios de la tabla y desactiva sus triggers de
+    usuario antes de una carga masiva. Los índices que respaldan constraints
+    (PK, UNIQUE) se mantienen. Retorna las definiciones para restaurarlos.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT indexname, indexdef
+            FROM pg_indexes
+            WHERE schemaname = 'public'
+            AND tablename = %s
+            AND indexname NOT IN (
+                SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+            )
+        """, (tabla, tabla))
+        definiciones = cursor.fetchall()
+        
+        for nombre, _ in definiciones:
+            cursor.execute(f"DROP INDEX IF EXISTS {nombre}")
+        cursor.execute(f"ALTER TABLE {tabla} DISABLE TRIGGER USER")
+        conn.commit()
+        
+        print(f" {len(definiciones)} índices y triggers de {tabla} diferidos")
+        # En tablas particionadas indexdef dice "ON ONLY", que no crearía
+        # el índice en las particiones
+        return [definicion.replace(' ON ONLY ', ' ON ', 1) for _, definicion in definiciones]
+    finally:
+        cursor.close()
+
+def restaurar_indices_y_triggers(conn, tabla, definiciones):
+    """Recrea los índices diferidos, reactiva los triggers y actualiza estadísticas"""
+    cursor = conn.cursor()
+    try:
+        inicio = time.perf_counter()
+        for definicion in definiciones:
+            cursor.execute(definicion)
+        cursor.execute(f"ALTER TABLE {tabla} ENABLE TRIGGER USER")
+        cursor.execute(f"ANALYZE {tabla}")
+        conn.commit()
+        print(f" {len(definiciones)} índices de {tabla} reconstruidos en {time.perf_counter() - inicio:.2f}s")
+    finally:
+        cursor.close()
+
+def cargar_usuarios_db(df_usuarios, metodo=METODO_CARGA):
     """Carga usuarios en la base de datos"""
     print(f"\n{'='*80}")
     print("CARGANDO USUARIOS A BASE DE DATOS")
     print(f"{'='*80}")
     
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = conectar(**DB_CONFIG)
     cursor = conn.cursor()
+    inicio = time.perf_counter()
     
     try:
-        # Preparar datos para inserción
-        datos = []
-        for _, row in df_usuarios.iterrows():
-            #  Si la fecha es NaT (vacía), enviamos None a la base de datos
-            fecha_verif = row['fecha_ultima_verificacion']
-            if pd.isna(fecha_verif):
-                fecha_verif = None
-                
-            datos.append((
-                row['username'],
-                row['email'],
-                row['fecha_registro'],
-                row['pais'],
-                row['ciudad'],
-                row['nivel_verificacion'],
-                fecha_verif, 
-                row['estado_cuenta']
-            ))
-        
-        query = """
-            INSERT INTO usuarios 
-            (username, email, fecha_registro, pais, ciudad, nivel_verificacion, 
-             fecha_ultima_verificacion, estado_cuenta)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        print("Insertando usuarios...")
-        execute_batch(cursor, query, datos, page_size=1000)
+        if metodo == 'copy':
+            print("Cargando usuarios vía COPY...")
+            insertados = copiar_dataframe(cursor, df_usuarios, 'usuarios', COLUMNAS_USUARIOS_DB)
+        else:
+            # Preparar datos para inserción
+            datos = []
+            for _, row in df_usuarios.iterrows():
+                #  Si la fecha es NaT (vacía), enviamos None a la base de datos
+                fecha_verif = row['fecha_ultima_verificacion']
+                if pd.isna(fecha_verif):
+                    fecha_verif = None
+                    
+                datos.append((
+                    row['username'],
+                    row['email'],
+                    row['fecha_registro'],
+                    row['pais'],
+                    row['ciudad'],
+                    row['nivel_verificacion'],
+                    fecha_verif, 
+                    row['estado_cuenta']
+                ))
+            
+            query = """
+                INSERT INTO usuarios 
+                (username, email, fecha_registro, pais, ciudad, nivel_verificacion, 
+                 fecha_ultima_verificacion, estado_cuenta)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            
+            print("Insertando usuarios...")
+            execute_batch(cursor, query, datos, page_size=1000)
+            insertados = len(datos)
         
         conn.commit()
-        print(f" {len(datos):,} usuarios insertados exitosamente")
+        print(f" {insertados:,} usuarios insertados exitosamente")
+        _reportar_velocidad(insertados, time.perf_counter() - inicio)
         
     except Exception as e:
         conn.rollback()
@@ -512,16 +827,29 @@ def cargar_usuarios_db(df_usuarios):
         cursor.close()
         conn.close()
 
-def cargar_transacciones_db(df_transacciones):
-    """Carga transacciones en la base de datos"""
-    print(f"\n{'='*80}")
-    print("CARGANDO TRANSACCIONES A BASE DE DATOS")
-    print(f"{'='*80}")
-    
-    conn = psycopg2.connect(**DB_CONFIG)
+def _insertar_transacciones(conn, df_transacciones, desc=None, metodo=METODO_CARGA):
+    """
+    Inserta un DataFrame de transacciones en lotes de 5,000 (commit por lote)
+
+    Con metodo='copy' se envían lotes de 100,000 filas con COPY en lugar de
+    execute_batch.
+    """
     cursor = conn.cursor()
+    batch_size = 5000
     
     try:
+        if metodo == 'copy':
+            # COPY no necesita lotes chicos: se acota solo el tamaño del buffer CSV
+            copy_batch_size = 100000
+            lotes = range(0, len(df_transacciones), copy_batch_size)
+            for i in tqdm(lotes, desc=desc, disable=desc is None):
+                copiar_dataframe(
+                    cursor, df_transacciones.iloc[i:i + copy_batch_size],
+                    'transacciones', COLUMNAS_TRANSACCIONES_DB
+                )
+                conn.commit()
+            return len(df_transacciones)
+        
         # Preparar datos para inserción
         datos = [
             (
@@ -565,82 +893,305 @@ def cargar_transacciones_db(df_transacciones):
                     %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         
-        print("Insertando transacciones (esto puede tomar varios minutos)...")
-        
         # Insertar en lotes con barra de progreso
-        batch_size = 5000
         total_batches = len(datos) // batch_size + 1
         
-        for i in tqdm(range(0, len(datos), batch_size), total=total_batches, desc="Lotes"):
+        for i in tqdm(range(0, len(datos), batch_size), total=total_batches, desc=desc, disable=desc is None):
             batch = datos[i:i + batch_size]
             execute_batch(cursor, query, batch, page_size=1000)
             conn.commit()
         
-        print(f" {len(datos):,} transacciones insertadas exitosamente")
+        return len(datos)
         
-    except Exception as e:
+    except Exception:
         conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def cargar_transacciones_db(df_transacciones, metodo=METODO_CARGA, diferir_indices=False):
+    """
+    Carga transacciones en la base de datos
+
+    diferir_indices=True elimina los índices secundarios y desactiva los
+    triggers durante la carga, y los reconstruye al final (útil en cargas
+    masivas sobre tablas vacías o casi vacías).
+    """
+    print(f"\n{'='*80}")
+    print("CARGANDO TRANSACCIONES A BASE DE DATOS")
+    print(f"{'='*80}")
+    
+    conn = conectar(**DB_CONFIG)
+    definiciones = None
+    
+    try:
+        if diferir_indices:
+            definiciones = diferir_indices_y_triggers(conn, 'transacciones')
+        
+        print(f"Insertando transacciones (método: {metodo})...")
+        inicio = time.perf_counter()
+        insertadas = _insertar_transacciones(conn, df_transacciones, desc="Lotes", metodo=metodo)
+        print(f" {insertadas:,} transacciones insertadas exitosamente")
+        _reportar_velocidad(insertadas, time.perf_counter() - inicio)
+        
+    except Exception as e:
         print(f" Error al insertar transacciones: {e}")
         raise
+    finally:
+        if definiciones is not None:
+            restaurar_indices_y_triggers(conn, 'transacciones', definiciones)
+        conn.close()
+
+def _asegurar_tabla_control_cargas(conn):
+    """Crea (si no existe) la tabla que registra las particiones ya cargadas por lote"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cargas_transacciones (
+                lote_id VARCHAR(64) NOT NULL,
+                particion INT NOT NULL,
+                filas INT NOT NULL,
+                completada_at TIMESTAMP DEFAULT NOW(),
+                PRIMARY KEY (lote_id, particion)
+            )
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+
+def _cargar_particion(pool, df_particion, lote_id, particion, max_reintentos):
+    """
+    Carga una partición con COPY en su propia conexión y transacción
+
+    La fila de control (lote_id, particion) se inserta en la misma
+    transacción que los datos: si la partición ya figura como cargada se
+    omite, lo que hace idempotente el reintento de un lote completo.
+    Retorna el número de filas cargadas (0 si la partición se omitió).
+    """
+    conn = pool.getconn()
+    try:
+        for intento in range(1, max_reintentos + 1):
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "SELECT 1 FROM cargas_transacciones WHERE lote_id = %s AND particion = %s",
+                    (lote_id, particion)
+                )
+                if cursor.fetchone():
+                    conn.rollback()
+                    return 0
+                
+                filas = copiar_dataframe(cursor, df_particion, 'transacciones', COLUMNAS_TRANSACCIONES_DB)
+                cursor.execute(
+                    "INSERT INTO cargas_transacciones (lote_id, particion, filas) VALUES (%s, %s, %s)",
+                    (lote_id, particion, filas)
+                )
+                conn.commit()
+                return filas
+                
+            except psycopg2.Error as e:
+                if conn.closed:
+                    # Conexión perdida: se descarta y se pide otra al pool
+                    pool.putconn(conn, close=True)
+                    conn = None
+                    conn = pool.getconn()
+                else:
+                    conn.rollback()
+                if intento == max_reintentos:
+                    raise
+                espera = 2 ** intento
+                print(f"   Partición {particion}: intento {intento} fallido ({e.__class__.__name__}), reintentando en {espera}s")
+                time.sleep(espera)
+            finally:
+                if not cursor.closed:
+                    cursor.close()
+    finally:
+        if conn is not None:
+            pool.putconn(conn)
+
+def _lote_iniciado(lote_id):
+    """True si el lote ya tiene particiones cargadas (los usuarios se cargaron antes)"""
+    conn = conectar(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass('cargas_transacciones') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return False
+        cursor.execute("SELECT 1 FROM cargas_transacciones WHERE lote_id = %s LIMIT 1", (lote_id,))
+        return cursor.fetchone() is not None
     finally:
         cursor.close()
         conn.close()
 
-def cargar_metricas_db(df_metricas):
+def _metricas_cargadas(df_metricas):
+    """True si las métricas ya están en la tabla (se cargan en una sola transacción)"""
+    conn = conectar(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        primera = df_metricas.iloc[0]
+        cursor.execute(
+            "SELECT 1 FROM metricas_operativas WHERE fecha = %s AND hora = %s",
+            (primera['fecha'], int(primera['hora']))
+        )
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+        conn.close()
+
+def cargar_transacciones_paralelo(df_transacciones, num_particiones=4, lote_id=None,
+                                  max_reintentos=3, diferir_indices=False):
+    """
+    Carga transacciones en paralelo: divide el DataFrame en num_particiones
+    y las envía con COPY por conexiones concurrentes de un pool (threads;
+    psycopg2 libera el GIL durante la E/S de red).
+
+    Cada partición hace commit por separado y se reintenta ante errores.
+    Reejecutar con el mismo lote_id (y el mismo DataFrame) retoma la carga
+    omitiendo las particiones ya completadas.
+    """
+    print(f"\n{'='*80}")
+    print(f"CARGANDO TRANSACCIONES EN PARALELO ({num_particiones} particiones)")
+    print(f"{'='*80}")
+    
+    lote_id = lote_id or datetime.now().strftime('lote_%Y%m%d_%H%M%S')
+    print(f"Lote: {lote_id}")
+    
+    conn = conectar(**DB_CONFIG)
+    pool = crear_pool(1, num_particiones, **DB_CONFIG)
+    definiciones = None
+    
+    try:
+        _asegurar_tabla_control_cargas(conn)
+        if diferir_indices:
+            definiciones = diferir_indices_y_triggers(conn, 'transacciones')
+        
+        posiciones = np.array_split(np.arange(len(df_transacciones)), num_particiones)
+        inicio = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=num_particiones) as executor:
+            futuros = {
+                executor.submit(
+                    _cargar_particion, pool, df_transacciones.iloc[pos],
+                    lote_id, particion, max_reintentos
+                ): particion
+                for particion, pos in enumerate(posiciones)
+            }
+            
+            cargadas, omitidas, fallidas = 0, 0, []
+            for futuro in tqdm(as_completed(futuros), total=len(futuros), desc="Particiones"):
+                particion = futuros[futuro]
+                try:
+                    filas = futuro.result()
+                    if filas:
+                        cargadas += filas
+                    else:
+                        omitidas += 1
+                except Exception as e:
+                    fallidas.append(particion)
+                    print(f" Partición {particion} fallida: {e}")
+        
+        print(f" {cargadas:,} transacciones insertadas ({omitidas} particiones ya cargadas omitidas)")
+        _reportar_velocidad(cargadas, time.perf_counter() - inicio)
+        
+        if fallidas:
+            raise RuntimeError(
+                f"Particiones fallidas: {sorted(fallidas)}. Reintentar con lote_id='{lote_id}'"
+            )
+        
+    finally:
+        if definiciones is not None:
+            restaurar_indices_y_triggers(conn, 'transacciones', definiciones)
+        pool.closeall()
+        conn.close()
+
+def _preparar_metricas_db(df_metricas):
+    """Renombra las columnas de métricas a las de la tabla (num_compra -> num_compras, ...)"""
+    df = df_metricas.rename(columns={
+        'num_compra': 'num_compras',
+        'num_venta': 'num_ventas',
+        'num_swap': 'num_swaps',
+        'num_retiro': 'num_retiros'
+    })
+    for col in ['num_compras', 'num_ventas', 'num_swaps', 'num_retiros']:
+        if col not in df.columns:
+            df[col] = 0
+    
+    # Los conteos pueden venir como float (merges con NaN); COPY exige enteros
+    conteos = [col for col in COLUMNAS_METRICAS_DB if col.startswith('num_')]
+    df[conteos] = df[conteos].fillna(0).astype(np.int64)
+    return df
+
+def guardar_metricas_parquet(df_metricas):
+    """Guarda las métricas en Parquet con el mismo esquema que la tabla metricas_operativas"""
+    df = _preparar_metricas_db(df_metricas)[COLUMNAS_METRICAS_DB]
+    guardar_parquet(df.sort_values(['fecha', 'hora']), RUTA_METRICAS_PARQUET)
+
+def cargar_metricas_db(df_metricas, metodo=METODO_CARGA):
     """Carga métricas operativas en la base de datos"""
     print(f"\n{'='*80}")
     print("CARGANDO MÉTRICAS OPERATIVAS A BASE DE DATOS")
     print(f"{'='*80}")
     
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = conectar(**DB_CONFIG)
     cursor = conn.cursor()
+    inicio = time.perf_counter()
     
     try:
-        # Preparar datos para inserción
-        datos = [
-            (
-                row['fecha'],
-                row['hora'],
-                row['num_transacciones'],
-                row['num_transacciones_exitosas'],
-                row['num_transacciones_fallidas'],
-                row['num_usuarios_activos'],
-                row['tiempo_promedio_procesamiento'],
-                row['tiempo_mediano_procesamiento'],
-                row['tiempo_p95_procesamiento'],
-                row['tiempo_max_procesamiento'],
-                row['tasa_error'],
-                row['tasa_validacion_manual'],
-                row['tasa_fraude'],
-                row['volumen_total_usd'],
-                row['volumen_promedio_usd'],
-                row['comisiones_totales_usd'],
-                row.get('num_compra', 0),
-                row.get('num_venta', 0),
-                row.get('num_swap', 0),
-                row.get('num_retiro', 0)
+        if metodo == 'copy':
+            print("Cargando métricas vía COPY...")
+            insertadas = copiar_dataframe(
+                cursor, _preparar_metricas_db(df_metricas),
+                'metricas_operativas', COLUMNAS_METRICAS_DB
             )
-            for _, row in df_metricas.iterrows()
-        ]
-        
-        query = """
-            INSERT INTO metricas_operativas 
-            (fecha, hora, num_transacciones, num_transacciones_exitosas,
-             num_transacciones_fallidas, num_usuarios_activos,
-             tiempo_promedio_procesamiento, tiempo_mediano_procesamiento,
-             tiempo_p95_procesamiento, tiempo_max_procesamiento,
-             tasa_error, tasa_validacion_manual, tasa_fraude,
-             volumen_total_usd, volumen_promedio_usd, comisiones_totales_usd,
-             num_compras, num_ventas, num_swaps, num_retiros)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s)
-        """
-        
-        print("Insertando métricas...")
-        execute_batch(cursor, query, datos, page_size=1000)
+        else:
+            # Preparar datos para inserción
+            datos = [
+                (
+                    row['fecha'],
+                    row['hora'],
+                    row['num_transacciones'],
+                    row['num_transacciones_exitosas'],
+                    row['num_transacciones_fallidas'],
+                    row['num_usuarios_activos'],
+                    row['tiempo_promedio_procesamiento'],
+                    row['tiempo_mediano_procesamiento'],
+                    row['tiempo_p95_procesamiento'],
+                    row['tiempo_max_procesamiento'],
+                    row['tasa_error'],
+                    row['tasa_validacion_manual'],
+                    row['tasa_fraude'],
+                    row['volumen_total_usd'],
+                    row['volumen_promedio_usd'],
+                    row['comisiones_totales_usd'],
+                    row.get('num_compra', 0),
+                    row.get('num_venta', 0),
+                    row.get('num_swap', 0),
+                    row.get('num_retiro', 0),
+                    row.get('sketch_tiempo')
+                )
+                for _, row in df_metricas.iterrows()
+            ]
+            
+            query = """
+                INSERT INTO metricas_operativas 
+                (fecha, hora, num_transacciones, num_transacciones_exitosas,
+                 num_transacciones_fallidas, num_usuarios_activos,
+                 tiempo_promedio_procesamiento, tiempo_mediano_procesamiento,
+                 tiempo_p95_procesamiento, tiempo_max_procesamiento,
+                 tasa_error, tasa_validacion_manual, tasa_fraude,
+                 volumen_total_usd, volumen_promedio_usd, comisiones_totales_usd,
+                 num_compras, num_ventas, num_swaps, num_retiros, sketch_tiempo)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+                        %s, %s, %s, %s, %s, %s)
+            """
+            
+            print("Insertando métricas...")
+            execute_batch(cursor, query, datos, page_size=1000)
+            insertadas = len(datos)
         
         conn.commit()
-        print(f" {len(datos):,} registros de métricas insertados exitosamente")
+        print(f" {insertadas:,} registros de métricas insertados exitosamente")
+        _reportar_velocidad(insertadas, time.perf_counter() - inicio)
         
     except Exception as e:
         conn.rollback()
@@ -650,12 +1201,76 @@ def cargar_metricas_db(df_metricas):
         cursor.close()
         conn.close()
 
+# ============================================
+# MODO STREAMING
+# ============================================
+
+def generar_y_cargar_streaming(df_usuarios, n=NUM_TRANSACCIONES, chunk_size=CHUNK_SIZE,
+                               metodo=METODO_CARGA, diferir_indices=False):
+    """
+    Genera transacciones por chunks y los envía directamente al CSV, a la
+    base de datos y al agregador de métricas, sin materializar el dataset
+    completo en memoria. Los usuarios deben estar cargados previamente.
+
+    Retorna (total_transacciones, df_metricas).
+    """
+    print(f"\n{'='*80}")
+    print(f"GENERANDO Y CARGANDO {n:,} TRANSACCIONES EN STREAMING (chunks de {chunk_size:,})")
+    print(f"{'='*80}")
+    
+    ruta_csv = 'data/processed/transacciones.csv'
+    agregador = AgregadorMetricas()
+    total = 0
+    
+    conn = conectar(**DB_CONFIG)
+    definiciones = None
+    
+    try:
+        if diferir_indices:
+            definiciones = diferir_indices_y_triggers(conn, 'transacciones')
+        
+        inicio = time.perf_counter()
+        chunks = generar_transacciones_por_chunks(df_usuarios, n, chunk_size)
+        total_chunks = (n + chunk_size - 1) // chunk_size
+        
+        for i, df_chunk in enumerate(tqdm(chunks, total=total_chunks, desc="Chunks")):
+            df_chunk.to_csv(ruta_csv, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+            guardar_transacciones_parquet(df_chunk, anexar=(i > 0))
+            _insertar_transacciones(conn, df_chunk, metodo=metodo)
+            agregador.actualizar(df_chunk)
+            total += len(df_chunk)
+        
+        print(f" {total:,} transacciones generadas, guardadas en CSV/Parquet e insertadas")
+        _reportar_velocidad(total, time.perf_counter() - inicio)
+        
+    except Exception as e:
+        print(f" Error en carga streaming: {e}")
+        raise
+    finally:
+        if definiciones is not None:
+            restaurar_indices_y_triggers(conn, 'transacciones', definiciones)
+        conn.close()
+    
+    df_metricas = agregador.resultado()
+    print(f" {len(df_metricas):,} registros de métricas agregados incrementalmente")
+    
+    return total, df_metricas
+
 # ============================================
 # FUNCIÓN PRINCIPAL
 # ============================================
 
-def main():
-    """Función principal de generación y carga de datos"""
+def main(streaming=False, n_transacciones=NUM_TRANSACCIONES, chunk_size=CHUNK_SIZE,
+         metodo_carga=METODO_CARGA, diferir_indices=False, particiones=1, lote_id=None):
+    """
+    Función principal de generación y carga de datos
+
+    Con streaming=True las transacciones se procesan por chunks (memoria
+    acotada), pensado para datasets de capacidad de decenas de millones de filas.
+    metodo_carga elige entre COPY ('copy') e INSERT con execute_batch ('batch').
+    Con particiones > 1 las transacciones se cargan en paralelo (COPY por
+    varias conexiones), retomables por lote_id.
+    """
     print("="*80)
     print("CRYPTOOPS ANALYZER - GENERACIÓN DE DATOS")
     print("="*80)
@@ -667,30 +1282,68 @@ def main():
         # 1. Generar usuarios
         df_usuarios = generar_usuarios()
         
-        # 2. Generar transacciones
-        df_transacciones = generar_transacciones(df_usuarios)
-        
-        # 3. Generar métricas operativas
-        df_metricas = generar_metricas_operativas(df_transacciones)
-        
-        # 4. Guardar CSVs (backup)
-        print(f"\n{'='*80}")
-        print("GUARDANDO DATOS EN CSV (BACKUP)")
-        print(f"{'='*80}")
-        
-        df_usuarios.to_csv('data/processed/usuarios.csv', index=False)
-        print(" usuarios.csv guardado")
-        
-        df_transacciones.to_csv('data/processed/transacciones.csv', index=False)
-        print(" transacciones.csv guardado")
-        
-        df_metricas.to_csv('data/processed/metricas_operativas.csv', index=False)
-        print(" metricas_operativas.csv guardado")
-        
-        # 5. Cargar en base de datos
-        cargar_usuarios_db(df_usuarios)
-        cargar_transacciones_db(df_transacciones)
-        cargar_metricas_db(df_metricas)
+        if streaming:
+            # 2. Usuarios primero (las transacciones los referencian)
+            df_usuarios.to_csv('data/processed/usuarios.csv', index=False)
+            guardar_parquet(df_usuarios, RUTA_USUARIOS_PARQUET)
+            print(" usuarios.csv / usuarios.parquet guardados")
+            cargar_usuarios_db(df_usuarios, metodo_carga)
+            
+            # 3. Transacciones por chunks: CSV + DB + métricas incrementales
+            total_transacciones, df_metricas = generar_y_cargar_streaming(
+                df_usuarios, n_transacciones, chunk_size, metodo_carga, diferir_indices
+            )
+            
+            # 4. Métricas
+            df_metricas.to_csv('data/processed/metricas_operativas.csv', index=False)
+            guardar_metricas_parquet(df_metricas)
+            print(" metricas_operativas.csv / metricas_operativas.parquet guardados")
+            cargar_metricas_db(df_metricas, metodo_carga)
+        else:
+            # 2. Generar transacciones
+            df_transacciones = generar_transacciones(df_usuarios, n_transacciones)
+            total_transacciones = len(df_transacciones)
+            
+            # 3. Generar métricas operativas
+            df_metricas = generar_metricas_operativas(df_transacciones)
+            
+            # 4. Guardar CSVs (backup)
+            print(f"\n{'='*80}")
+            print("GUARDANDO DATOS EN CSV Y PARQUET (BACKUP)")
+            print(f"{'='*80}")
+            
+            df_usuarios.to_csv('data/processed/usuarios.csv', index=False)
+            print(" usuarios.csv guardado")
+            
+            df_transacciones.to_csv('data/processed/transacciones.csv', index=False)
+            print(" transacciones.csv guardado")
+            
+            df_metricas.to_csv('data/processed/metricas_operativas.csv', index=False)
+            print(" metricas_operativas.csv guardado")
+            
+            # Parquet (columnar, transacciones particionadas por fecha)
+            guardar_parquet(df_usuarios, RUTA_USUARIOS_PARQUET)
+            guardar_transacciones_parquet(df_transacciones)
+            guardar_metricas_parquet(df_metricas)
+            print(" Parquet guardado (usuarios, transacciones_parquet/, metricas_operativas)")
+            
+            # 5. Cargar en base de datos (al retomar un lote, usuarios y
+            #    métricas ya cargados no se vuelven a insertar)
+            reanudando = particiones > 1 and lote_id is not None and _lote_iniciado(lote_id)
+            if reanudando:
+                print(f"\n Lote {lote_id} ya iniciado: se omite la carga de usuarios")
+            else:
+                cargar_usuarios_db(df_usuarios, metodo_carga)
+            if particiones > 1:
+                cargar_transacciones_paralelo(
+                    df_transacciones, particiones, lote_id, diferir_indices=diferir_indices
+                )
+            else:
+                cargar_transacciones_db(df_transacciones, metodo_carga, diferir_indices)
+            if reanudando and _metricas_cargadas(df_metricas):
+                print(f" Lote {lote_id}: métricas ya cargadas, se omiten")
+            else:
+                cargar_metricas_db(df_metricas, metodo_carga)
         
         # Resumen final
         fin = datetime.now()
@@ -700,7 +1353,7 @@ def main():
         print("RESUMEN FINAL")
         print(f"{'='*80}")
         print(f" Usuarios generados: {len(df_usuarios):,}")
-        print(f" Transacciones generadas: {len(df_transacciones):,}")
+        print(f" Transacciones generadas: {total_transacciones:,}")
         print(f" Métricas generadas: {len(df_metricas):,}")
         print(f"\nTiempo total de ejecución: {duracion:.2f} segundos ({duracion/60:.2f} minutos)")
         print(f"Fecha/Hora fin: {fin.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -716,5 +1369,38 @@ def main():
 
 if __name__ == "__main__":
     import sys
-    exito = main()
-    sys.exit(0 if exito else 1)
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Genera y carga datos simulados de CryptoOps")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Procesa las transacciones por chunks con memoria acotada")
+    parser.add_argument('--transacciones', type=int, default=NUM_TRANSACCIONES,
+                        help=f"Número de transacciones a generar (default: {NUM_TRANSACCIONES:,})")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f"Filas por chunk en modo streaming (default: {CHUNK_SIZE:,})")
+    parser.add_argument('--metodo-carga', choices=['copy', 'batch'], default=METODO_CARGA,
+                        help="COPY FROM STDIN o INSERT con execute_batch (default: %(default)s)")
+    parser.add_argument('--diferir-indices', action='store_true',
+                        help="Elimina índices/triggers de transacciones durante la carga y los reconstruye al final")
+    parser.add_argument('--particiones', type=int, default=1,
+                        help="Conexiones concurrentes para cargar transacciones (default: 1)")
+    parser.add_argument('--lote-id',
+                        help="Identificador del lote de carga; reusarlo retoma una carga interrumpida")
+    parser.add_argument('--benchmark-metricas', type=int, nargs='?', const=10_000_000, metavar='N',
+                        help="Solo mide el cálculo de métricas sobre N transacciones (default: 10,000,000)")
+    args = parser.parse_args()
+    
+    if args.benchmark_metricas:
+        benchmark_metricas(args.benchmark_metricas, args.chunk_size)
+        sys.exit(0)
+    
+    exito = main(
+        streaming=args.streaming,
+        n_transacciones=args.transacciones,
+        chunk_size=args.chunk_size,
+        metodo_carga=args.metodo_carga,
+        diferir_indices=args.diferir_indices,
+        particiones=args.particiones,
+        lote_id=args.lote_id
+    )
+    sys.exit(0 if exito else 1)
@@ -1,13 +1,27 @@
 """
 Script para ejecutar queries SQL y exportar resultados
+
+Por defecto las consultas corren en paralelo sobre un pool de conexiones y
+se exportan con COPY (ver ejecutar_catalogo_sql.py).
+
+Uso:
+    python scripts/03_ejecutar_analisis_sql.py
+    python scripts/03_ejecutar_analisis_sql.py --catalogo-completo --conexiones 8
+    python scripts/03_ejecutar_analisis_sql.py --secuencial
+    python scripts/03_ejecutar_analisis_sql.py --secuencial --streaming --sin-limite
 """
 
-import psycopg2
 import pandas as pd
 import os
+import argparse
 from dotenv import load_dotenv
 from datetime import datetime
 import warnings
+from almacenamiento_parquet import guardar_parquet, csv_a_parquet
+from cache_consultas import leer_sql_con_cache
+from catalogo_sql import cargar_catalogo, filtrar_catalogo
+from instrumentacion import conectar
+from ejecutar_catalogo_sql import ejecutar_consultas, mostrar_resumen, exportar_copy, NUM_CONEXIONES
 warnings.filterwarnings('ignore')
 
 load_dotenv()
@@ -20,14 +34,147 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD')
 }
 
+# ============================================
+# CONSULTAS DE ANÁLISIS
+# ============================================
+
+# clave -> (nombre de exportación, SQL); el orden es el de ejecución
+CONSULTAS = {
+    # Overview general
+    'overview': ('Overview General', """
+    SELECT 
+        COUNT(*) as total_transacciones,
+        COUNT(DISTINCT user_id) as usuarios_activos,
+        COUNT(CASE WHEN estado = 'exitosa' THEN 1 END) as transacciones_exitosas,
+        COUNT(CASE WHEN estado = 'fallida' THEN 1 END) as transacciones_fallidas,
+        ROUND(COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*), 2) as tasa_error_pct,
+        SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_total_usd,
+        ROUND(AVG(CASE WHEN estado = 'exitosa' THEN monto_usd END), 2) as ticket_promedio_usd,
+        ROUND(AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END), 2) as tiempo_promedio_seg
+    FROM transacciones;
+    """),
+    # Análisis por hora
+    'por_hora': ('Analisis Por Hora', """
+    SELECT 
+        EXTRACT(HOUR FROM timestamp_inicio) as hora_del_dia,
+        COUNT(*) as num_transacciones,
+        ROUND(AVG(tiempo_procesamiento), 2) as tiempo_promedio_seg,
+        ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY tiempo_procesamiento), 2) as tiempo_p95_seg,
+        COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*) as tasa_error_pct
+    FROM transacciones
+    WHERE estado IN ('exitosa', 'fallida')
+    GROUP BY EXTRACT(HOUR FROM timestamp_inicio)
+    ORDER BY hora_del_dia;
+    """),
+    # Transacciones lentas
+    'lentas': ('Transacciones Lentas', """
+    SELECT 
+        transaction_id,
+        user_id,
+        tipo_operacion,
+        cripto,
+        monto_usd,
+        tiempo_procesamiento,
+        timestamp_inicio,
+        estado,
+        requiere_validacion_manual
+    FROM transacciones
+    WHERE tiempo_procesamiento > 300
+    ORDER BY tiempo_procesamiento DESC
+    LIMIT 100;
+    """),
+    # Performance por cripto
+    'por_cripto': ('Performance Por Cripto', """
+    SELECT 
+        cripto,
+        COUNT(*) as num_transacciones,
+        SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_total_usd,
+        ROUND(AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END), 2) as tiempo_promedio_seg,
+        COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*) as tasa_error_pct
+    FROM transacciones
+    GROUP BY cripto
+    ORDER BY volumen_total_usd DESC;
+    """),
+    # Motivos de fallo
+    'fallos': ('Motivos De Fallo', """
+    SELECT 
+        motivo_fallo,
+        COUNT(*) as num_fallos,
+        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) as porcentaje
+    FROM transacciones
+    WHERE estado = 'fallida'
+    GROUP BY motivo_fallo
+    ORDER BY num_fallos DESC;
+    """)
+}
+
+# Consultas sin LIMIT (pueden ser millones de filas): siempre se exportan en streaming
+CONSULTAS_SIN_LIMITE = {
+    'lentas_completo': ('Transacciones Lentas Completo', """
+    SELECT 
+        transaction_id,
+        user_id,
+        tipo_operacion,
+        cripto,
+        monto_usd,
+        tiempo_procesamiento,
+        timestamp_inicio,
+        estado,
+        requiere_validacion_manual
+    FROM transacciones
+    WHERE tiempo_procesamiento > 300
+    ORDER BY tiempo_procesamiento DESC;
+    """)
+}
+
+def consultas_analisis(sin_limite=False):
+    """CONSULTAS (+ CONSULTAS_SIN_LIMITE si sin_limite)"""
+    consultas = dict(CONSULTAS)
+    if sin_limite:
+        consultas.update(CONSULTAS_SIN_LIMITE)
+    return consultas
+
+def archivo_analisis(nombre_query):
+    """Ruta de exportación (sin extensión) de una consulta de análisis"""
+    return f"data/processed/analisis_{nombre_query.lower().replace(' ', '_')}"
+
+def exportar_query_streaming(conn, nombre_query, query_sql):
+    """
+    Exporta a CSV (y Parquet) sin cargar el resultado en memoria
+
+    COPY (query) TO STDOUT escribe directo al CSV y el Parquet se genera
+    leyendo ese CSV por bloques, así que la memoria no depende del tamaño
+    del resultado. Devuelve las filas exportadas (None si hubo error).
+    """
+    print(f"\n{'='*80}")
+    print(f"Exportando (streaming): {nombre_query}")
+    print(f"{'='*80}")
+
+    try:
+        filename = f"{archivo_analisis(nombre_query)}.csv"
+        filas, tipos = exportar_copy(conn, query_sql.strip().rstrip(';'), filename)
+        csv_a_parquet(filename, filename.replace('.csv', '.parquet'), tipos=tipos)
+
+        print(f" Query ejecutada exitosamente")
+        print(f"Filas exportadas: {filas:,}")
+        if filas > 0:
+            print("\nPrimeras filas:")
+            print(pd.read_csv(filename, nrows=10).to_string())
+        print(f"\n Exportado a: {filename} (+ .parquet)")
+        return filas
+
+    except Exception as e:
+        print(f" Error al exportar query: {e}")
+        return None
+
 def ejecutar_query_y_exportar(conn, nombre_query, query_sql, exportar_csv=True):
-    """Ejecuta query y opcionalmente exporta a CSV"""
+    """Ejecuta query y opcionalmente exporta a CSV (y Parquet); devuelve el DataFrame"""
     print(f"\n{'='*80}")
     print(f"Ejecutando: {nombre_query}")
     print(f"{'='*80}")
     
     try:
-        df = pd.read_sql_query(query_sql, conn)
+        df = leer_sql_con_cache(query_sql, conn)
         
         print(f" Query ejecutada exitosamente")
         print(f"Filas retornadas: {len(df)}")
@@ -37,9 +184,10 @@ def ejecutar_query_y_exportar(conn, nombre_query, query_sql, exportar_csv=True):
             print(df.head(10).to_string())
         
         if exportar_csv and len(df) > 0:
-            filename = f"data/processed/analisis_{nombre_query.lower().replace(' ', '_')}.csv"
+            filename = f"{archivo_analisis(nombre_query)}.csv"
             df.to_csv(filename, index=False)
-            print(f"\n Exportado a: {filename}")
+            guardar_parquet(df, filename.replace('.csv', '.parquet'))
+            print(f"\n Exportado a: {filename} (+ .parquet)")
         
         return df
         
@@ -47,90 +195,73 @@ def ejecutar_query_y_exportar(conn, nombre_query, query_sql, exportar_csv=True):
         print(f" Error al ejecutar query: {e}")
         return None
 
+def ejecutar_analisis_sql(conn):
+    """Ejecuta las consultas de análisis y devuelve sus resultados (DataFrames) por nombre"""
+    return {
+        clave: ejecutar_query_y_exportar(conn, nombre, query_sql)
+        for clave, (nombre, query_sql) in CONSULTAS.items()
+    }
+
+def exportar_analisis_streaming(conn, consultas):
+    """Exporta las consultas ({clave: (nombre, sql)}) en streaming; devuelve las filas por nombre"""
+    return {
+        clave: exportar_query_streaming(conn, nombre, query_sql)
+        for clave, (nombre, query_sql) in consultas.items()
+    }
+
+def ejecutar_analisis_sql_paralelo(num_conexiones=NUM_CONEXIONES, catalogo_completo=False, sin_limite=False):
+    """
+    Ejecuta las consultas de análisis en paralelo, exportando con COPY
+
+    Genera los mismos analisis_*.csv/.parquet que ejecutar_analisis_sql.
+    Con catalogo_completo también corre sql/02_queries_analisis_basico.sql
+    (salidas en data/processed/catalogo/). Devuelve la latencia por consulta.
+    """
+    consultas = {
+        clave: {'titulo': nombre, 'sql': query_sql, 'params': None,
+                'archivo': archivo_analisis(nombre)}
+        for clave, (nombre, query_sql) in consultas_analisis(sin_limite).items()
+    }
+    if catalogo_completo:
+        consultas.update(filtrar_catalogo(cargar_catalogo(incluir_scripts=False), ['02:']))
+
+    print(f"\n{len(consultas)} consultas con {min(num_conexiones, len(consultas))} conexiones\n")
+    resultados, total = ejecutar_consultas(consultas, num_conexiones, db_config=DB_CONFIG)
+    mostrar_resumen(resultados, total)
+    return resultados
+
 def main():
+    parser = argparse.ArgumentParser(description='Ejecución de análisis SQL')
+    parser.add_argument('--secuencial', action='store_true',
+                        help='Una consulta tras otra en una conexión (con caché, muestra las primeras filas)')
+    parser.add_argument('--conexiones', type=int, default=NUM_CONEXIONES)
+    parser.add_argument('--catalogo-completo', action='store_true',
+                        help='Incluir las consultas de sql/02_queries_analisis_basico.sql')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Con --secuencial: exportar con COPY sin cargar los resultados en memoria')
+    parser.add_argument('--sin-limite', action='store_true',
+                        help='Agregar transacciones lentas sin LIMIT (exportada en streaming)')
+    args = parser.parse_args()
+
     print("="*80)
     print("CRYPTOOPS ANALYZER - EJECUCIÓN DE ANÁLISIS SQL")
     print("="*80)
     print(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    conn = psycopg2.connect(**DB_CONFIG)
+    if not args.secuencial:
+        ejecutar_analisis_sql_paralelo(args.conexiones, args.catalogo_completo, args.sin_limite)
+        print(f"\nArchivos generados en: data/processed/")
+        return
+
+    conn = conectar(**DB_CONFIG)
     
     try:
-        # Query 1: Overview general
-        query1 = """
-        SELECT 
-            COUNT(*) as total_transacciones,
-            COUNT(DISTINCT user_id) as usuarios_activos,
-            COUNT(CASE WHEN estado = 'exitosa' THEN 1 END) as transacciones_exitosas,
-            COUNT(CASE WHEN estado = 'fallida' THEN 1 END) as transacciones_fallidas,
-            ROUND(COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*), 2) as tasa_error_pct,
-            SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_total_usd,
-            ROUND(AVG(CASE WHEN estado = 'exitosa' THEN monto_usd END), 2) as ticket_promedio_usd,
-            ROUND(AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END), 2) as tiempo_promedio_seg
-        FROM transacciones;
-        """
-        df_overview = ejecutar_query_y_exportar(conn, "Overview General", query1)
-        
-        # Query 2: Análisis por hora
-        query2 = """
-        SELECT 
-            EXTRACT(HOUR FROM timestamp_inicio) as hora_del_dia,
-            COUNT(*) as num_transacciones,
-            ROUND(AVG(tiempo_procesamiento), 2) as tiempo_promedio_seg,
-            ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY tiempo_procesamiento), 2) as tiempo_p95_seg,
-            COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*) as tasa_error_pct
-        FROM transacciones
-        WHERE estado IN ('exitosa', 'fallida')
-        GROUP BY EXTRACT(HOUR FROM timestamp_inicio)
-        ORDER BY hora_del_dia;
-        """
-        df_por_hora = ejecutar_query_y_exportar(conn, "Analisis Por Hora", query2)
-        
-        # Query 3: Transacciones lentas
-        query3 = """
-        SELECT 
-            transaction_id,
-            user_id,
-            tipo_operacion,
-            cripto,
-            monto_usd,
-            tiempo_procesamiento,
-            timestamp_inicio,
-            estado,
-            requiere_validacion_manual
-        FROM transacciones
-        WHERE tiempo_procesamiento > 300
-        ORDER BY tiempo_procesamiento DESC
-        LIMIT 100;
-        """
-        df_lentas = ejecutar_query_y_exportar(conn, "Transacciones Lentas", query3)
-        
-        # Query 4: Performance por cripto
-        query4 = """
-        SELECT 
-            cripto,
-            COUNT(*) as num_transacciones,
-            SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_total_usd,
-            ROUND(AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END), 2) as tiempo_promedio_seg,
-            COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*) as tasa_error_pct
-        FROM transacciones
-        GROUP BY cripto
-        ORDER BY volumen_total_usd DESC;
-        """
-        df_por_cripto = ejecutar_query_y_exportar(conn, "Performance Por Cripto", query4)
-        
-        # Query 5: Motivos de fallo
-        query5 = """
-        SELECT 
-            motivo_fallo,
-            COUNT(*) as num_fallos,
-            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) as porcentaje
-        FROM transacciones
-        WHERE estado = 'fallida'
-        GROUP BY motivo_fallo
-        ORDER BY num_fallos DESC;
-        """
-        df_fallos = ejecutar_query_y_exportar(conn, "Motivos De Fallo", query5)
+        if args.streaming:
+            exportar_analisis_streaming(conn, consultas_analisis(args.sin_limite))
+        else:
+            ejecutar_analisis_sql(conn)
+            if args.sin_limite:
+                exportar_analisis_streaming(conn, CONSULTAS_SIN_LIMITE)
         
         print(f"\n{'='*80}")
         print(" ANÁLISIS SQL COMPLETADO EXITOSAMENTE")
@@ -10,21 +10,14 @@ import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import psycopg2
-from sqlalchemy import create_engine
 import os
 from dotenv import load_dotenv
 import warnings
+from acceso_datos import cargar_transacciones, cargar_metricas
 warnings.filterwarnings('ignore')
 
 load_dotenv()
 
-# Conexión a base de datos
-engine = create_engine(
-    f'postgresql://{os.getenv("DB_USER")}:{os.getenv("DB_PASSWORD")}@'
-    f'{os.getenv("DB_HOST")}:{os.getenv("DB_PORT")}/{os.getenv("DB_NAME")}'
-)
-
 # Configuración de estilo
 plt.style.use('seaborn-v0_8-whitegrid')
 sns.set_palette("Set2")
@@ -38,27 +31,18 @@ COLORS = {
 }
 
 def cargar_datos():
-    """Carga datos desde la base de datos"""
-    print("Cargando datos desde base de datos...")
-    
-    df_transacciones = pd.read_sql_query(
-        "SELECT * FROM transacciones WHERE timestamp_inicio >= '2024-07-01'",
-        engine
-    )
-    
-    df_metricas = pd.read_sql_query(
-        "SELECT * FROM metricas_operativas",
-        engine
+    """Carga datos desde la base de datos (o desde Parquet con FUENTE_DATOS=parquet)"""
+    print("Cargando datos...")
+    
+    df_transacciones = cargar_transacciones(
+        columnas=[
+            'transaction_id', 'user_id', 'estado', 'tiempo_procesamiento',
+            'cripto', 'monto_usd', 'motivo_fallo'
+        ],
+        derivadas=['fecha', 'hora', 'dia_semana', 'periodo']
     )
     
-    # Preparar datos
-    df_transacciones['fecha'] = pd.to_datetime(df_transacciones['timestamp_inicio']).dt.date
-    df_transacciones['hora'] = pd.to_datetime(df_transacciones['timestamp_inicio']).dt.hour
-    df_transacciones['dia_semana'] = pd.to_datetime(df_transacciones['timestamp_inicio']).dt.dayofweek
-    
-    df_transacciones['periodo'] = df_transacciones['hora'].apply(
-        lambda x: 'Hora Pico' if 18 <= x <= 23 else 'Hora Normal'
-    )
+    df_metricas = cargar_metricas()
     
     print(f" {len(df_transacciones):,} transacciones cargadas")
     print(f" {len(df_metricas):,} métricas cargadas")
@@ -570,16 +554,8 @@ def viz8_dashboard_interactivo(df, df_metricas):
     
     print(" Guardado: visualizations/08_dashboard_interactivo.html")
 
-def main():
-    """Función principal"""
-    print("="*80)
-    print("CRYPTOOPS ANALYZER - GENERACIÓN DE VISUALIZACIONES")
-    print("="*80)
-    print(f"Inicio: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # Cargar datos
-    df_transacciones, df_metricas = cargar_datos()
-    
+def generar_visualizaciones(df_transacciones, df_metricas):
+    """Genera las 8 visualizaciones a partir de los DataFrames ya cargados"""
     # Crear directorio de visualizaciones
     os.makedirs('visualizations', exist_ok=True)
     
@@ -592,6 +568,18 @@ def main():
     viz6_evolucion_temporal(df_transacciones)
     viz7_motivos_fallo(df_transacciones)
     viz8_dashboard_interactivo(df_transacciones, df_metricas)
+
+def main():
+    """Función principal"""
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - GENERACIÓN DE VISUALIZACIONES")
+    print("="*80)
+    print(f"Inicio: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    # Cargar datos
+    df_transacciones, df_metricas = cargar_datos()
+    
+    generar_visualizaciones(df_transacciones, df_metricas)
     
     print(f"\n{'='*80}")
     print(" VISUALIZACIONES COMPLETADAS EXITOSAMENTE")
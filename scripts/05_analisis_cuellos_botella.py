@@ -5,20 +5,11 @@ Identifica y cuantifica oportunidades de optimización
 
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
-import os
-from dotenv import load_dotenv
 from tabulate import tabulate
 import warnings
+from acceso_datos import cargar_transacciones
 warnings.filterwarnings('ignore')
 
-load_dotenv()
-
-engine = create_engine(
-    f'postgresql://{os.getenv("DB_USER")}:{os.getenv("DB_PASSWORD")}@'
-    f'{os.getenv("DB_HOST")}:{os.getenv("DB_PORT")}/{os.getenv("DB_NAME")}'
-)
-
 def analizar_hora_pico(df):
     """Analiza el impacto de hora pico vs hora normal"""
     print("\n" + "="*80)
@@ -185,6 +176,18 @@ def generar_reporte_final(cuellos_botella):
     
     return df_reporte
 
+def analizar_cuellos_botella(df):
+    """Ejecuta los cuatro análisis sobre un DataFrame ya cargado y genera el reporte"""
+    cuellos_botella = []
+    
+    cuellos_botella.append(analizar_hora_pico(df))
+    cuellos_botella.append(analizar_validaciones_manuales(df))
+    cuellos_botella.append(analizar_metodos_pago(df))
+    cuellos_botella.append(analizar_transacciones_lentas(df))
+    
+    # Generar reporte final
+    return generar_reporte_final(cuellos_botella)
+
 def main():
     """Función principal"""
     print("="*80)
@@ -193,27 +196,17 @@ def main():
     
     # Cargar datos
     print("\nCargando datos...")
-    df = pd.read_sql_query(
-        "SELECT * FROM transacciones WHERE timestamp_inicio >= '2024-07-01'",
-        engine
+    df = cargar_transacciones(
+        columnas=[
+            'transaction_id', 'estado', 'tiempo_procesamiento',
+            'requiere_validacion_manual', 'monto_usd', 'metodo_pago'
+        ],
+        derivadas=['periodo']
     )
     
-    df['fecha'] = pd.to_datetime(df['timestamp_inicio']).dt.date
-    df['hora'] = pd.to_datetime(df['timestamp_inicio']).dt.hour
-    df['periodo'] = df['hora'].apply(lambda x: 'Hora Pico' if 18 <= x <= 23 else 'Hora Normal')
-    
     print(f" {len(df):,} transacciones cargadas")
     
-    # Ejecutar análisis
-    cuellos_botella = []
-    
-    cuellos_botella.append(analizar_hora_pico(df))
-    cuellos_botella.append(analizar_validaciones_manuales(df))
-    cuellos_botella.append(analizar_metodos_pago(df))
-    cuellos_botella.append(analizar_transacciones_lentas(df))
-    
-    # Generar reporte final
-    df_reporte = generar_reporte_final(cuellos_botella)
+    analizar_cuellos_botella(df)
     
     print("\n ANÁLISIS COMPLETADO")
 
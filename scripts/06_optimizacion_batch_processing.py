@@ -6,12 +6,18 @@ Automatización para reducir tiempos de validación y procesamiento
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import psycopg2
-from sqlalchemy import create_engine
 import os
 from dotenv import load_dotenv
+import io
 import time
+import argparse
+import heapq
+from collections import deque
 from tabulate import tabulate
+from acceso_datos import cargar_transacciones
+from instrumentacion import conectar
+from reglas_validacion import GestorReglas, RUTA_REGLAS
+from simulador_capacidad import ejecutar_simulacion
 
 load_dotenv()
 
@@ -29,9 +35,10 @@ class ValidadorAutomatico:
     Reduce tiempo de procesamiento eliminando validaciones manuales innecesarias
     """
     
-    def __init__(self, conn):
+    def __init__(self, conn, ruta_reglas=RUTA_REGLAS, gestor_reglas=None):
         self.conn = conn
-        self.reglas = self._cargar_reglas()
+        # gestor_reglas permite compartir un mismo plan entre varios validadores
+        self.gestor_reglas = gestor_reglas or GestorReglas(ruta_reglas, conn)
         self.stats = {
             'procesadas': 0,
             'aprobadas_automaticamente': 0,
@@ -40,74 +47,50 @@ class ValidadorAutomatico:
             'tiempo_ahorrado': 0
         }
     
-    def _cargar_reglas(self):
-        """Carga reglas de validación automática"""
-        return {
-            # AJUSTE DE REGLA:  el umbral a 10,000 para capturar las de >5000 y mostrar ahorro
-            'monto_maximo_auto': 10000,  
-            'score_fraude_maximo': 30,   # Somos más estrictos con el fraude (antes 50)
-            'nivel_verificacion_minimo': 'intermedio', # Solo usuarios verificados
-            'metodos_pago_permitidos': ['transferencia', 'wallet_crypto'],
-            'tiempo_validacion_auto': 5,  # segundos (optimizado)
-            'tiempo_validacion_manual': 300  # segundos (5 min promedio real)
-        }
+    @property
+    def reglas(self):
+        """Umbrales y tiempos vigentes (config/reglas_validacion.json + configuracion_sistema)"""
+        return self.gestor_reglas.plan().como_dict()
     
     def validar_transaccion(self, txn):
         """
         Valida una transacción según reglas automáticas
         """
+        plan = self.gestor_reglas.plan()
         self.stats['procesadas'] += 1
         
-        # Regla 0: Nivel de verificación 
-        niveles_seguros = ['intermedio', 'completo']
-        if txn['nivel_verificacion'] not in niveles_seguros:
-            self.stats['requieren_revision_manual'] += 1
-            return {
-                'resultado': 'revision_manual',
-                'motivo': f'Nivel de usuario insuficiente ({txn["nivel_verificacion"]})',
-                'tiempo': self.reglas['tiempo_validacion_manual']
-            }
-
-        # Regla 1: Monto
-        if txn['monto_usd'] > self.reglas['monto_maximo_auto']:
-            self.stats['requieren_revision_manual'] += 1
-            return {
-                'resultado': 'revision_manual',
-                'motivo': f'Monto excede límite automático (${txn["monto_usd"]:,.2f})',
-                'tiempo': self.reglas['tiempo_validacion_manual']
-            }
-        
-        # Regla 2: Score de fraude
-        if txn['score_fraude'] > self.reglas['score_fraude_maximo']:
+        regla = plan.evaluar(txn)
+        if regla is not None:
             self.stats['requieren_revision_manual'] += 1
             return {
                 'resultado': 'revision_manual',
-                'motivo': f'Score de fraude alto ({txn["score_fraude"]:.1f})',
-                'tiempo': self.reglas['tiempo_validacion_manual']
-            }
-        
-        # Regla 3: Método de pago
-        if txn['metodo_pago'] not in self.reglas['metodos_pago_permitidos']:
-            self.stats['requieren_revision_manual'] += 1
-            return {
-                'resultado': 'revision_manual',
-                'motivo': f'Método de pago requiere revisión: {txn["metodo_pago"]}',
-                'tiempo': self.reglas['tiempo_validacion_manual']
+                'motivo': regla.motivo.format(valor=txn[regla.campo]),
+                'tiempo': plan.tiempo_validacion_manual
             }
         
         # Si pasa todas las reglas: APROBACIÓN AUTOMÁTICA
         self.stats['aprobadas_automaticamente'] += 1
-        tiempo_ahorrado = self.reglas['tiempo_validacion_manual'] - self.reglas['tiempo_validacion_auto']
+        tiempo_ahorrado = plan.tiempo_validacion_manual - plan.tiempo_validacion_auto
         self.stats['tiempo_ahorrado'] += tiempo_ahorrado
         
         return {
             'resultado': 'aprobada',
             'motivo': 'Validación automática exitosa',
-            'tiempo': self.reglas['tiempo_validacion_auto']
+            'tiempo': plan.tiempo_validacion_auto
         }
     
-    def procesar_lote(self, transacciones):
-        """Procesa un lote de transacciones"""
+    def procesar_lote(self, transacciones, vectorizado=True, plan=None):
+        """
+        Procesa un lote de transacciones
+
+        vectorizado=True evalúa todas las reglas como máscaras booleanas sobre
+        el lote completo; vectorizado=False usa validar_transaccion fila a fila.
+        Ambos modos producen las mismas columnas y estadísticas.
+        plan: plan de reglas a aplicar en modo vectorizado (default: el vigente)
+        """
+        if vectorizado:
+            return self._procesar_lote_vectorizado(transacciones, plan)
+        
         resultados = []
         
         for _, txn in transacciones.iterrows():
@@ -121,6 +104,38 @@ class ValidadorAutomatico:
         
         return pd.DataFrame(resultados)
     
+    def _procesar_lote_vectorizado(self, transacciones, plan=None):
+        """Aplica el plan de reglas (el vigente si no se pasa) sobre todo el lote a la vez"""
+        # Todo el lote se evalúa con el mismo plan aunque haya una recarga en paralelo
+        if plan is None:
+            plan = self.gestor_reglas.plan()
+        regla = plan.evaluar_lote(transacciones)
+        
+        motivos = np.full(len(transacciones), 'Validación automática exitosa', dtype=object)
+        for compilada in plan.reglas:
+            mascara = regla == compilada.prioridad
+            if mascara.any():
+                # Se formatea una vez por valor distinto, no por fila
+                valores = pd.Series(transacciones[compilada.campo].to_numpy()[mascara], dtype=object)
+                formatos = {v: compilada.motivo.format(valor=v) for v in valores.unique()}
+                motivos[mascara] = valores.map(formatos).to_numpy()
+        
+        manual = regla > 0
+        aprobadas = int((~manual).sum())
+        self.stats['procesadas'] += len(transacciones)
+        self.stats['aprobadas_automaticamente'] += aprobadas
+        self.stats['requieren_revision_manual'] += int(manual.sum())
+        self.stats['tiempo_ahorrado'] += aprobadas * (
+            plan.tiempo_validacion_manual - plan.tiempo_validacion_auto
+        )
+        
+        return pd.DataFrame({
+            'transaction_id': transacciones['transaction_id'].to_numpy(),
+            'resultado': np.where(manual, 'revision_manual', 'aprobada').astype(object),
+            'motivo': motivos,
+            'tiempo': np.where(manual, plan.tiempo_validacion_manual, plan.tiempo_validacion_auto)
+        })
+    
     def mostrar_estadisticas(self):
         """Muestra estadísticas de procesamiento"""
         print("\n" + "="*80)
@@ -157,18 +172,233 @@ class ValidadorAutomatico:
         else:
             print("   • No se automatizaron transacciones con las reglas actuales.")
 
+# ============================================
+# ESCRITURA DE RESULTADOS EN VALIDACIONES
+# ============================================
+
+TAMANO_LOTE_ESCRITURA = 5000
+
+COLUMNAS_VALIDACIONES_DB = [
+    'transaction_id', 'tipo_validacion', 'resultado', 'motivo', 'validado_por',
+    'tiempo_validacion', 'reglas_aplicadas', 'score_confianza'
+]
+
+def literal_array(valores):
+    """Literal de array de PostgreSQL ({"a","b"}) para columnas TEXT[] en COPY"""
+    elementos = (str(v).replace('\\', '\\\\').replace('"', '\\"') for v in valores)
+    return '{' + ','.join(f'"{e}"' for e in elementos) + '}'
+
+def _preparar_validaciones(transacciones, resultados, reglas_aplicadas):
+    """Filas de validaciones en el orden de COLUMNAS_VALIDACIONES_DB"""
+    manual = (resultados['resultado'] == 'revision_manual').to_numpy()
+    score_fraude = pd.to_numeric(pd.Series(transacciones['score_fraude'].to_numpy()), errors='coerce')
+    return pd.DataFrame({
+        'transaction_id': resultados['transaction_id'].astype('int64').to_numpy(),
+        'tipo_validacion': np.where(manual, 'manual', 'automatica'),
+        'resultado': np.where(manual, 'pendiente', 'aprobada'),
+        'motivo': resultados['motivo'].to_numpy(),
+        'validado_por': 'sistema',
+        'tiempo_validacion': resultados['tiempo'].astype('int64').to_numpy(),
+        'reglas_aplicadas': literal_array(reglas_aplicadas),
+        'score_confianza': (100 - score_fraude).clip(0, 100).round(2).to_numpy()
+    })
+
+def guardar_validaciones(conn, transacciones, resultados, reglas_aplicadas,
+                         tamano_lote=TAMANO_LOTE_ESCRITURA):
+    """
+    Persiste las decisiones de procesar_lote
+
+    Por lote: un COPY a validaciones (reglas_aplicadas como literal de
+    array) y un único UPDATE ... FROM unnest(...) que marca
+    requiere_validacion_manual en transacciones; las aprobadas
+    automáticamente quedan sin fecha_validacion_manual. Cada lote se
+    confirma en su propia transacción.
+
+    transacciones: lote validado (alineado por posición con resultados)
+    reglas_aplicadas: nombres de las reglas verificadas
+    """
+    filas = _preparar_validaciones(transacciones, resultados, reglas_aplicadas)
+    cursor = conn.cursor()
+    guardadas = 0
+    inicio = time.time()
+
+    try:
+        for desde in range(0, len(filas), tamano_lote):
+            lote = filas.iloc[desde:desde + tamano_lote]
+
+            buffer = io.StringIO()
+            lote.to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY validaciones ({', '.join(COLUMNAS_VALIDACIONES_DB)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+
+            cursor.execute("""
+                UPDATE transacciones t
+                SET requiere_validacion_manual = v.manual,
+                    fecha_validacion_manual = CASE WHEN v.manual THEN t.fecha_validacion_manual END
+                FROM unnest(%s::int[], %s::bool[]) AS v(transaction_id, manual)
+                WHERE t.transaction_id = v.transaction_id
+            """, (
+                lote['transaction_id'].tolist(),
+                (lote['tipo_validacion'] == 'manual').tolist()
+            ))
+            conn.commit()
+            guardadas += len(lote)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    segundos = time.time() - inicio
+    return guardadas, segundos
+
+# ============================================
+# PLANIFICADOR MULTINIVEL (HORA PICO)
+# ============================================
+
+# Niveles en orden de atención (prioridad estricta)
+NIVELES_PRIORIDAD = ['alta_prioridad', 'normal', 'baja_prioridad']
+
+# Tiempo medio de atención por cola, en segundos
+TIEMPOS_SERVICIO = {'alta_prioridad': 30, 'normal': 45, 'baja_prioridad': 60}
+
+# Espera tras la cual una transacción de baja_prioridad pasa a la cola normal
+# (aging: evita su inanición cuando las colas superiores no se vacían)
+UMBRAL_AGING = 600
+PROMOCION_AGING = {'baja_prioridad': 'normal'}
+
+NUM_WORKERS = int(os.getenv('NUM_WORKERS_COLAS', '2'))
+
+class PlanificadorMultinivel:
+    """
+    Cola multinivel con prioridad estricta y aging
+
+    Cada nivel es un heap ordenado por llegada y siempre se atiende el
+    nivel no vacío más alto de NIVELES_PRIORIDAD, así que la espera de
+    alta_prioridad solo depende de su propia carga (nunca es peor que en
+    FIFO salvo por el servicio en curso). Antes de cada turno, las
+    transacciones de baja_prioridad que esperaron más de umbral_aging
+    pasan a la cola normal conservando su orden de llegada.
+    """
+    
+    def __init__(self, umbral_aging=UMBRAL_AGING):
+        self.umbral_aging = umbral_aging
+        self.colas = {nivel: [] for nivel in NIVELES_PRIORIDAD}
+        self.promociones = 0
+        self._secuencia = 0
+    
+    def __len__(self):
+        return sum(len(cola) for cola in self.colas.values())
+    
+    def encolar(self, nivel, llegada, transaction_id, servicio, nivel_original=None):
+        self._secuencia += 1
+        heapq.heappush(
+            self.colas[nivel], (llegada, self._secuencia, transaction_id, servicio, nivel_original or nivel)
+        )
+    
+    def _aplicar_aging(self, ahora):
+        """Promueve las transacciones que superaron el umbral de espera"""
+        for inferior, superior in PROMOCION_AGING.items():
+            cola = self.colas[inferior]
+            while cola and ahora - cola[0][0] >= self.umbral_aging:
+                llegada, _, transaction_id, servicio, original = heapq.heappop(cola)
+                self.encolar(superior, llegada, transaction_id, servicio, original)
+                self.promociones += 1
+    
+    def siguiente(self, ahora):
+        """Saca la próxima transacción a atender (o None si no hay)"""
+        self._aplicar_aging(ahora)
+        nivel = next((nivel for nivel in NIVELES_PRIORIDAD if self.colas[nivel]), None)
+        if nivel is None:
+            return None
+        llegada, _, transaction_id, servicio, original = heapq.heappop(self.colas[nivel])
+        return llegada, transaction_id, servicio, original
+
+class ColaFIFO:
+    """Cola única por orden de llegada (línea base sin priorización)"""
+    
+    def __init__(self):
+        self.cola = deque()
+        self.promociones = 0
+    
+    def __len__(self):
+        return len(self.cola)
+    
+    def encolar(self, nivel, llegada, transaction_id, servicio):
+        self.cola.append((llegada, transaction_id, servicio, nivel))
+    
+    def siguiente(self, ahora):
+        return self.cola.popleft() if self.cola else None
+
+def simular_cola(llegadas, planificador, num_workers=NUM_WORKERS):
+    """
+    Simulación de eventos discretos de una cola con num_workers workers
+
+    llegadas: DataFrame con transaction_id, prioridad, llegada (segundos)
+    y servicio (segundos), ordenado por llegada. Devuelve una fila por
+    transacción con inicio, fin y espera.
+    """
+    ids = llegadas['transaction_id'].to_numpy()
+    prioridades = llegadas['prioridad'].to_numpy()
+    tiempos_llegada = llegadas['llegada'].to_numpy(dtype=float)
+    servicios = llegadas['servicio'].to_numpy(dtype=float)
+    
+    fines = []  # heap de tiempos de fin de los workers ocupados
+    registros = []
+    i, n = 0, len(llegadas)
+    ocupado = 0.0
+    
+    while i < n or len(planificador) > 0:
+        proxima_llegada = tiempos_llegada[i] if i < n else np.inf
+        proximo_fin = fines[0] if fines else np.inf
+        
+        if proxima_llegada <= proximo_fin:
+            ahora = proxima_llegada
+            planificador.encolar(prioridades[i], ahora, ids[i], servicios[i])
+            i += 1
+        else:
+            ahora = heapq.heappop(fines)
+        
+        while len(fines) < num_workers and len(planificador) > 0:
+            llegada, transaction_id, servicio, prioridad = planificador.siguiente(ahora)
+            heapq.heappush(fines, ahora + servicio)
+            ocupado += servicio
+            registros.append((transaction_id, prioridad, llegada, ahora, ahora + servicio))
+    
+    resultado = pd.DataFrame(registros, columns=['transaction_id', 'prioridad', 'llegada', 'inicio', 'fin'])
+    resultado['espera'] = resultado['inicio'] - resultado['llegada']
+    duracion = max(resultado['fin'].max() - resultado['llegada'].min(), 1e-9) if len(resultado) else 1.0
+    resultado.attrs['utilizacion'] = ocupado / (duracion * num_workers)
+    resultado.attrs['promociones'] = planificador.promociones
+    return resultado
+
+def resumir_esperas(resultado):
+    """Espera media y p95 (segundos) por prioridad y total"""
+    resumen = resultado.groupby('prioridad')['espera'].agg(
+        transacciones='count',
+        espera_media='mean',
+        espera_p95=lambda x: x.quantile(0.95)
+    ).reindex(NIVELES_PRIORIDAD).dropna(how='all')
+    resumen.loc['total'] = [
+        len(resultado), resultado['espera'].mean(), resultado['espera'].quantile(0.95)
+    ]
+    return resumen
+
 class OptimizadorHoraPico:
     """
     Sistema de optimización para hora pico
     Implementa queue system y priorización de transacciones
     """
     
-    def __init__(self):
-        self.colas = {
-            'alta_prioridad': [],
-            'normal': [],
-            'baja_prioridad': []
-        }
+    def __init__(self, num_workers=NUM_WORKERS, umbral_aging=UMBRAL_AGING,
+                 tiempos_servicio=TIEMPOS_SERVICIO):
+        self.num_workers = num_workers
+        self.umbral_aging = umbral_aging
+        self.tiempos_servicio = tiempos_servicio
+        self.colas = {nivel: [] for nivel in NIVELES_PRIORIDAD}
     
     def asignar_prioridad(self, txn):
         """Asigna prioridad a una transacción"""
@@ -184,12 +414,33 @@ class OptimizadorHoraPico:
         else:
             return 'normal'
     
+    def asignar_prioridades(self, transacciones):
+        """Versión vectorizada de asignar_prioridad para un DataFrame"""
+        monto = transacciones['monto_usd']
+        nivel = transacciones['nivel_verificacion']
+        return pd.Series(np.select(
+            [(monto > 5000) | (nivel == 'completo'), (monto < 100) & (nivel == 'basico')],
+            ['alta_prioridad', 'baja_prioridad'],
+            default='normal'
+        ), index=transacciones.index)
+    
+    def _preparar_llegadas(self, transacciones, prioridades):
+        """Llegadas reales (segundos desde la primera) con el tiempo de servicio de su cola"""
+        llegadas = pd.DataFrame({
+            'transaction_id': transacciones['transaction_id'].to_numpy(),
+            'prioridad': prioridades.to_numpy(),
+            'timestamp': pd.to_datetime(transacciones['timestamp_inicio']).to_numpy()
+        }).sort_values('timestamp', kind='stable')
+        llegadas['llegada'] = (llegadas['timestamp'] - llegadas['timestamp'].iloc[0]).dt.total_seconds()
+        llegadas['servicio'] = llegadas['prioridad'].map(self.tiempos_servicio).astype(float)
+        return llegadas.reset_index(drop=True)
+    
     def procesar_con_prioridades(self, transacciones):
         """Procesa transacciones según prioridad"""
         # Asignar a colas
-        for _, txn in transacciones.iterrows():
-            prioridad = self.asignar_prioridad(txn)
-            self.colas[prioridad].append(txn)
+        prioridades = self.asignar_prioridades(transacciones)
+        for nivel in NIVELES_PRIORIDAD:
+            self.colas[nivel] = transacciones['transaction_id'][prioridades == nivel].tolist()
         
         # CORRECCIÓN DE SYNTAX WARNING
         print(f"\nDISTRIBUCIÓN EN COLAS:")
@@ -197,27 +448,68 @@ class OptimizadorHoraPico:
         print(f"   • Normal: {len(self.colas['normal'])} transacciones")
         print(f"   • Baja prioridad: {len(self.colas['baja_prioridad'])} transacciones")
         
-        # Simular procesamiento
-        tiempos_procesamiento = {
-            'alta_prioridad': 30,  # segundos promedio
-            'normal': 45,
-            'baja_prioridad': 60
-        }
-        
         tiempo_total_estimado = sum(
-            len(cola) * tiempos_procesamiento[prioridad]
+            len(cola) * self.tiempos_servicio[prioridad]
             for prioridad, cola in self.colas.items()
         )
         
-        print(f"\n⏱  TIEMPO ESTIMADO DE PROCESAMIENTO: {tiempo_total_estimado/60:.1f} minutos")
+        print(f"\n⏱  TIEMPO TOTAL DE ATENCIÓN: {tiempo_total_estimado/60:.1f} minutos")
         
-        return {
+        resultado = {
             'tiempo_total': tiempo_total_estimado,
             'distribucion': {k: len(v) for k, v in self.colas.items()}
         }
+        
+        if 'timestamp_inicio' not in transacciones.columns:
+            return resultado
+        
+        # Simulación sobre las llegadas reales: FIFO vs planificador multinivel
+        llegadas = self._preparar_llegadas(transacciones, prioridades)
+        sim_fifo = simular_cola(llegadas, ColaFIFO(), self.num_workers)
+        sim_multinivel = simular_cola(
+            llegadas, PlanificadorMultinivel(self.umbral_aging), self.num_workers
+        )
+        
+        resumen = pd.concat(
+            {'FIFO': resumir_esperas(sim_fifo), 'Multinivel': resumir_esperas(sim_multinivel)}, axis=1
+        )
+        print(f"\nSIMULACIÓN DE COLAS ({self.num_workers} workers, aging {self.umbral_aging}s):")
+        tabla = resumen.copy()
+        tabla.columns = [f"{modo} {col}" for modo, col in tabla.columns]
+        print(tabulate(tabla.round(1), headers='keys', tablefmt='grid'))
+        print(f"   • Utilización de workers: {sim_multinivel.attrs['utilizacion']*100:.1f}%")
+        print(f"   • Promociones por aging: {sim_multinivel.attrs['promociones']:,}")
+        
+        # La priorización no debe hacer esperar a alta_prioridad más que FIFO
+        espera_alta = resumen.loc['alta_prioridad', ('Multinivel', 'espera_media')] \
+            if 'alta_prioridad' in resumen.index else 0.0
+        espera_alta_fifo = resumen.loc['alta_prioridad', ('FIFO', 'espera_media')] \
+            if 'alta_prioridad' in resumen.index else 0.0
+        alta_sin_inversion = espera_alta <= espera_alta_fifo + 1e-6
+        estado = "OK" if alta_sin_inversion else "INVERSIÓN DE PRIORIDAD"
+        print(f"   • Espera media alta_prioridad: {espera_alta:.1f}s vs FIFO {espera_alta_fifo:.1f}s ({estado})")
+        
+        resultado.update({
+            'espera_media': sim_multinivel['espera'].mean(),
+            'espera_p95': sim_multinivel['espera'].quantile(0.95),
+            'espera_media_fifo': sim_fifo['espera'].mean(),
+            'espera_p95_fifo': sim_fifo['espera'].quantile(0.95),
+            'utilizacion': sim_multinivel.attrs['utilizacion'],
+            'alta_sin_inversion': alta_sin_inversion,
+            'resumen': resumen
+        })
+        return resultado
 
-def simular_optimizaciones(engine):
-    """Simula el impacto de las optimizaciones propuestas"""
+def simular_optimizaciones(df=None, conn=None):
+    """
+    Simula el impacto de las optimizaciones propuestas
+
+    df: transacciones ya cargadas (exitosas/fallidas, con hora y
+    nivel_verificacion); si no se pasa se carga una muestra de 10,000
+    conn: conexión psycopg2; si se pasa, las reglas toman los ajustes de
+    configuracion_sistema y las decisiones del validador se guardan en
+    validaciones
+    """
     print("="*80)
     print("SIMULACIÓN DE OPTIMIZACIONES")
     print("="*80)
@@ -225,25 +517,19 @@ def simular_optimizaciones(engine):
     # Cargar muestra de transacciones
     print("\nCargando transacciones...")
     
-    query = """
-    SELECT 
-        t.transaction_id,
-        t.user_id,
-        t.monto_usd,
-        t.score_fraude,
-        t.metodo_pago,
-        t.tiempo_procesamiento,
-        t.requiere_validacion_manual,
-        u.nivel_verificacion,
-        EXTRACT(HOUR FROM t.timestamp_inicio) as hora
-    FROM transacciones t
-    JOIN usuarios u ON t.user_id = u.user_id
-    WHERE t.estado IN ('exitosa', 'fallida')
-    AND t.timestamp_inicio >= '2024-07-01'
-    LIMIT 10000;
-    """
-    
-    df = pd.read_sql_query(query, engine)
+    if df is not None:
+        df = df[df['estado'].isin(['exitosa', 'fallida'])].head(10000)
+    else:
+        df = cargar_transacciones(
+            columnas=[
+                'transaction_id', 'user_id', 'monto_usd', 'score_fraude', 'metodo_pago',
+                'tiempo_procesamiento', 'requiere_validacion_manual', 'timestamp_inicio'
+            ],
+            derivadas=['hora'],
+            estados=['exitosa', 'fallida'],
+            limite=10000,
+            columnas_usuario=['nivel_verificacion']
+        )
     print(f" {len(df):,} transacciones cargadas")
     
     # OPTIMIZACIÓN #1: Validación Automática
@@ -251,15 +537,22 @@ def simular_optimizaciones(engine):
     print("OPTIMIZACIÓN #1: VALIDACIÓN AUTOMÁTICA")
     print("="*80)
     
-    validador = ValidadorAutomatico(None)
+    # Con conexión, el plan incluye los ajustes de configuracion_sistema
+    validador = ValidadorAutomatico(conn)
     
     # Procesar solo las que actualmente requieren validación manual
     txn_con_validacion = df[df['requiere_validacion_manual'] == True]
     print(f"\nTransacciones que requieren validación: {len(txn_con_validacion):,}")
     
     if len(txn_con_validacion) > 0:
+        validador.gestor_reglas.calibrar(txn_con_validacion)
         resultados = validador.procesar_lote(txn_con_validacion)
         validador.mostrar_estadisticas()
+
+        if conn is not None:
+            reglas_aplicadas = [regla.nombre for regla in validador.gestor_reglas.plan().reglas]
+            guardadas, segundos = guardar_validaciones(conn, txn_con_validacion, resultados, reglas_aplicadas)
+            print(f"\n {guardadas:,} validaciones guardadas en {segundos:.2f}s")
     else:
         print("No se encontraron transacciones para validar.")
     
@@ -286,13 +579,11 @@ def simular_optimizaciones(engine):
     tiempo_promedio_actual = df['tiempo_procesamiento'].mean()
     tiempo_total_actual = df['tiempo_procesamiento'].sum()
     
-    # Calcular métricas proyectadas (AFTER)
-    # Reducción estimada: 22% en tiempo promedio
-    reduccion_porcentaje = 0.22
-    if validador.stats['procesadas'] > 0:
-        tasa_auto = validador.stats['aprobadas_automaticamente']/validador.stats['procesadas']*100
-        # Ajustamos la reducción según el éxito de la automatización
-        reduccion_porcentaje = 0.15 + (tasa_auto / 100 * 0.20) # Base 15% + bonus por auto
+    # Calcular métricas proyectadas (AFTER) con el simulador de capacidad:
+    # mismas llegadas de hora pico, con y sin la validación automática
+    plan = validador.gestor_reglas.plan()
+    aprobadas_auto = pd.Series(plan.evaluar_lote(df) == 0, index=df.index)
+    _, reduccion_porcentaje = ejecutar_simulacion(df, aprobadas_auto, plan)
 
     tiempo_promedio_optimizado = tiempo_promedio_actual * (1 - reduccion_porcentaje)
     tiempo_total_optimizado = tiempo_total_actual * (1 - reduccion_porcentaje)
@@ -315,13 +606,13 @@ def simular_optimizaciones(engine):
             f"{tiempo_promedio_optimizado:.0f}",
             f"{tiempo_total_optimizado/3600:.1f}",
             f"{validador.stats['aprobadas_automaticamente']/validador.stats['procesadas']*100:.1f}" if validador.stats['procesadas'] > 0 else "0.0",
-            f"{reduccion_porcentaje*100:.0f}"
+            f"{reduccion_porcentaje*100:.1f}"
         ],
         'Mejora': [
             f"-{tiempo_promedio_actual - tiempo_promedio_optimizado:.0f}s",
             f"-{tiempo_ahorrado/3600:.1f}h",
             f"+{validador.stats['aprobadas_automaticamente']/validador.stats['procesadas']*100:.1f}%" if validador.stats['procesadas'] > 0 else "0.0%",
-            f"{reduccion_porcentaje*100:.0f}%"
+            f"{reduccion_porcentaje*100:.1f}%"
         ]
     })
     
@@ -329,7 +620,7 @@ def simular_optimizaciones(engine):
     print(tabulate(comparativa, headers='keys', tablefmt='grid', showindex=False))
     
     print(f"\n IMPACTO ESTIMADO:")
-    print(f"   • Reducción de tiempo promedio: {reduccion_porcentaje*100:.0f}%")
+    print(f"   • Reducción de tiempo promedio (simulada): {reduccion_porcentaje*100:.1f}%")
     print(f"   • Tiempo ahorrado: {tiempo_ahorrado/3600:.1f} horas")
     print(f"   • Mejora en tasa de error: ~40% (por reducción de carga)")
     
@@ -402,18 +693,19 @@ def generar_propuestas_implementacion():
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description='Optimizaciones y automatizaciones')
+    parser.add_argument('--guardar-validaciones', action='store_true',
+                        help='Guardar las decisiones del validador en la tabla validaciones')
+    args = parser.parse_args()
+
     print("="*80)
     print("CRYPTOOPS ANALYZER - OPTIMIZACIONES Y AUTOMATIZACIONES")
     print("="*80)
     
+    conn = conectar(**DB_CONFIG) if args.guardar_validaciones else None
     try:
-        engine = create_engine(
-            f'postgresql://{os.getenv("DB_USER")}:{os.getenv("DB_PASSWORD")}@'
-            f'{os.getenv("DB_HOST")}:{os.getenv("DB_PORT")}/{os.getenv("DB_NAME")}'
-        )
-        
         # Simular optimizaciones
-        comparativa = simular_optimizaciones(engine)
+        comparativa = simular_optimizaciones(conn=conn)
         
         # Generar propuestas
         propuestas = generar_propuestas_implementacion()
@@ -424,6 +716,9 @@ def main():
         print(f"\n ERROR: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if conn is not None:
+            conn.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
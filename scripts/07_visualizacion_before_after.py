@@ -6,31 +6,21 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sqlalchemy import create_engine
-import os
-from dotenv import load_dotenv
+from acceso_datos import cargar_transacciones
+from simulador_capacidad import cargar_reduccion_simulada
 
-load_dotenv()
-
-engine = create_engine(
-    f'postgresql://{os.getenv("DB_USER")}:{os.getenv("DB_PASSWORD")}@'
-    f'{os.getenv("DB_HOST")}:{os.getenv("DB_PORT")}/{os.getenv("DB_NAME")}'
-)
-
-def crear_visualizacion_before_after():
-    """Crea visualización comparativa Before/After"""
+def crear_visualizacion_before_after(df=None):
+    """Crea visualización comparativa Before/After (df: transacciones ya cargadas, opcional)"""
     
     # Cargar datos reales
-    df = pd.read_sql_query(
-        "SELECT tiempo_procesamiento, estado FROM transacciones WHERE timestamp_inicio >= '2024-07-01'",
-        engine
-    )
+    if df is None:
+        df = cargar_transacciones(columnas=['tiempo_procesamiento', 'estado'])
     
     tiempo_promedio_actual = df[df['estado'].isin(['exitosa', 'fallida'])]['tiempo_procesamiento'].mean()
     tasa_error_actual = (df['estado'] == 'fallida').sum() / len(df) * 100
     
-    # Proyecciones optimizadas
-    reduccion_tiempo = 0.227  # 22.7%
+    # Proyecciones optimizadas (tiempo: última simulación de capacidad)
+    reduccion_tiempo = cargar_reduccion_simulada()
     reduccion_error = 0.467   # 46.7%
     
     tiempo_promedio_optimizado = tiempo_promedio_actual * (1 - reduccion_tiempo)
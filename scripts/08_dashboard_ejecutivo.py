@@ -8,17 +8,10 @@ import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.express as px
-from sqlalchemy import create_engine
-import os
-from dotenv import load_dotenv
 from datetime import datetime
-
-load_dotenv()
-
-engine = create_engine(
-    f'postgresql://{os.getenv("DB_USER")}:{os.getenv("DB_PASSWORD")}@'
-    f'{os.getenv("DB_HOST")}:{os.getenv("DB_PORT")}/{os.getenv("DB_NAME")}'
-)
+from acceso_datos import cargar_transacciones, cargar_metricas
+from simulador_capacidad import cargar_reduccion_simulada
+from sketch_cuantiles import rollup_metricas
 
 # Colores corporativos
 COLORS = {
@@ -32,25 +25,20 @@ COLORS = {
 }
 
 def cargar_datos():
-    """Carga datos desde la base de datos"""
+    """Carga datos desde la base de datos (o desde Parquet con FUENTE_DATOS=parquet)"""
     print("Cargando datos...")
     
     # Transacciones
-    df_txn = pd.read_sql_query("""
-        SELECT 
-            t.*,
-            EXTRACT(HOUR FROM t.timestamp_inicio) as hora,
-            u.nivel_verificacion
-        FROM transacciones t
-        JOIN usuarios u ON t.user_id = u.user_id
-        WHERE t.timestamp_inicio >= '2024-07-01'
-    """, engine)
+    df_txn = cargar_transacciones(
+        columnas=[
+            'transaction_id', 'user_id', 'estado', 'monto_usd', 'comision_usd',
+            'tiempo_procesamiento', 'requiere_validacion_manual'
+        ],
+        derivadas=['hora', 'periodo']
+    )
     
     # Métricas operativas
-    df_metricas = pd.read_sql_query("""
-        SELECT * FROM metricas_operativas
-        ORDER BY fecha, hora
-    """, engine)
+    df_metricas = cargar_metricas()
     
     print(f" {len(df_txn):,} transacciones cargadas")
     print(f" {len(df_metricas):,} métricas cargadas")
@@ -72,7 +60,7 @@ def calcular_kpis(df_txn):
     }
     
     # KPIs proyectados (AFTER) con optimizaciones
-    mejora_tiempo = 0.227  # 22.7% reducción
+    mejora_tiempo = cargar_reduccion_simulada()  # simulación de capacidad
     mejora_error = 0.467   # 46.7% reducción
     
     kpis_after = {
@@ -174,7 +162,7 @@ def crear_grafico_evolucion_temporal(df_metricas):
     """Crea gráfico de evolución temporal"""
     
     # Convertir fecha a datetime
-    df_metricas['fecha'] = pd.to_datetime(df_metricas['fecha'])
+    df_metricas = df_metricas.assign(fecha=pd.to_datetime(df_metricas['fecha']))
     
     # Agrupar por fecha
     evolucion = df_metricas.groupby('fecha').agg({
@@ -217,8 +205,22 @@ def crear_grafico_evolucion_temporal(df_metricas):
         row=1, col=2
     )
     
+    # P95 diario combinando los sketches horarios (sin volver a las transacciones)
+    if 'sketch_tiempo' in df_metricas.columns and df_metricas['sketch_tiempo'].notna().any():
+        p95_diario = rollup_metricas(df_metricas, nivel='dia', cuantiles=(0.95,))
+        fig.add_trace(
+            go.Scatter(
+                x=p95_diario['dia'],
+                y=p95_diario['tiempo_p95'],
+                mode='lines',
+                name='Tiempo P95',
+                line=dict(color=COLORS['danger'], width=1, dash='dot')
+            ),
+            row=1, col=2
+        )
+    
     # Línea de meta (tiempo objetivo con optimizaciones)
-    tiempo_objetivo = evolucion['tiempo_promedio_procesamiento'].mean() * 0.773  # -22.7%
+    tiempo_objetivo = evolucion['tiempo_promedio_procesamiento'].mean() * (1 - cargar_reduccion_simulada())
     fig.add_hline(
         y=tiempo_objetivo,
         line_dash="dash",
@@ -287,9 +289,6 @@ def crear_grafico_evolucion_temporal(df_metricas):
 def crear_grafico_cuellos_botella(df_txn):
     """Crea visualización de cuellos de botella"""
     
-    # Preparar datos
-    df_txn['periodo'] = df_txn['hora'].apply(lambda x: 'Hora Pico' if 18 <= x <= 23 else 'Hora Normal')
-    
     # Análisis por periodo
     comparacion = df_txn[df_txn['estado'].isin(['exitosa', 'fallida'])].groupby('periodo').agg({
         'tiempo_procesamiento': 'mean',
@@ -536,7 +535,7 @@ def crear_dashboard_completo(df_txn, df_metricas):
             <div class="metrics-summary">
                 <div class="metric-card">
                     <div class="metric-label">Reducción de Tiempo</div>
-                    <div class="metric-value">22.7%</div>
+                    <div class="metric-value">{cargar_reduccion_simulada()*100:.1f}%</div>
                 </div>
                 <div class="metric-card">
                     <div class="metric-label">Mejora en Tasa de Error</div>
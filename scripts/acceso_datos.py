@@ -0,0 +1,190 @@
+"""
+CRYPTOOPS ANALYZER - Capa de acceso a datos
+Carga tipada de transacciones y métricas para los scripts de análisis
+
+Cada script pide solo las columnas que usa; hora, fecha, dia_semana y
+periodo se derivan en PostgreSQL y los resultados se convierten a tipos
+compactos (int32 para ids, category para textos de baja cardinalidad,
+float32 para montos y tiempos). Los resultados de PostgreSQL pasan por
+el cache en disco de cache_consultas. Con FUENTE_DATOS=parquet se lee de
+data/processed en lugar de la base de datos.
+"""
+
+import os
+import json
+import pandas as pd
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+from cache_consultas import leer_sql_con_cache
+from instrumentacion import argumentos_conexion
+from almacenamiento_parquet import (
+    FUENTE_DATOS, leer_transacciones_parquet,
+    RUTA_USUARIOS_PARQUET, RUTA_METRICAS_PARQUET
+)
+
+load_dotenv()
+
+# Inicio del periodo de análisis
+FECHA_DESDE = '2024-07-01'
+
+# Tipos compactos por columna (las que no aparecen se dejan como vienen)
+TIPOS_COLUMNAS = {
+    'transaction_id': 'int32',
+    'user_id': 'int32',
+    'tipo_operacion': 'category',
+    'cripto': 'category',
+    'cripto_destino': 'category',
+    'metodo_pago': 'category',
+    'network': 'category',
+    'estado': 'category',
+    'motivo_fallo': 'category',
+    'nivel_verificacion': 'category',
+    'periodo': 'category',
+    'monto_usd': 'float32',
+    'comision_usd': 'float32',
+    'monto_total_usd': 'float32',
+    'precio_unitario_usd': 'float32',
+    'score_fraude': 'float32',
+    'tiempo_procesamiento': 'float32',
+    'hora': 'int8',
+    'dia_semana': 'int8'
+}
+
+# Columnas derivadas de timestamp_inicio, calculadas en el servidor
+DERIVADAS_SQL = {
+    'hora': "EXTRACT(HOUR FROM t.timestamp_inicio)::int AS hora",
+    'fecha': "t.timestamp_inicio::date AS fecha",
+    'dia_semana': "(EXTRACT(ISODOW FROM t.timestamp_inicio)::int - 1) AS dia_semana",
+    'periodo': (
+        "CASE WHEN EXTRACT(HOUR FROM t.timestamp_inicio) BETWEEN 18 AND 23 "
+        "THEN 'Hora Pico' ELSE 'Hora Normal' END AS periodo"
+    )
+}
+
+_engine = None
+
+def obtener_engine():
+    """Devuelve el engine de SQLAlchemy compartido (se crea en el primer uso)"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            f'postgresql://{os.getenv("DB_USER")}:{os.getenv("DB_PASSWORD")}@'
+            f'{os.getenv("DB_HOST")}:{os.getenv("DB_PORT")}/{os.getenv("DB_NAME")}',
+            connect_args=argumentos_conexion()
+        )
+    return _engine
+
+def aplicar_tipos(df):
+    """Convierte las columnas conocidas a sus tipos compactos"""
+    tipos = {col: tipo for col, tipo in TIPOS_COLUMNAS.items() if col in df.columns}
+    return df.astype(tipos)
+
+def _derivar_en_pandas(df, derivadas):
+    """Equivalente en pandas de DERIVADAS_SQL (lectura desde Parquet)"""
+    if not derivadas:
+        return df
+    ts = pd.to_datetime(df['timestamp_inicio'])
+    if 'hora' in derivadas or 'periodo' in derivadas:
+        hora = ts.dt.hour
+    if 'hora' in derivadas:
+        df['hora'] = hora
+    if 'fecha' in derivadas:
+        df['fecha'] = ts.dt.date
+    if 'dia_semana' in derivadas:
+        df['dia_semana'] = ts.dt.dayofweek
+    if 'periodo' in derivadas:
+        df['periodo'] = hora.between(18, 23).map({True: 'Hora Pico', False: 'Hora Normal'})
+    return df
+
+def _cargar_transacciones_parquet(columnas, derivadas, desde, estados, limite, columnas_usuario):
+    """Carga transacciones desde el dataset Parquet"""
+    lectura = list(columnas)
+    if derivadas and 'timestamp_inicio' not in lectura:
+        lectura.append('timestamp_inicio')
+    if estados and 'estado' not in lectura:
+        lectura.append('estado')
+    if columnas_usuario and 'user_id' not in lectura:
+        lectura.append('user_id')
+
+    df = leer_transacciones_parquet(columnas=lectura, desde=desde)
+
+    if estados:
+        df = df[df['estado'].isin(estados)]
+    if limite:
+        df = df.head(limite)
+    df = _derivar_en_pandas(df, derivadas)
+
+    if columnas_usuario:
+        df_usuarios = pd.read_parquet(RUTA_USUARIOS_PARQUET, columns=['user_id'] + list(columnas_usuario))
+        df = df.merge(df_usuarios, on='user_id')
+
+    salida = list(columnas) + list(derivadas) + list(columnas_usuario)
+    return df[salida].reset_index(drop=True)
+
+def cargar_transacciones(columnas, derivadas=(), desde=FECHA_DESDE, estados=None,
+                         limite=None, columnas_usuario=()):
+    """
+    Carga transacciones con proyección de columnas y tipos compactos
+
+    columnas: columnas de la tabla transacciones a traer
+    derivadas: columnas calculadas de timestamp_inicio ('hora', 'fecha',
+        'dia_semana', 'periodo')
+    desde: fecha mínima de timestamp_inicio (None = sin filtro)
+    estados: lista de estados a incluir (None = todos)
+    limite: número máximo de filas
+    columnas_usuario: columnas de usuarios a unir por user_id
+    """
+    desconocidas = set(derivadas) - set(DERIVADAS_SQL)
+    if desconocidas:
+        raise ValueError(f"Columnas derivadas no soportadas: {sorted(desconocidas)}")
+
+    if FUENTE_DATOS == 'parquet':
+        df = _cargar_transacciones_parquet(columnas, derivadas, desde, estados, limite, columnas_usuario)
+        return aplicar_tipos(df)
+
+    query, params = construir_query_transacciones(columnas, derivadas, desde, estados, limite, columnas_usuario)
+    return leer_sql_con_cache(query, obtener_engine(), params=params, preparar=aplicar_tipos)
+
+def construir_query_transacciones(columnas, derivadas=(), desde=FECHA_DESDE, estados=None,
+                                  limite=None, columnas_usuario=()):
+    """SELECT de cargar_transacciones y sus parámetros (estilo :nombre de SQLAlchemy)"""
+    select = [f"t.{col}" for col in columnas]
+    select += [DERIVADAS_SQL[col] for col in derivadas]
+    select += [f"u.{col}" for col in columnas_usuario]
+
+    query = f"SELECT {', '.join(select)} FROM transacciones t"
+    if columnas_usuario:
+        query += " JOIN usuarios u ON t.user_id = u.user_id"
+
+    condiciones = []
+    params = {}
+    if desde:
+        condiciones.append("t.timestamp_inicio >= :desde")
+        params['desde'] = desde
+    if estados:
+        condiciones.append("t.estado = ANY(:estados)")
+        params['estados'] = list(estados)
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+    if limite:
+        query += f" LIMIT {int(limite)}"
+    return query, params
+
+def _serializar_sketches(df):
+    """sketch_tiempo (JSONB -> dict) como texto JSON, igual que en Parquet"""
+    if 'sketch_tiempo' in df.columns:
+        df['sketch_tiempo'] = df['sketch_tiempo'].map(
+            lambda sketch: json.dumps(sketch, separators=(',', ':')) if isinstance(sketch, dict) else sketch
+        )
+    return df
+
+def cargar_metricas():
+    """Carga metricas_operativas ordenadas por fecha y hora"""
+    if FUENTE_DATOS == 'parquet':
+        df = pd.read_parquet(RUTA_METRICAS_PARQUET)
+        return df.sort_values(['fecha', 'hora']).reset_index(drop=True)
+
+    return leer_sql_con_cache(
+        "SELECT * FROM metricas_operativas ORDER BY fecha, hora", obtener_engine(),
+        preparar=_serializar_sketches
+    )
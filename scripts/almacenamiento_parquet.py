@@ -0,0 +1,113 @@
+"""
+CRYPTOOPS ANALYZER - Almacenamiento columnar (Parquet)
+Lectura y escritura de data/processed en Parquet con tipos categóricos
+
+Las transacciones se guardan como dataset particionado por fecha
+(data/processed/transacciones_parquet/fecha=YYYY-MM-DD/...), lo que
+permite leer solo las columnas y el rango de fechas que cada script usa.
+Los scripts de análisis leen de Parquet con FUENTE_DATOS=parquet.
+"""
+
+import os
+import shutil
+import uuid
+import pandas as pd
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+RUTA_TRANSACCIONES_PARQUET = 'data/processed/transacciones_parquet'
+RUTA_USUARIOS_PARQUET = 'data/processed/usuarios.parquet'
+RUTA_METRICAS_PARQUET = 'data/processed/metricas_operativas.parquet'
+
+# Fuente de datos de los scripts de análisis: 'postgres' o 'parquet'
+FUENTE_DATOS = os.getenv('FUENTE_DATOS', 'postgres').lower()
+
+# Categorías conocidas (fijas para que todos los chunks/archivos compartan el mismo dtype)
+CATEGORIAS = {
+    'cripto': ['BTC', 'ETH', 'USDT', 'USDC', 'BNB', 'ADA', 'SOL'],
+    'estado': ['pendiente', 'procesando', 'exitosa', 'fallida', 'cancelada'],
+    'metodo_pago': ['transferencia', 'tarjeta', 'wallet_crypto'],
+    'tipo_operacion': ['compra', 'venta', 'swap', 'transferencia', 'retiro'],
+    'network': ['Bitcoin', 'Ethereum', 'Binance Smart Chain', 'Polygon', 'Tron']
+}
+
+def aplicar_categorias(df):
+    """
+    Convierte las columnas de baja cardinalidad a category
+
+    Se parte de las categorías conocidas y se agregan los valores no
+    previstos que aparezcan en los datos, para no perder información.
+    """
+    for columna, categorias in CATEGORIAS.items():
+        if columna in df.columns:
+            extras = sorted(set(df[columna].dropna().unique()) - set(categorias))
+            df[columna] = df[columna].astype(pd.CategoricalDtype(categorias + extras))
+    return df
+
+def guardar_parquet(df, ruta):
+    """Guarda un DataFrame (métricas, usuarios, resultados de análisis) en un único Parquet"""
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    aplicar_categorias(df.copy()).to_parquet(ruta, index=False, compression='zstd')
+
+def csv_a_parquet(ruta_csv, ruta_parquet, tipos=None, tamano_bloque_mb=16):
+    """
+    Convierte un CSV con encabezado a Parquet bloque a bloque (memoria acotada)
+
+    tipos: {columna: tipo de pyarrow}; las columnas sin tipo se infieren del
+    primer bloque. Los booleanos aceptan t/f (formato de COPY). Devuelve las
+    filas escritas.
+    """
+    lector = pa_csv.open_csv(
+        ruta_csv,
+        read_options=pa_csv.ReadOptions(block_size=int(tamano_bloque_mb * 1024 * 1024)),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=tipos or {},
+            true_values=['t', 'true'],
+            false_values=['f', 'false'],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False
+        )
+    )
+    filas = 0
+    os.makedirs(os.path.dirname(ruta_parquet) or '.', exist_ok=True)
+    with pq.ParquetWriter(ruta_parquet, lector.schema, compression='zstd') as escritor:
+        for lote in lector:
+            escritor.write_batch(lote)
+            filas += lote.num_rows
+    return filas
+
+def guardar_transacciones_parquet(df, ruta=RUTA_TRANSACCIONES_PARQUET, anexar=False):
+    """
+    Guarda transacciones como dataset Parquet particionado por fecha
+
+    anexar=False reemplaza el dataset existente; anexar=True agrega archivos
+    nuevos a las particiones (modo streaming, un archivo por chunk y fecha).
+    """
+    if not anexar and os.path.exists(ruta):
+        shutil.rmtree(ruta)
+
+    df = aplicar_categorias(df.copy())
+    df['fecha'] = pd.to_datetime(df['timestamp_inicio']).dt.strftime('%Y-%m-%d')
+    df.to_parquet(
+        ruta,
+        index=False,
+        partition_cols=['fecha'],
+        compression='zstd',
+        basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet'
+    )
+
+def leer_transacciones_parquet(ruta=RUTA_TRANSACCIONES_PARQUET, columnas=None, desde=None):
+    """
+    Lee transacciones desde el dataset Parquet
+
+    columnas: lista de columnas a leer (None = todas). 'fecha' se devuelve
+    como datetime.date, igual que al derivarla desde timestamp_inicio.
+    desde: fecha mínima de timestamp_inicio (filtro aplicado al leer).
+    """
+    filtros = [('timestamp_inicio', '>=', pd.Timestamp(desde))] if desde else None
+    df = pd.read_parquet(ruta, columns=columnas, filters=filtros)
+
+    if 'fecha' in df.columns:
+        df['fecha'] = pd.to_datetime(df['fecha'].astype(str)).dt.date
+
+    return df
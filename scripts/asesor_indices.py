@@ -0,0 +1,408 @@
+"""
+CRYPTOOPS ANALYZER - Asesor de índices de transacciones
+Mide el catálogo de consultas con EXPLAIN (ANALYZE, BUFFERS) y evalúa qué índices pagan su costo
+
+Escenarios (cada uno en una transacción que se revierte al final):
+- base: índices actuales
+- quitar <índice>: DROP INDEX de cada índice secundario de transacciones
+  (los que respaldan PK/UNIQUE no se tocan)
+- agregar <candidato>: CREATE INDEX de los candidatos compuestos,
+  cubrientes (INCLUDE), parciales y BRIN sobre timestamp_inicio
+
+En cada escenario se ejecuta todo el catálogo (scripts/catalogo_sql.py)
+bajo EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) y se mide la inserción de
+FILAS_INSERCION filas, para comparar tiempos de lectura y de escritura
+contra la base. Un índice existente se recomienda eliminar si quitarlo no
+empeora ninguna consulta más de UMBRAL_REGRESION; un candidato se
+recomienda crear si mejora alguna consulta al menos UMBRAL_MEJORA.
+
+DROP/CREATE INDEX bloquean transacciones hasta el ROLLBACK de cada
+escenario: ejecutar en una réplica o en una ventana sin carga.
+
+Uso:
+    python scripts/asesor_indices.py
+    python scripts/asesor_indices.py --consultas 02:2 03: --sin-existentes
+"""
+
+import os
+import json
+import time
+import argparse
+import psycopg2
+import pandas as pd
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+from catalogo_sql import cargar_catalogo, filtrar_catalogo
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+TABLA = 'transacciones'
+FILAS_INSERCION = 10_000
+UMBRAL_MEJORA = 0.20        # mejora mínima en alguna consulta para crear un candidato
+UMBRAL_REGRESION = 0.10     # empeoramiento máximo tolerado al quitar un índice
+TIMEOUT_CONSULTA_MS = int(os.getenv('ASESOR_TIMEOUT_MS', '120000'))
+
+RUTA_RESULTADO_JSON = 'data/processed/asesor_indices.json'
+RUTA_RESULTADO_CSV = 'data/processed/asesor_indices.csv'
+
+# Candidatos: nombre -> (motivo, DDL)
+CANDIDATOS = {
+    'idx_transacciones_timestamp_brin': (
+        'Rangos de fechas (últimos 30 días, mes actual, >= 2024-07-01) con un índice de pocas páginas',
+        "CREATE INDEX idx_transacciones_timestamp_brin ON transacciones "
+        "USING brin (timestamp_inicio) WITH (pages_per_range = 32)"
+    ),
+    'idx_transacciones_timestamp_estado_cubriente': (
+        'KPIs por periodo: filtro por fecha y estado sin leer la tabla',
+        "CREATE INDEX idx_transacciones_timestamp_estado_cubriente ON transacciones "
+        "(timestamp_inicio, estado) INCLUDE (user_id, monto_usd, comision_usd, tiempo_procesamiento)"
+    ),
+    'idx_transacciones_estado_hora_cubriente': (
+        'Análisis por hora del día de exitosas/fallidas',
+        "CREATE INDEX idx_transacciones_estado_hora_cubriente ON transacciones "
+        "(estado, (EXTRACT(HOUR FROM timestamp_inicio))) INCLUDE (tiempo_procesamiento)"
+    ),
+    'idx_transacciones_cripto_estado_cubriente': (
+        'Performance por cripto',
+        "CREATE INDEX idx_transacciones_cripto_estado_cubriente ON transacciones "
+        "(cripto, estado) INCLUDE (monto_usd, tiempo_procesamiento)"
+    ),
+    'idx_transacciones_metodo_pago_estado_cubriente': (
+        'Performance por método de pago',
+        "CREATE INDEX idx_transacciones_metodo_pago_estado_cubriente ON transacciones "
+        "(metodo_pago, estado) INCLUDE (tiempo_procesamiento)"
+    ),
+    'idx_transacciones_fallidas_motivo': (
+        'Motivos de fallo (índice parcial solo de fallidas)',
+        "CREATE INDEX idx_transacciones_fallidas_motivo ON transacciones "
+        "(motivo_fallo) WHERE estado = 'fallida'"
+    ),
+    'idx_transacciones_pendientes': (
+        'Lotes del servicio de validación (índice parcial solo de pendientes)',
+        "CREATE INDEX idx_transacciones_pendientes ON transacciones "
+        "(transaction_id) WHERE estado = 'pendiente'"
+    )
+}
+
+# ============================================
+# PLANES
+# ============================================
+
+def _recorrer_nodos(nodo):
+    yield nodo
+    for hijo in nodo.get('Plans', []):
+        yield from _recorrer_nodos(hijo)
+
+def resumir_plan(plan):
+    """Tiempos, buffers, índices usados y lecturas secuenciales de un plan JSON"""
+    raiz = plan['Plan']
+    nodos = list(_recorrer_nodos(raiz))
+    return {
+        'ms': round(plan['Execution Time'], 2),
+        'planificacion_ms': round(plan['Planning Time'], 2),
+        'buffers_hit': raiz.get('Shared Hit Blocks', 0),
+        'buffers_read': raiz.get('Shared Read Blocks', 0),
+        'indices': sorted({n['Index Name'] for n in nodos if 'Index Name' in n}),
+        'seq_scans': sorted({n['Relation Name'] for n in nodos if n['Node Type'] == 'Seq Scan'})
+    }
+
+def explicar(cursor, consulta):
+    """
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) de una consulta del catálogo
+
+    Corre dentro de un SAVEPOINT para que un error (timeout, división por
+    cero) no aborte el escenario. Devuelve (resumen, plan) o ({'error'}, None).
+    """
+    cursor.execute("SAVEPOINT explicar")
+    try:
+        cursor.execute(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + consulta['sql'].strip().rstrip(';'),
+            consulta['params']
+        )
+        plan = cursor.fetchone()[0][0]
+        cursor.execute("RELEASE SAVEPOINT explicar")
+        return resumir_plan(plan), plan
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT explicar")
+        return {'error': str(e).strip().splitlines()[0]}, None
+
+def medir_catalogo(cursor, catalogo):
+    """{clave: (resumen, plan)} de todas las consultas del catálogo"""
+    return {clave: explicar(cursor, consulta) for clave, consulta in catalogo.items()}
+
+# ============================================
+# ESCRITURA
+# ============================================
+
+def medir_insercion(cursor, filas=FILAS_INSERCION):
+    """
+    Filas/segundo al insertar `filas` copias de transacciones existentes
+    (con ids nuevos de la secuencia); la inserción se revierte
+    """
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s AND column_name <> 'transaction_id'
+        AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (TABLA,))
+    columnas = ', '.join(fila[0] for fila in cursor.fetchall())
+
+    cursor.execute("SAVEPOINT insercion")
+    inicio = time.perf_counter()
+    cursor.execute(f"INSERT INTO {TABLA} ({columnas}) SELECT {columnas} FROM {TABLA} LIMIT %s", (filas,))
+    segundos = time.perf_counter() - inicio
+    insertadas = cursor.rowcount
+    cursor.execute("ROLLBACK TO SAVEPOINT insercion")
+    return insertadas / segundos if segundos > 0 else float('nan')
+
+# ============================================
+# ÍNDICES ACTUALES
+# ============================================
+
+def indices_actuales(cursor):
+    """
+    Índices de transacciones con uso acumulado (pg_stat_user_indexes) y tamaño
+
+    Si la tabla está particionada (sql/03), el índice del padre no tiene
+    páginas ni escaneos propios: se suman los de sus índices en cada
+    partición (pg_partition_tree, vacío para un índice no particionado).
+    """
+    cursor.execute("""
+        SELECT
+            ci.relname,
+            uso.escaneos,
+            uso.bytes / 1024.0 / 1024.0,
+            EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid),
+            pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class ci ON ci.oid = i.indexrelid
+        CROSS JOIN LATERAL (
+            SELECT
+                COALESCE(SUM(s.idx_scan), 0) AS escaneos,
+                COALESCE(SUM(pg_relation_size(arbol.relid)), 0) AS bytes
+            FROM (
+                SELECT relid FROM pg_partition_tree(i.indexrelid)
+                UNION SELECT i.indexrelid
+            ) arbol
+            LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = arbol.relid
+        ) uso
+        WHERE i.indrelid = %s::regclass
+        ORDER BY ci.relname
+    """, (TABLA,))
+    return [
+        {
+            'indice': nombre,
+            'idx_scan': escaneos,
+            'tamano_mb': round(float(tamano), 2),
+            'constraint': constraint,
+            'definicion': definicion
+        }
+        for nombre, escaneos, tamano, constraint, definicion in cursor.fetchall()
+    ]
+
+# ============================================
+# ESCENARIOS
+# ============================================
+
+def evaluar_escenario(conn, catalogo, ddl=None, indice_nuevo=None, filas_insercion=FILAS_INSERCION):
+    """
+    Aplica el DDL del escenario, mide catálogo e inserción y revierte todo
+
+    Devuelve {'consultas': {clave: (resumen, plan)}, 'insercion_filas_seg',
+    'construccion_s', 'tamano_mb'}.
+    """
+    cursor = conn.cursor()
+    try:
+        resultado = {'construccion_s': None, 'tamano_mb': None}
+        if ddl:
+            inicio = time.perf_counter()
+            cursor.execute(ddl)
+            resultado['construccion_s'] = round(time.perf_counter() - inicio, 2)
+        if indice_nuevo:
+            cursor.execute("""
+                SELECT SUM(pg_relation_size(relid)) / 1024.0 / 1024.0
+                FROM (SELECT relid FROM pg_partition_tree(%(indice)s::regclass)
+                      UNION SELECT %(indice)s::regclass) arbol
+            """, {'indice': indice_nuevo})
+            resultado['tamano_mb'] = round(float(cursor.fetchone()[0]), 2)
+            # Estadísticas de la expresión indexada (si la hay)
+            cursor.execute(f"ANALYZE {TABLA}")
+
+        cursor.execute(f"SET LOCAL statement_timeout = {TIMEOUT_CONSULTA_MS}")
+        resultado['consultas'] = medir_catalogo(cursor, catalogo)
+        resultado['insercion_filas_seg'] = medir_insercion(cursor, filas_insercion)
+        return resultado
+    finally:
+        conn.rollback()
+        cursor.close()
+
+def comparar_con_base(base, escenario):
+    """Mejor mejora y peor regresión (fracción de tiempo) por consulta contra la base"""
+    cambios = {}
+    for clave, (resumen_base, _) in base['consultas'].items():
+        resumen, _ = escenario['consultas'][clave]
+        if 'ms' in resumen_base and 'ms' in resumen and resumen_base['ms'] > 0:
+            cambios[clave] = 1 - resumen['ms'] / resumen_base['ms']
+
+    mejor = max(cambios, key=cambios.get) if cambios else None
+    peor = min(cambios, key=cambios.get) if cambios else None
+    return {
+        'mejor_consulta': mejor,
+        'mejora_pct': round(cambios[mejor] * 100, 1) if mejor else 0.0,
+        'consultas_mejoradas': sum(1 for c in cambios.values() if c >= UMBRAL_MEJORA),
+        'peor_consulta': peor,
+        'regresion_pct': round(-cambios[peor] * 100, 1) if peor else 0.0,
+        'cambio_insercion_pct': round(
+            (escenario['insercion_filas_seg'] / base['insercion_filas_seg'] - 1) * 100, 1
+        ) if base['insercion_filas_seg'] else None
+    }
+
+def ejecutar_asesor(conn, catalogo, evaluar_existentes=True, evaluar_candidatos=True,
+                    filas_insercion=FILAS_INSERCION):
+    """
+    Corre la base y todos los escenarios; devuelve (base, actuales, filas)
+
+    filas: una por escenario con la comparación contra la base y la
+    recomendación ('eliminar'/'mantener' o 'crear'/'descartar').
+    """
+    cursor = conn.cursor()
+    actuales = indices_actuales(cursor)
+    conn.rollback()
+    cursor.close()
+
+    print("\nCalentando cache y midiendo la base...")
+    evaluar_escenario(conn, catalogo, filas_insercion=filas_insercion)
+    base = evaluar_escenario(conn, catalogo, filas_insercion=filas_insercion)
+
+    filas = []
+    if evaluar_existentes:
+        for indice in actuales:
+            if indice['constraint']:
+                continue
+            print(f"  Escenario: quitar {indice['indice']}")
+            escenario = evaluar_escenario(
+                conn, catalogo, ddl=f"DROP INDEX {indice['indice']}", filas_insercion=filas_insercion
+            )
+            comparacion = comparar_con_base(base, escenario)
+            filas.append({
+                'indice': indice['indice'],
+                'escenario': 'quitar',
+                'tamano_mb': indice['tamano_mb'],
+                'idx_scan': indice['idx_scan'],
+                **comparacion,
+                'recomendacion': 'eliminar' if comparacion['regresion_pct'] < UMBRAL_REGRESION * 100 else 'mantener'
+            })
+
+    if evaluar_candidatos:
+        existentes = {indice['indice'] for indice in actuales}
+        for nombre, (motivo, ddl) in CANDIDATOS.items():
+            if nombre in existentes:
+                continue
+            print(f"  Escenario: agregar {nombre}")
+            escenario = evaluar_escenario(
+                conn, catalogo, ddl=ddl, indice_nuevo=nombre, filas_insercion=filas_insercion
+            )
+            comparacion = comparar_con_base(base, escenario)
+            filas.append({
+                'indice': nombre,
+                'escenario': 'agregar',
+                'tamano_mb': escenario['tamano_mb'],
+                'construccion_s': escenario['construccion_s'],
+                'motivo': motivo,
+                **comparacion,
+                'recomendacion': 'crear' if comparacion['mejora_pct'] >= UMBRAL_MEJORA * 100 else 'descartar'
+            })
+
+    return base, actuales, filas
+
+# ============================================
+# RESULTADOS
+# ============================================
+
+def guardar_resultado(base, actuales, filas, catalogo,
+                      ruta_json=RUTA_RESULTADO_JSON, ruta_csv=RUTA_RESULTADO_CSV):
+    """JSON con planes de la base y escenarios; CSV con una fila por escenario"""
+    os.makedirs(os.path.dirname(ruta_json), exist_ok=True)
+    with open(ruta_json, 'w', encoding='utf-8') as f:
+        json.dump({
+            'base': {
+                'insercion_filas_seg': base['insercion_filas_seg'],
+                'consultas': {
+                    clave: {'titulo': catalogo[clave]['titulo'], 'resumen': resumen, 'plan': plan}
+                    for clave, (resumen, plan) in base['consultas'].items()
+                }
+            },
+            'indices_actuales': actuales,
+            'escenarios': filas,
+            'umbrales': {'mejora': UMBRAL_MEJORA, 'regresion': UMBRAL_REGRESION}
+        }, f, indent=2, ensure_ascii=False, default=str)
+
+    pd.DataFrame(filas).to_csv(ruta_csv, index=False)
+
+def mostrar_resultados(base, filas):
+    print(f"\n{'='*80}")
+    print("BASE: CONSULTAS DEL CATÁLOGO")
+    print(f"{'='*80}")
+    tabla_base = []
+    for clave, (resumen, _) in base['consultas'].items():
+        tabla_base.append({
+            'Consulta': clave,
+            'ms': resumen.get('ms', resumen.get('error')),
+            'Buffers (hit/read)': f"{resumen.get('buffers_hit', '-')}/{resumen.get('buffers_read', '-')}",
+            'Índices': ', '.join(resumen.get('indices', [])) or '-',
+            'Seq scan': ', '.join(resumen.get('seq_scans', [])) or '-'
+        })
+    print(tabulate(tabla_base, headers='keys', tablefmt='grid'))
+    print(f"\nInserción base: {base['insercion_filas_seg']:,.0f} filas/seg")
+
+    print(f"\n{'='*80}")
+    print("ESCENARIOS")
+    print(f"{'='*80}")
+    columnas = ['indice', 'escenario', 'tamano_mb', 'mejor_consulta', 'mejora_pct',
+                'peor_consulta', 'regresion_pct', 'cambio_insercion_pct', 'recomendacion']
+    print(tabulate([{c: fila.get(c) for c in columnas} for fila in filas], headers='keys', tablefmt='grid'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Asesor de índices de transacciones')
+    parser.add_argument('--consultas', nargs='+',
+                        help="Prefijos de clave del catálogo a medir (p. ej. '02:2' '03:' 'pipeline:')")
+    parser.add_argument('--sin-existentes', action='store_true',
+                        help='No evaluar quitar los índices actuales')
+    parser.add_argument('--sin-candidatos', action='store_true',
+                        help='No evaluar los índices candidatos')
+    parser.add_argument('--filas-insercion', type=int, default=FILAS_INSERCION)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - ASESOR DE ÍNDICES")
+    print("="*80)
+
+    catalogo = filtrar_catalogo(cargar_catalogo(), args.consultas)
+    print(f"\nConsultas en el catálogo: {len(catalogo)}")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        base, actuales, filas = ejecutar_asesor(
+            conn, catalogo,
+            evaluar_existentes=not args.sin_existentes,
+            evaluar_candidatos=not args.sin_candidatos,
+            filas_insercion=args.filas_insercion
+        )
+    finally:
+        conn.close()
+
+    mostrar_resultados(base, filas)
+    guardar_resultado(base, actuales, filas, catalogo)
+    print(f"\n Resultados guardados en: {RUTA_RESULTADO_JSON} y {RUTA_RESULTADO_CSV}")
+
+if __name__ == "__main__":
+    main()
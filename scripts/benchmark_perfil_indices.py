@@ -0,0 +1,236 @@
+"""
+CRYPTOOPS ANALYZER - Benchmark del perfil de índices por tiempo
+Compara consultas por hora y por rango de fechas antes y después de sql/04_perfil_indices_tiempo.sql
+
+1. Mide las consultas con el schema base (sin el perfil; si ya estaba
+   aplicado se revierte primero)
+2. Aplica el perfil (columna generada hora, BRIN sobre timestamp_inicio y
+   (estado, hora) INCLUDE (tiempo_procesamiento)) y corre VACUUM ANALYZE
+3. Mide las mismas consultas, reescritas para usar la columna hora en
+   lugar de EXTRACT(HOUR FROM timestamp_inicio)
+
+Cada consulta se mide con EXPLAIN (ANALYZE, BUFFERS), mejor de N
+repeticiones. El perfil queda aplicado salvo con --revertir. Agregar la
+columna reescribe transacciones: ejecutar en una ventana sin carga.
+
+Uso:
+    python scripts/benchmark_perfil_indices.py
+    python scripts/benchmark_perfil_indices.py --repeticiones 5 --revertir
+"""
+
+import os
+import time
+import argparse
+import psycopg2
+import pandas as pd
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+from asesor_indices import explicar
+from catalogo_sql import cargar_catalogo
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+RUTA_PERFIL = 'sql/04_perfil_indices_tiempo.sql'
+RUTA_RESULTADO = 'data/processed/benchmark_perfil_indices.csv'
+REPETICIONES = 3
+
+EXPRESION_HORA = 'EXTRACT(HOUR FROM timestamp_inicio)'
+
+SQL_REVERTIR_PERFIL = """
+    DROP INDEX IF EXISTS idx_transacciones_estado_hora_tiempo;
+    DROP INDEX IF EXISTS idx_transacciones_timestamp_brin;
+    ALTER TABLE transacciones DROP COLUMN IF EXISTS hora;
+"""
+
+# Consultas del catálogo que agrupan por hora o filtran por fecha
+CONSULTAS_CATALOGO = ['03:por_hora', '02:2.1', '02:2.3', '02:12.1', '02:12.2', 'pipeline:transacciones']
+
+# Ventana reciente relativa a los datos (los datos generados no llegan a NOW())
+CONSULTA_VENTANA_7_DIAS = {
+    'titulo': 'Tiempos por hora de los últimos 7 días con datos',
+    'sql': """
+    SELECT
+        EXTRACT(HOUR FROM timestamp_inicio) as hora_del_dia,
+        COUNT(*) as num_transacciones,
+        ROUND(AVG(tiempo_procesamiento), 2) as tiempo_promedio_seg
+    FROM transacciones
+    WHERE timestamp_inicio >= (SELECT MAX(timestamp_inicio) FROM transacciones) - INTERVAL '7 days'
+    AND estado IN ('exitosa', 'fallida')
+    GROUP BY EXTRACT(HOUR FROM timestamp_inicio)
+    ORDER BY hora_del_dia
+    """,
+    'params': None
+}
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+def usar_columna_hora(query):
+    """Reescribe EXTRACT(HOUR FROM timestamp_inicio) como la columna generada hora"""
+    return (query
+            .replace('EXTRACT(HOUR FROM t.timestamp_inicio)', 't.hora')
+            .replace(EXPRESION_HORA, 'hora'))
+
+def consultas_benchmark():
+    """{clave: consulta} con las consultas a medir"""
+    catalogo = cargar_catalogo()
+    consultas = {clave: catalogo[clave] for clave in CONSULTAS_CATALOGO if clave in catalogo}
+    consultas['ventana_7_dias'] = CONSULTA_VENTANA_7_DIAS
+    return consultas
+
+def medir(conn, consultas, repeticiones=REPETICIONES):
+    """{clave: resumen del mejor tiempo} (solo lectura; la transacción se revierte)"""
+    cursor = conn.cursor()
+    resultados = {}
+    try:
+        for clave, consulta in consultas.items():
+            mejor = None
+            for _ in range(repeticiones):
+                resumen, _ = explicar(cursor, consulta)
+                if 'error' in resumen:
+                    mejor = resumen
+                    break
+                if mejor is None or resumen['ms'] < mejor['ms']:
+                    mejor = resumen
+            resultados[clave] = mejor
+        return resultados
+    finally:
+        conn.rollback()
+        cursor.close()
+
+# ============================================
+# PERFIL
+# ============================================
+
+def perfil_aplicado(cursor):
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'transacciones' AND column_name = 'hora'
+        )
+    """)
+    return cursor.fetchone()[0]
+
+def _vacuum_analyze(conn):
+    """VACUUM no puede correr dentro de una transacción"""
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        cursor.execute("VACUUM (ANALYZE) transacciones")
+        cursor.close()
+    finally:
+        conn.autocommit = False
+
+def aplicar_perfil(conn, ruta=RUTA_PERFIL):
+    """Ejecuta sql/04 y VACUUM ANALYZE; devuelve los segundos que tardó"""
+    with open(ruta, encoding='utf-8') as f:
+        script = f.read()
+    inicio = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(script)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    _vacuum_analyze(conn)
+    return time.perf_counter() - inicio
+
+def revertir_perfil(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SQL_REVERTIR_PERFIL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    _vacuum_analyze(conn)
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def ejecutar_benchmark(conn, repeticiones=REPETICIONES, revertir=False):
+    """Mide base y perfil; devuelve (DataFrame por consulta, segundos de aplicar el perfil)"""
+    cursor = conn.cursor()
+    ya_aplicado = perfil_aplicado(cursor)
+    conn.rollback()
+    cursor.close()
+    if ya_aplicado:
+        print("\nEl perfil ya estaba aplicado: se revierte para medir la base")
+        revertir_perfil(conn)
+
+    consultas = consultas_benchmark()
+    print(f"\nMidiendo {len(consultas)} consultas con el schema base...")
+    base = medir(conn, consultas, repeticiones)
+
+    print("Aplicando sql/04_perfil_indices_tiempo.sql...")
+    segundos_perfil = aplicar_perfil(conn)
+
+    consultas_perfil = {
+        clave: dict(consulta, sql=usar_columna_hora(consulta['sql']))
+        for clave, consulta in consultas.items()
+    }
+    print("Midiendo con el perfil...")
+    perfil = medir(conn, consultas_perfil, repeticiones)
+
+    if revertir:
+        revertir_perfil(conn)
+
+    filas = []
+    for clave, consulta in consultas.items():
+        antes, despues = base[clave], perfil[clave]
+        fila = {
+            'consulta': clave,
+            'titulo': consulta['titulo'],
+            'base_ms': antes.get('ms'),
+            'perfil_ms': despues.get('ms'),
+            'speedup': round(antes['ms'] / despues['ms'], 2)
+                if antes.get('ms') and despues.get('ms') else None,
+            'indices_perfil': ', '.join(despues.get('indices', [])) or '-',
+            'error': antes.get('error') or despues.get('error')
+        }
+        filas.append(fila)
+    return pd.DataFrame(filas), segundos_perfil
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del perfil de índices por tiempo')
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--revertir', action='store_true',
+                        help='Quitar el perfil al terminar (volver al schema base)')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - BENCHMARK PERFIL DE ÍNDICES POR TIEMPO")
+    print("="*80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        df, segundos_perfil = ejecutar_benchmark(conn, args.repeticiones, args.revertir)
+    finally:
+        conn.close()
+
+    print(f"\nPerfil aplicado en {segundos_perfil:.1f}s (incluye reescritura de la tabla y VACUUM)\n")
+    print(tabulate(df.drop(columns=['titulo']), headers='keys', tablefmt='grid', showindex=False))
+
+    os.makedirs(os.path.dirname(RUTA_RESULTADO), exist_ok=True)
+    df.to_csv(RUTA_RESULTADO, index=False)
+    print(f"\n Resultados guardados en: {RUTA_RESULTADO}")
+    print(" Perfil revertido" if args.revertir else " Perfil aplicado (revertir con --revertir)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+CRYPTOOPS ANALYZER - Benchmark de trigger_actualizar_estadisticas_usuario
+Compara el trigger por fila original con el trigger por sentencia (tablas de transición)
+
+Se eligen N transacciones al azar y, dentro de una transacción que al final
+se revierte, se pasan a 'pendiente' y luego a 'exitosa' con un único UPDATE
+masivo. Solo se mide ese último UPDATE:
+
+- por_fila: se instala temporalmente la versión anterior (AFTER UPDATE FOR
+  EACH ROW, un UPDATE de usuarios por transacción)
+- por_sentencia: el trigger actual del schema (REFERENCING OLD/NEW TABLE,
+  un UPDATE de usuarios por sentencia agregado por user_id)
+
+También se comparan los totales resultantes de usuarios para confirmar que
+ambas versiones dejan las mismas estadísticas. Nada queda en la base.
+
+Uso:
+    python scripts/benchmark_trigger_estadisticas.py
+    python scripts/benchmark_trigger_estadisticas.py --filas 100000 --repeticiones 3
+"""
+
+import os
+import time
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+FILAS_DEFAULT = 100_000
+REPETICIONES_DEFAULT = 3
+
+# Versión anterior del trigger (una fila de usuarios actualizada por transacción)
+SQL_TRIGGER_POR_FILA = """
+    CREATE OR REPLACE FUNCTION actualizar_estadisticas_usuario_por_fila()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF NEW.estado = 'exitosa' AND (OLD.estado IS NULL OR OLD.estado != 'exitosa') THEN
+            UPDATE usuarios
+            SET
+                total_transacciones = total_transacciones + 1,
+                volumen_total_usd = volumen_total_usd + NEW.monto_usd,
+                fecha_ultima_transaccion = NEW.timestamp_completado,
+                updated_at = NOW()
+            WHERE user_id = NEW.user_id;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER trigger_actualizar_estadisticas_usuario ON transacciones;
+
+    CREATE TRIGGER trigger_actualizar_estadisticas_usuario
+        AFTER UPDATE ON transacciones
+        FOR EACH ROW
+        WHEN (NEW.estado = 'exitosa')
+        EXECUTE FUNCTION actualizar_estadisticas_usuario_por_fila();
+"""
+
+QUERY_TOTALES_USUARIOS = """
+    SELECT COUNT(*), SUM(total_transacciones), SUM(volumen_total_usd)
+    FROM usuarios
+    WHERE user_id IN (SELECT user_id FROM transacciones WHERE transaction_id = ANY(%s))
+"""
+
+MODOS = ('por_fila', 'por_sentencia')
+
+# ============================================
+# MEDICIÓN
+# ============================================
+
+def muestrear_transacciones(cursor, filas):
+    cursor.execute(
+        "SELECT transaction_id FROM transacciones ORDER BY random() LIMIT %s", (filas,)
+    )
+    return [fila[0] for fila in cursor.fetchall()]
+
+def medir_cambio_estado(conn, ids, modo):
+    """
+    Mide el UPDATE masivo a 'exitosa' con el trigger del modo indicado
+
+    Todo se hace en una transacción revertida. Devuelve (segundos, totales
+    de usuarios afectados después del cambio).
+    """
+    cursor = conn.cursor()
+    try:
+        if modo == 'por_fila':
+            cursor.execute(SQL_TRIGGER_POR_FILA)
+
+        cursor.execute(
+            "UPDATE transacciones SET estado = 'pendiente' WHERE transaction_id = ANY(%s)", (ids,)
+        )
+
+        inicio = time.perf_counter()
+        cursor.execute(
+            "UPDATE transacciones SET estado = 'exitosa' WHERE transaction_id = ANY(%s)", (ids,)
+        )
+        segundos = time.perf_counter() - inicio
+
+        cursor.execute(QUERY_TOTALES_USUARIOS, (ids,))
+        totales = cursor.fetchone()
+        return segundos, totales
+    finally:
+        conn.rollback()
+        cursor.close()
+
+def ejecutar_benchmark(conn, filas=FILAS_DEFAULT, repeticiones=REPETICIONES_DEFAULT):
+    """Mejor tiempo de cada modo sobre la misma muestra de transacciones"""
+    cursor = conn.cursor()
+    try:
+        ids = muestrear_transacciones(cursor, filas)
+    finally:
+        conn.rollback()
+        cursor.close()
+
+    if not ids:
+        raise RuntimeError("No hay transacciones para el benchmark")
+
+    resultados = {}
+    for modo in MODOS:
+        tiempos = []
+        for _ in range(repeticiones):
+            segundos, totales = medir_cambio_estado(conn, ids, modo)
+            tiempos.append(segundos)
+        resultados[modo] = {'segundos': min(tiempos), 'totales': totales}
+    return len(ids), resultados
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del trigger de estadísticas de usuario')
+    parser.add_argument('--filas', type=int, default=FILAS_DEFAULT,
+                        help='Transacciones a cambiar de estado en un solo UPDATE')
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES_DEFAULT)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - BENCHMARK TRIGGER ESTADÍSTICAS DE USUARIO")
+    print("="*80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        filas, resultados = ejecutar_benchmark(conn, args.filas, args.repeticiones)
+    finally:
+        conn.close()
+
+    base = resultados['por_fila']['segundos']
+    tabla = []
+    for modo in MODOS:
+        segundos = resultados[modo]['segundos']
+        tabla.append({
+            'Trigger': modo,
+            'Segundos': f"{segundos:.2f}",
+            'Filas/seg': f"{filas / segundos:,.0f}",
+            'Speedup': f"{base / segundos:.2f}x"
+        })
+
+    print(f"\n{filas:,} transacciones pasadas a 'exitosa' en un UPDATE "
+          f"(mejor de {args.repeticiones}, cambios revertidos)\n")
+    print(tabulate(tabla, headers='keys', tablefmt='grid'))
+
+    usuarios, total_transacciones, volumen = resultados['por_sentencia']['totales']
+    if resultados['por_fila']['totales'] == resultados['por_sentencia']['totales']:
+        print(f"\n Estadísticas idénticas en ambos modos ({usuarios:,} usuarios, "
+              f"{total_transacciones:,} transacciones, ${volumen:,.2f})")
+    else:
+        print("\n Las estadísticas de usuarios difieren entre modos:")
+        print(f"   por_fila:      {resultados['por_fila']['totales']}")
+        print(f"   por_sentencia: {resultados['por_sentencia']['totales']}")
+
+if __name__ == "__main__":
+    main()
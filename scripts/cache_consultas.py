@@ -0,0 +1,156 @@
+"""
+CRYPTOOPS ANALYZER - Cache local de resultados de consultas
+Guarda resultados de SELECT en Parquet bajo data/cache
+
+La clave de cada entrada es el hash del SQL normalizado (más parámetros)
+y el hash del watermark de las tablas que lee la consulta: MAX del id y
+de updated_at (timestamp_validacion en validaciones), más los contadores de inserts/updates/deletes
+de pg_stat_user_tables. Cuando llegan filas nuevas el watermark cambia y
+la entrada anterior de esa consulta se descarta. El tamaño total se
+limita expulsando las entradas usadas hace más tiempo (LRU por mtime).
+Las consultas que leen tablas sin watermark conocido (fuera de
+WATERMARKS) se ejecutan sin cache.
+"""
+
+import os
+import re
+import json
+import glob
+import hashlib
+import pandas as pd
+from sqlalchemy import text
+
+RUTA_CACHE = os.getenv('CACHE_DIR', 'data/cache')
+TAMANO_MAXIMO_MB = float(os.getenv('CACHE_MAX_MB', '500'))
+CACHE_HABILITADO = os.getenv('CACHE_CONSULTAS', '1') != '0'
+
+# Columnas que marcan el avance de cada tabla (id creciente, timestamp de cambios)
+WATERMARKS = {
+    'transacciones': ('transaction_id', 'updated_at'),
+    'usuarios': ('user_id', 'updated_at'),
+    'metricas_operativas': ('metrica_id', 'updated_at'),
+    'validaciones': ('validacion_id', 'timestamp_validacion')
+}
+
+_PATRON_TABLAS = re.compile(r'\b(?:from|join)\s+([a-z_][a-z0-9_]*)', re.IGNORECASE)
+# Funciones cuya sintaxis lleva FROM (EXTRACT(HOUR FROM ts), SUBSTRING(x FROM 2), ...)
+_PATRON_FUNCIONES_FROM = re.compile(r'\b(?:extract|substring|trim|overlay)\s*\(', re.IGNORECASE)
+# Nombres definidos en un WITH (nombre AS (...)), que no son tablas
+_PATRON_CTES = re.compile(r'\b([a-z_][a-z0-9_]*)\s+as\s+(?:(?:not\s+)?materialized\s+)?\(', re.IGNORECASE)
+
+def normalizar_sql(sql):
+    """Quita comentarios, espacios redundantes y el ';' final"""
+    sql = re.sub(r'--[^\n]*', ' ', str(sql))
+    return ' '.join(sql.split()).rstrip(';').strip()
+
+def _quitar_funciones_from(sql):
+    """Reemplaza las llamadas de _PATRON_FUNCIONES_FROM (hasta su paréntesis de cierre)"""
+    partes = []
+    posicion = 0
+    for coincidencia in _PATRON_FUNCIONES_FROM.finditer(sql):
+        if coincidencia.start() < posicion:
+            continue
+        partes.append(sql[posicion:coincidencia.start()])
+        profundidad = 0
+        for i in range(coincidencia.end() - 1, len(sql)):
+            if sql[i] == '(':
+                profundidad += 1
+            elif sql[i] == ')':
+                profundidad -= 1
+                if profundidad == 0:
+                    break
+        posicion = i + 1
+        partes.append(' funcion ')
+    partes.append(sql[posicion:])
+    return ''.join(partes)
+
+def tablas_de_consulta(sql):
+    """Tablas leídas por la consulta (FROM/JOIN, sin CTEs ni FROM de funciones)"""
+    sql = _quitar_funciones_from(normalizar_sql(sql))
+    ctes = {nombre.lower() for nombre in _PATRON_CTES.findall(sql)}
+    return sorted({t.lower() for t in _PATRON_TABLAS.findall(sql)} - ctes)
+
+def _ejecutar(sql, conexion, params=None):
+    """Ejecuta un SELECT con un engine de SQLAlchemy o una conexión psycopg2"""
+    if params:
+        return pd.read_sql_query(text(sql), conexion, params=params)
+    return pd.read_sql_query(sql, conexion)
+
+def calcular_watermark(conexion, tablas):
+    """Devuelve el watermark (dict serializable) de las tablas indicadas que están en WATERMARKS"""
+    tablas = [tabla for tabla in tablas if tabla in WATERMARKS]
+    watermark = {}
+    for tabla in tablas:
+        col_id, col_ts = WATERMARKS[tabla]
+        sql = f"SELECT MAX({col_id}) AS max_id, MAX({col_ts}) AS max_ts FROM {tabla}"
+        watermark[tabla] = _ejecutar(sql, conexion).iloc[0].astype(str).to_dict()
+
+    if tablas:
+        # Cubre TRUNCATE/DELETE y recargas que reutilizan los mismos ids
+        contadores = _ejecutar(
+            "SELECT relname, n_tup_ins, n_tup_upd, n_tup_del FROM pg_stat_user_tables "
+            "WHERE relname IN (" + ", ".join(f"'{t}'" for t in tablas) + ")",
+            conexion
+        )
+        for fila in contadores.itertuples(index=False):
+            watermark[fila.relname]['cambios'] = f"{fila.n_tup_ins}/{fila.n_tup_upd}/{fila.n_tup_del}"
+
+    return watermark
+
+def _hash(valor):
+    return hashlib.sha256(json.dumps(valor, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def _expulsar_lru(ruta=RUTA_CACHE, tamano_maximo_mb=TAMANO_MAXIMO_MB):
+    """Elimina las entradas menos usadas hasta quedar bajo el tamaño máximo"""
+    archivos = [(os.path.getmtime(a), os.path.getsize(a), a) for a in glob.glob(os.path.join(ruta, '*.parquet'))]
+    total = sum(tamano for _, tamano, _ in archivos)
+    limite = tamano_maximo_mb * 1024 * 1024
+
+    for _, tamano, archivo in sorted(archivos):
+        if total <= limite:
+            break
+        os.remove(archivo)
+        total -= tamano
+
+def leer_sql_con_cache(sql, conexion, params=None, preparar=None):
+    """
+    Ejecuta un SELECT usando el cache en disco
+
+    conexion: engine de SQLAlchemy o conexión psycopg2
+    params: parámetros con nombre (:param) de la consulta
+    preparar: función aplicada al resultado antes de guardarlo
+        (por ejemplo, conversión a tipos compactos)
+    """
+    tablas = tablas_de_consulta(sql)
+    if not CACHE_HABILITADO or not tablas or any(tabla not in WATERMARKS for tabla in tablas):
+        df = _ejecutar(sql, conexion, params)
+        return preparar(df) if preparar else df
+
+    hash_sql = _hash([normalizar_sql(sql), params or {}])
+    hash_wm = _hash(calcular_watermark(conexion, tablas))
+    archivo = os.path.join(RUTA_CACHE, f'{hash_sql}_{hash_wm}.parquet')
+
+    if os.path.exists(archivo):
+        os.utime(archivo)
+        print(f"   Cache: resultado reutilizado ({os.path.basename(archivo)})")
+        return pd.read_parquet(archivo)
+
+    df = _ejecutar(sql, conexion, params)
+    if preparar:
+        df = preparar(df)
+
+    os.makedirs(RUTA_CACHE, exist_ok=True)
+    for anterior in glob.glob(os.path.join(RUTA_CACHE, f'{hash_sql}_*.parquet')):
+        os.remove(anterior)
+
+    temporal = archivo + '.tmp'
+    df.to_parquet(temporal, index=False)
+    os.replace(temporal, archivo)
+    _expulsar_lru()
+
+    return df
+
+def limpiar_cache(ruta=RUTA_CACHE):
+    """Elimina todas las entradas del cache"""
+    for archivo in glob.glob(os.path.join(ruta, '*.parquet')):
+        os.remove(archivo)
@@ -0,0 +1,132 @@
+"""
+CRYPTOOPS ANALYZER - Catálogo de consultas SQL
+Reúne en un solo lugar las consultas de lectura que ejecuta el proyecto
+
+Fuentes:
+- sql/02_queries_analisis_basico.sql: cada consulta va precedida de un
+  comentario "-- N.N Título" y termina en ';' (clave '02:N.N')
+- CONSULTAS del script 03 (clave '03:<clave>')
+- Lecturas de los scripts: carga compartida del pipeline, métricas, las
+  consultas del servicio de validación, el watermark del cache y la
+  búsqueda de horas de las métricas incrementales (clave '<origen>:<nombre>')
+
+Cada entrada es un dict {'titulo', 'sql', 'params'} con parámetros en
+estilo psycopg2, listo para cursor.execute o para anteponer EXPLAIN.
+"""
+
+import re
+import importlib
+
+from acceso_datos import construir_query_transacciones
+from cache_consultas import WATERMARKS
+
+RUTA_QUERIES_ANALISIS = 'sql/02_queries_analisis_basico.sql'
+
+PATRON_ENCABEZADO = re.compile(r'^--\s*(\d+\.\d+)\s+(.*)$')
+PATRON_PARAMETRO = re.compile(r'(?<!:):([a-z_][a-z0-9_]*)')
+
+# ============================================
+# PARSEO DEL ARCHIVO SQL
+# ============================================
+
+def parsear_archivo_sql(ruta=RUTA_QUERIES_ANALISIS):
+    """
+    {numero: (titulo, sql)} de las consultas numeradas del archivo
+
+    La consulta es el texto entre el encabezado "-- N.N" y el primer ';'.
+    Las consultas sin encabezado numerado se ignoran.
+    """
+    consultas = {}
+    actual = None
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            encabezado = PATRON_ENCABEZADO.match(linea.strip())
+            if encabezado:
+                actual = (encabezado.group(1), encabezado.group(2).strip(), [])
+                continue
+            if actual is None:
+                continue
+            actual[2].append(linea.rstrip())
+            if linea.rstrip().endswith(';'):
+                numero, titulo, lineas = actual
+                consultas[numero] = (titulo, '\n'.join(lineas).strip())
+                actual = None
+    return consultas
+
+def a_parametros_psycopg2(query):
+    """Convierte parámetros ':nombre' (SQLAlchemy) a '%(nombre)s' (psycopg2)"""
+    return PATRON_PARAMETRO.sub(r'%(\1)s', query.replace('%', '%%'))
+
+# ============================================
+# CATÁLOGO
+# ============================================
+
+def _consultas_scripts():
+    """Lecturas que hacen los scripts fuera del archivo SQL"""
+    pipeline = importlib.import_module('ejecutar_pipeline')
+    servicio = importlib.import_module('servicio_validacion')
+
+    query, params = construir_query_transacciones(
+        pipeline.COLUMNAS_COMPARTIDAS,
+        derivadas=pipeline.DERIVADAS_COMPARTIDAS,
+        columnas_usuario=['nivel_verificacion']
+    )
+    return {
+        'pipeline:transacciones': {
+            'titulo': 'Carga compartida de transacciones del pipeline',
+            'sql': a_parametros_psycopg2(query),
+            'params': params
+        },
+        'pipeline:metricas': {
+            'titulo': 'Carga de metricas_operativas',
+            'sql': "SELECT * FROM metricas_operativas ORDER BY fecha, hora",
+            'params': None
+        },
+        'servicio:pendientes': {
+            'titulo': 'Lote de transacciones pendientes del servicio de validación',
+            'sql': servicio.QUERY_PENDIENTES,
+            'params': (0, servicio.TAMANO_LOTE)
+        },
+        'servicio:cola_manual': {
+            'titulo': 'Largo de la cola de validación manual',
+            'sql': servicio.QUERY_COLA_MANUAL,
+            'params': None
+        },
+        'cache:watermark': {
+            'titulo': 'Watermark de transacciones del cache de consultas',
+            'sql': "SELECT MAX({}) AS max_id, MAX({}) AS max_ts FROM transacciones".format(
+                *WATERMARKS['transacciones']
+            ),
+            'params': None
+        },
+        'metricas:horas_afectadas': {
+            'titulo': 'Horas con cambios en la última hora (métricas incrementales)',
+            'sql': (
+                "SELECT DISTINCT date_trunc('hour', timestamp_inicio) FROM transacciones "
+                "WHERE updated_at > NOW() - INTERVAL '1 hour'"
+            ),
+            'params': None
+        }
+    }
+
+def cargar_catalogo(ruta=RUTA_QUERIES_ANALISIS, incluir_scripts=True):
+    """Catálogo completo {clave: {'titulo', 'sql', 'params'}} en orden estable"""
+    catalogo = {
+        f'02:{numero}': {'titulo': titulo, 'sql': query, 'params': None}
+        for numero, (titulo, query) in parsear_archivo_sql(ruta).items()
+    }
+
+    analisis = importlib.import_module('03_ejecutar_analisis_sql')
+    for clave, (nombre, query) in analisis.CONSULTAS.items():
+        catalogo[f'03:{clave}'] = {'titulo': nombre, 'sql': query.strip(), 'params': None}
+
+    if incluir_scripts:
+        catalogo.update(_consultas_scripts())
+    return catalogo
+
+def filtrar_catalogo(catalogo, prefijos):
+    """Entradas cuya clave empieza con alguno de los prefijos (None = todas)"""
+    if not prefijos:
+        return dict(catalogo)
+    return {clave: consulta for clave, consulta in catalogo.items()
+            if any(clave.startswith(prefijo) for prefijo in prefijos)}
@@ -0,0 +1,200 @@
+"""
+CRYPTOOPS ANALYZER - Ejecución concurrente del catálogo SQL
+Corre consultas independientes en paralelo sobre un pool de conexiones y las exporta con COPY
+
+Cada consulta se ejecuta en su propia conexión del pool como
+COPY (consulta) TO STDOUT (FORMAT csv, HEADER): el resultado va directo
+del servidor al CSV, sin pasar por un DataFrame, y después se convierte
+a Parquet por bloques. Con N conexiones el catálogo completo tarda
+aproximadamente lo que la consulta más lenta (si N alcanza).
+
+Por defecto corre las consultas numeradas de
+sql/02_queries_analisis_basico.sql y exporta a data/processed/catalogo/.
+El script 03 usa ejecutar_consultas para sus CONSULTAS.
+
+Uso:
+    python scripts/ejecutar_catalogo_sql.py
+    python scripts/ejecutar_catalogo_sql.py --conexiones 8 --consultas 02:2 02:10
+"""
+
+import os
+import re
+import time
+import argparse
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pyarrow as pa
+import psycopg2
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+from almacenamiento_parquet import csv_a_parquet
+from catalogo_sql import cargar_catalogo, filtrar_catalogo
+from instrumentacion import crear_pool
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+NUM_CONEXIONES = int(os.getenv('CONEXIONES_CATALOGO', '4'))
+DIRECTORIO_CATALOGO = 'data/processed/catalogo'
+
+# OID de tipo de PostgreSQL -> tipo de Arrow para el Parquet (el resto se infiere)
+TIPOS_ARROW = {
+    16: pa.bool_(),
+    20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+    700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+    25: pa.string(), 1042: pa.string(), 1043: pa.string(),
+    1082: pa.date32(),
+    1114: pa.timestamp('us'), 1184: pa.timestamp('us', tz='UTC')
+}
+
+# ============================================
+# EXPORTACIÓN DE UNA CONSULTA
+# ============================================
+
+def preparar_sql(cursor, consulta):
+    """SQL sin ';' final y con los parámetros ya incrustados (COPY no acepta parámetros)"""
+    query = consulta['sql'].strip().rstrip(';')
+    if consulta.get('params'):
+        query = cursor.mogrify(query, consulta['params']).decode()
+    return query
+
+def tipos_arrow_consulta(cursor, query):
+    """Tipos de Arrow de las columnas del resultado (consulta con LIMIT 0)"""
+    cursor.execute(f"SELECT * FROM ({query}) AS consulta LIMIT 0")
+    return {
+        columna.name: TIPOS_ARROW[columna.type_code]
+        for columna in cursor.description if columna.type_code in TIPOS_ARROW
+    }
+
+def exportar_copy(conn, query, ruta_csv):
+    """
+    COPY (query) TO STDOUT directo a un CSV; devuelve (filas, tipos de Arrow)
+
+    La memoria usada no depende del tamaño del resultado.
+    """
+    os.makedirs(os.path.dirname(ruta_csv) or '.', exist_ok=True)
+    cursor = conn.cursor()
+    try:
+        tipos = tipos_arrow_consulta(cursor, query)
+        with open(ruta_csv, 'w', encoding='utf-8', newline='') as archivo:
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", archivo)
+        filas = cursor.rowcount
+        conn.commit()
+        return filas, tipos
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def nombre_archivo(clave):
+    """Nombre de archivo a partir de la clave del catálogo ('02:2.1' -> '02_2_1')"""
+    return re.sub(r'[^a-z0-9]+', '_', clave.lower()).strip('_')
+
+def ejecutar_consulta(pool, clave, consulta, directorio=DIRECTORIO_CATALOGO):
+    """
+    Exporta una consulta a CSV y Parquet usando una conexión del pool
+
+    consulta puede traer 'archivo' (ruta sin extensión); si no, se usa
+    <directorio>/<clave normalizada>. Devuelve un dict con la latencia.
+    """
+    base = consulta.get('archivo') or os.path.join(directorio, nombre_archivo(clave))
+    resultado = {'clave': clave, 'titulo': consulta['titulo'], 'filas': None,
+                 'segundos': None, 'archivo': f"{base}.csv", 'error': None}
+
+    conn = pool.getconn()
+    inicio = time.perf_counter()
+    try:
+        cursor = conn.cursor()
+        query = preparar_sql(cursor, consulta)
+        cursor.close()
+
+        filas, tipos = exportar_copy(conn, query, f"{base}.csv")
+        resultado['segundos_sql'] = round(time.perf_counter() - inicio, 3)
+        csv_a_parquet(f"{base}.csv", f"{base}.parquet", tipos=tipos)
+        resultado['filas'] = filas
+    except (psycopg2.Error, pa.ArrowException, OSError) as e:
+        resultado['error'] = str(e).strip().splitlines()[0]
+    finally:
+        resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+        pool.putconn(conn)
+    return resultado
+
+# ============================================
+# EJECUCIÓN CONCURRENTE
+# ============================================
+
+def ejecutar_consultas(consultas, num_conexiones=NUM_CONEXIONES, directorio=DIRECTORIO_CATALOGO,
+                       db_config=DB_CONFIG):
+    """
+    Ejecuta las consultas en paralelo (una conexión del pool por consulta)
+
+    consultas: {clave: {'titulo', 'sql', 'params'[, 'archivo']}}
+    Devuelve (resultados en el orden de `consultas`, segundos totales).
+    """
+    num_conexiones = max(1, min(num_conexiones, len(consultas)))
+    pool = crear_pool(num_conexiones, num_conexiones, **db_config)
+    inicio = time.perf_counter()
+    resultados = {}
+    try:
+        with ThreadPoolExecutor(max_workers=num_conexiones) as executor:
+            # Cada hilo corre en una copia del contexto (etapa de la instrumentación)
+            futuros = {
+                executor.submit(contextvars.copy_context().run,
+                                ejecutar_consulta, pool, clave, consulta, directorio): clave
+                for clave, consulta in consultas.items()
+            }
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                resultados[resultado['clave']] = resultado
+                estado = f"error: {resultado['error']}" if resultado['error'] else f"{resultado['filas']:,} filas"
+                print(f"  {resultado['clave']:<22} {resultado['segundos']:>8.2f}s  {estado}")
+    finally:
+        pool.closeall()
+
+    total = time.perf_counter() - inicio
+    return [resultados[clave] for clave in consultas], total
+
+def mostrar_resumen(resultados, total):
+    print(f"\n{'='*80}")
+    print("LATENCIA POR CONSULTA")
+    print(f"{'='*80}")
+    columnas = ['clave', 'titulo', 'filas', 'segundos', 'error']
+    ordenados = sorted(resultados, key=lambda r: r['segundos'] or 0, reverse=True)
+    print(tabulate([{c: r[c] for c in columnas} for r in ordenados], headers='keys', tablefmt='grid'))
+
+    suma = sum(r['segundos'] or 0 for r in resultados)
+    mas_lenta = max((r['segundos'] or 0 for r in resultados), default=0)
+    errores = sum(1 for r in resultados if r['error'])
+    print(f"\nTiempo total: {total:.2f}s | suma de latencias: {suma:.2f}s | "
+          f"consulta más lenta: {mas_lenta:.2f}s | errores: {errores}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Ejecución concurrente del catálogo SQL')
+    parser.add_argument('--conexiones', type=int, default=NUM_CONEXIONES)
+    parser.add_argument('--consultas', nargs='+', default=['02:'],
+                        help="Prefijos de clave del catálogo (default: '02:', el archivo SQL)")
+    parser.add_argument('--directorio', default=DIRECTORIO_CATALOGO)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - EJECUCIÓN CONCURRENTE DEL CATÁLOGO SQL")
+    print("="*80)
+
+    consultas = filtrar_catalogo(cargar_catalogo(), args.consultas)
+    print(f"\n{len(consultas)} consultas con {min(args.conexiones, len(consultas))} conexiones\n")
+
+    resultados, total = ejecutar_consultas(consultas, args.conexiones, args.directorio)
+    mostrar_resumen(resultados, total)
+    print(f"\n Resultados en: {args.directorio}/ (.csv + .parquet)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+CRYPTOOPS ANALYZER - Orquestador del pipeline de análisis
+Ejecuta las etapas 03-08 en una sola pasada sobre datos compartidos
+
+Transacciones y métricas se cargan una sola vez (con todas las columnas
+que necesitan las etapas) y se pasan a cada script como DataFrames. Las
+etapas forman un DAG; una etapa se omite si la huella de sus entradas
+(watermark de las tablas, código de la etapa y de los módulos locales
+que importa, config/*.json y huellas de las etapas de las que depende)
+no cambió desde la última ejecución y sus salidas siguen en disco.
+
+Uso:
+    python scripts/ejecutar_pipeline.py
+    python scripts/ejecutar_pipeline.py --forzar
+    python scripts/ejecutar_pipeline.py --etapas visualizaciones dashboard
+"""
+
+import os
+import ast
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import traceback
+from datetime import datetime
+from graphlib import TopologicalSorter
+from tabulate import tabulate
+
+from acceso_datos import cargar_transacciones, cargar_metricas, obtener_engine
+from almacenamiento_parquet import (
+    FUENTE_DATOS, RUTA_TRANSACCIONES_PARQUET, RUTA_USUARIOS_PARQUET, RUTA_METRICAS_PARQUET
+)
+from cache_consultas import calcular_watermark
+from instrumentacion import etapa
+
+DIRECTORIO_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_CONFIG = os.path.join(os.path.dirname(DIRECTORIO_SCRIPTS), 'config')
+RUTA_ESTADO = 'data/processed/.estado_pipeline.json'
+
+# Columnas del dataset compartido (unión de lo que usan las etapas 04-08)
+COLUMNAS_COMPARTIDAS = [
+    'transaction_id', 'user_id', 'estado', 'tiempo_procesamiento', 'cripto',
+    'monto_usd', 'comision_usd', 'motivo_fallo', 'metodo_pago', 'score_fraude',
+    'requiere_validacion_manual', 'timestamp_inicio'
+]
+DERIVADAS_COMPARTIDAS = ['fecha', 'hora', 'dia_semana', 'periodo']
+
+# ============================================
+# DEFINICIÓN DE ETAPAS
+# ============================================
+
+ETAPAS = {
+    'sql': {
+        'modulo': '03_ejecutar_analisis_sql',
+        'depende_de': [],
+        'tablas': ['transacciones'],
+        'salidas': ['data/processed/analisis_*.csv']
+    },
+    'cuellos_botella': {
+        'modulo': '05_analisis_cuellos_botella',
+        'depende_de': [],
+        'tablas': ['transacciones'],
+        'salidas': ['data/processed/reporte_cuellos_botella.csv']
+    },
+    'visualizaciones': {
+        'modulo': '04_visualizaciones',
+        'depende_de': [],
+        'tablas': ['transacciones', 'metricas_operativas'],
+        'salidas': ['visualizations/0[1-8]_*']
+    },
+    'optimizaciones': {
+        'modulo': '06_optimizacion_batch_processing',
+        'depende_de': [],
+        'tablas': ['transacciones', 'usuarios'],
+        'salidas': [
+            'data/processed/comparativa_before_after.csv',
+            'data/processed/propuestas_implementacion.csv',
+            'data/processed/simulacion_capacidad.json'
+        ]
+    },
+    'before_after': {
+        'modulo': '07_visualizacion_before_after',
+        'depende_de': ['optimizaciones'],
+        'tablas': ['transacciones'],
+        'salidas': ['visualizations/10_impacto_before_after.png']
+    },
+    'dashboard': {
+        'modulo': '08_dashboard_ejecutivo',
+        'depende_de': ['cuellos_botella', 'optimizaciones'],
+        'tablas': ['transacciones', 'metricas_operativas'],
+        'salidas': ['visualizations/dashboard_*.html']
+    }
+}
+
+def _ejecutar_sql(modulo, datos):
+    modulo.ejecutar_analisis_sql_paralelo()
+
+def _ejecutar_cuellos_botella(modulo, datos):
+    modulo.analizar_cuellos_botella(datos.transacciones)
+
+def _ejecutar_visualizaciones(modulo, datos):
+    modulo.generar_visualizaciones(datos.transacciones, datos.metricas)
+
+def _ejecutar_optimizaciones(modulo, datos):
+    modulo.simular_optimizaciones(datos.transacciones)
+    modulo.generar_propuestas_implementacion()
+
+def _ejecutar_before_after(modulo, datos):
+    modulo.crear_visualizacion_before_after(datos.transacciones)
+
+def _ejecutar_dashboard(modulo, datos):
+    modulo.crear_dashboard_completo(datos.transacciones, datos.metricas)
+
+EJECUTORES = {
+    'sql': _ejecutar_sql,
+    'cuellos_botella': _ejecutar_cuellos_botella,
+    'visualizaciones': _ejecutar_visualizaciones,
+    'optimizaciones': _ejecutar_optimizaciones,
+    'before_after': _ejecutar_before_after,
+    'dashboard': _ejecutar_dashboard
+}
+
+# ============================================
+# DATOS COMPARTIDOS
+# ============================================
+
+class DatosCompartidos:
+    """Carga perezosa de transacciones y métricas (una sola vez por ejecución)"""
+
+    def __init__(self):
+        self._transacciones = None
+        self._metricas = None
+        self.tiempo_carga = 0.0
+
+    @property
+    def transacciones(self):
+        if self._transacciones is None:
+            inicio = time.time()
+            print("\nCargando transacciones compartidas...")
+            with etapa('carga_compartida'):
+                self._transacciones = cargar_transacciones(
+                    columnas=COLUMNAS_COMPARTIDAS,
+                    derivadas=DERIVADAS_COMPARTIDAS,
+                    columnas_usuario=['nivel_verificacion']
+                )
+            self.tiempo_carga += time.time() - inicio
+            print(f" {len(self._transacciones):,} transacciones cargadas")
+        return self._transacciones
+
+    @property
+    def metricas(self):
+        if self._metricas is None:
+            inicio = time.time()
+            with etapa('carga_compartida'):
+                self._metricas = cargar_metricas()
+            self.tiempo_carga += time.time() - inicio
+            print(f" {len(self._metricas):,} métricas cargadas")
+        return self._metricas
+
+# ============================================
+# HUELLAS DE ENTRADA
+# ============================================
+
+def _hash(valor):
+    return hashlib.sha256(json.dumps(valor, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def _hash_archivo(ruta):
+    with open(ruta, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def _huella_tablas(tablas, cache_watermarks):
+    """Watermark de las tablas (o de los archivos Parquet con FUENTE_DATOS=parquet)"""
+    clave = tuple(sorted(tablas))
+    if clave not in cache_watermarks:
+        if FUENTE_DATOS == 'parquet':
+            archivos = sorted(glob.glob(os.path.join(RUTA_TRANSACCIONES_PARQUET, '**', '*.parquet'), recursive=True))
+            archivos += [RUTA_USUARIOS_PARQUET, RUTA_METRICAS_PARQUET]
+            archivos = [a for a in archivos if os.path.exists(a)]
+            cache_watermarks[clave] = [(a, os.path.getmtime(a), os.path.getsize(a)) for a in archivos]
+        else:
+            cache_watermarks[clave] = calcular_watermark(obtener_engine(), list(clave))
+    return cache_watermarks[clave]
+
+def modulos_locales(modulo):
+    """
+    Rutas de los módulos de scripts/ que usa una etapa (ella misma incluida)
+
+    Sigue los import de cada módulo de forma transitiva, también los que
+    están dentro de funciones.
+    """
+    rutas = set()
+    pendientes = [modulo]
+    while pendientes:
+        ruta = os.path.join(DIRECTORIO_SCRIPTS, f"{pendientes.pop()}.py")
+        if ruta in rutas or not os.path.exists(ruta):
+            continue
+        rutas.add(ruta)
+        with open(ruta, encoding='utf-8') as f:
+            arbol = ast.parse(f.read())
+        for nodo in ast.walk(arbol):
+            if isinstance(nodo, ast.Import):
+                pendientes.extend(alias.name for alias in nodo.names)
+            elif isinstance(nodo, ast.ImportFrom) and nodo.module and not nodo.level:
+                pendientes.append(nodo.module)
+    return sorted(rutas)
+
+def calcular_huella(nombre, huellas, cache_watermarks):
+    """Huella de entrada de una etapa: datos + código (y config/*.json) + huellas de sus dependencias"""
+    etapa = ETAPAS[nombre]
+    archivos = modulos_locales(etapa['modulo']) + sorted(glob.glob(os.path.join(DIRECTORIO_CONFIG, '*.json')))
+    codigo = {os.path.basename(ruta): _hash_archivo(ruta) for ruta in archivos}
+    return _hash({
+        'datos': _huella_tablas(etapa['tablas'], cache_watermarks),
+        'codigo': codigo,
+        'dependencias': [huellas[d] for d in etapa['depende_de']]
+    })
+
+def salidas_presentes(nombre):
+    """True si todas las salidas declaradas de la etapa existen"""
+    return all(glob.glob(patron) for patron in ETAPAS[nombre]['salidas'])
+
+def cargar_estado(ruta=RUTA_ESTADO):
+    if os.path.exists(ruta):
+        with open(ruta) as f:
+            return json.load(f)
+    return {}
+
+def guardar_estado(estado, ruta=RUTA_ESTADO):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporal, ruta)
+
+# ============================================
+# EJECUCIÓN
+# ============================================
+
+def _seleccionar_etapas(etapas):
+    """Etapas pedidas más todas sus dependencias"""
+    if not etapas:
+        return set(ETAPAS)
+    seleccion = set()
+    pendientes = list(etapas)
+    while pendientes:
+        nombre = pendientes.pop()
+        if nombre not in seleccion:
+            seleccion.add(nombre)
+            pendientes.extend(ETAPAS[nombre]['depende_de'])
+    return seleccion
+
+def ejecutar_pipeline(etapas=None, forzar=False):
+    """Ejecuta el DAG de etapas y devuelve la tabla de resultados por etapa"""
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - PIPELINE DE ANÁLISIS")
+    print("="*80)
+    print(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Fuente de datos: {FUENTE_DATOS}")
+
+    seleccion = _seleccionar_etapas(etapas)
+    grafo = {nombre: ETAPAS[nombre]['depende_de'] for nombre in seleccion}
+    orden = list(TopologicalSorter(grafo).static_order())
+
+    estado = cargar_estado()
+    datos = DatosCompartidos()
+    cache_watermarks = {}
+    huellas = {}
+    fallidas = set()
+    resultados = []
+    inicio_total = time.time()
+
+    for nombre in orden:
+        if any(dep in fallidas for dep in ETAPAS[nombre]['depende_de']):
+            fallidas.add(nombre)
+            resultados.append([nombre, 'bloqueada', '-'])
+            continue
+
+        with etapa('huellas'):
+            huellas[nombre] = calcular_huella(nombre, huellas, cache_watermarks)
+        if not forzar and estado.get(nombre) == huellas[nombre] and salidas_presentes(nombre):
+            print(f"\n Etapa '{nombre}': entradas sin cambios, se omite")
+            resultados.append([nombre, 'omitida', '-'])
+            continue
+
+        print(f"\n{'#'*80}")
+        print(f"ETAPA: {nombre} ({ETAPAS[nombre]['modulo']})")
+        print(f"{'#'*80}")
+
+        inicio = time.time()
+        carga_previa = datos.tiempo_carga
+        try:
+            modulo = importlib.import_module(ETAPAS[nombre]['modulo'])
+            with etapa(nombre):
+                EJECUTORES[nombre](modulo, datos)
+            estado[nombre] = huellas[nombre]
+            guardar_estado(estado)
+            # El tiempo de la carga compartida se reporta aparte
+            duracion = time.time() - inicio - (datos.tiempo_carga - carga_previa)
+            resultados.append([nombre, 'ejecutada', f"{duracion:.2f}"])
+        except Exception as e:
+            print(f"\n ERROR en etapa '{nombre}': {e}")
+            traceback.print_exc()
+            fallidas.add(nombre)
+            resultados.append([nombre, 'error', f"{time.time() - inicio:.2f}"])
+
+    print("\n" + "="*80)
+    print("RESUMEN DEL PIPELINE")
+    print("="*80)
+    resultados.append(['carga de datos compartidos', '-', f"{datos.tiempo_carga:.2f}"])
+    resultados.append(['TOTAL', '-', f"{time.time() - inicio_total:.2f}"])
+    print(tabulate(resultados, headers=['Etapa', 'Estado', 'Segundos'], tablefmt='grid'))
+
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline de análisis CryptoOps (etapas 03-08)')
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS),
+                        help='Ejecutar solo estas etapas (y sus dependencias)')
+    parser.add_argument('--forzar', action='store_true',
+                        help='Ejecutar todas las etapas aunque sus entradas no hayan cambiado')
+    args = parser.parse_args()
+
+    resultados = ejecutar_pipeline(args.etapas, args.forzar)
+    if any(fila[1] in ('error', 'bloqueada') for fila in resultados):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+CRYPTOOPS ANALYZER - Gestor de particiones de transacciones
+Crea particiones mensuales futuras y separa/archiva las viejas
+
+Requiere el schema particionado (sql/03_schema_particionado.sql). Las
+particiones se llaman transacciones_pAAAA_MM y cubren un mes de
+timestamp_inicio; la creación usa la función crear_particion_transacciones,
+que mueve a la partición nueva las filas de ese mes que hayan caído en
+transacciones_default.
+
+Archivar una partición es exportarla con COPY a
+data/archive/<particion>.csv.gz, después DETACH (operación de catálogo,
+sin DELETE masivo) y, con --eliminar, borrar la tabla separada.
+
+Uso:
+    python scripts/gestor_particiones.py
+    python scripts/gestor_particiones.py --desde 2024-07 --meses-adelante 6
+    python scripts/gestor_particiones.py --archivar --retencion-meses 12 --eliminar
+"""
+
+import os
+import re
+import gzip
+import time
+import argparse
+from datetime import date, datetime
+import psycopg2
+from psycopg2 import sql
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+TABLA = 'transacciones'
+PARTICION_DEFAULT = 'transacciones_default'
+MESES_ADELANTE = 3
+RETENCION_MESES = 12
+DIRECTORIO_ARCHIVO = 'data/archive'
+
+PATRON_RANGO = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+# ============================================
+# UTILIDADES DE FECHAS
+# ============================================
+
+def inicio_mes(fecha):
+    return date(fecha.year, fecha.month, 1)
+
+def sumar_meses(fecha, meses):
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+def meses_entre(desde, hasta):
+    """Primer día de cada mes desde `desde` hasta `hasta` inclusive"""
+    mes = inicio_mes(desde)
+    while mes <= hasta:
+        yield mes
+        mes = sumar_meses(mes, 1)
+
+# ============================================
+# CONSULTA DE PARTICIONES
+# ============================================
+
+def verificar_particionada(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (TABLA,))
+    fila = cursor.fetchone()
+    if fila is None or fila[0] != 'p':
+        raise RuntimeError(f"{TABLA} no está particionada; ejecutar sql/03_schema_particionado.sql")
+
+def listar_particiones(cursor):
+    """
+    Particiones de transacciones ordenadas por rango
+
+    Cada elemento: {'particion', 'desde', 'hasta', 'filas_estimadas',
+    'tamano_mb'}; la default tiene desde/hasta en None.
+    """
+    cursor.execute("""
+        SELECT
+            c.relname,
+            pg_get_expr(c.relpartbound, c.oid),
+            c.reltuples::bigint,
+            pg_total_relation_size(c.oid) / 1024.0 / 1024.0
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (TABLA,))
+
+    particiones = []
+    for nombre, rango, filas, tamano in cursor.fetchall():
+        limites = PATRON_RANGO.search(rango)
+        particiones.append({
+            'particion': nombre,
+            'desde': datetime.fromisoformat(limites.group(1)).date() if limites else None,
+            'hasta': datetime.fromisoformat(limites.group(2)).date() if limites else None,
+            'filas_estimadas': max(filas, 0),
+            'tamano_mb': round(float(tamano), 2)
+        })
+    return sorted(particiones, key=lambda p: (p['desde'] is None, p['desde']))
+
+def filas_en_default(cursor):
+    cursor.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(PARTICION_DEFAULT)))
+    return cursor.fetchone()[0]
+
+# ============================================
+# CREACIÓN
+# ============================================
+
+def crear_particiones(conn, desde=None, meses_adelante=MESES_ADELANTE, hoy=None):
+    """
+    Crea las particiones mensuales que falten desde `desde` (default: mes
+    actual) hasta `meses_adelante` meses después del actual
+
+    Cada mes se confirma por separado. Devuelve los nombres creados.
+    """
+    hoy = hoy or date.today()
+    hasta = sumar_meses(inicio_mes(hoy), meses_adelante)
+    creadas = []
+
+    cursor = conn.cursor()
+    try:
+        verificar_particionada(cursor)
+        for mes in meses_entre(desde or hoy, hasta):
+            cursor.execute("SELECT crear_particion_transacciones(%s)", (mes,))
+            nombre = cursor.fetchone()[0]
+            conn.commit()
+            if nombre:
+                creadas.append(nombre)
+        return creadas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ============================================
+# ARCHIVO
+# ============================================
+
+def exportar_tabla(cursor, tabla, directorio=DIRECTORIO_ARCHIVO):
+    """COPY de la tabla completa a <directorio>/<tabla>.csv.gz; devuelve la ruta"""
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{tabla}.csv.gz")
+    try:
+        with gzip.open(ruta, 'wt', encoding='utf-8', newline='') as archivo:
+            cursor.copy_expert(
+                sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER)").format(sql.Identifier(tabla)),
+                archivo
+            )
+    except Exception:
+        # No dejar un archivo parcial que parezca un archivo completo
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+    return ruta
+
+def archivar_particiones(conn, retencion_meses=RETENCION_MESES, eliminar=False,
+                         directorio=DIRECTORIO_ARCHIVO, hoy=None):
+    """
+    Separa y exporta las particiones cuyo mes terminó antes del límite de
+    retención
+
+    La partición se exporta mientras sigue adjunta y solo después se hace
+    DETACH (bloqueo breve sobre transacciones): si la exportación falla,
+    sus filas siguen visibles en transacciones. Con eliminar=True la tabla
+    se borra en la misma transacción que el DETACH. Devuelve un dict por
+    partición.
+    """
+    limite = sumar_meses(inicio_mes(hoy or date.today()), -retencion_meses)
+    archivadas = []
+
+    cursor = conn.cursor()
+    try:
+        verificar_particionada(cursor)
+        viejas = [
+            p for p in listar_particiones(cursor)
+            if p['hasta'] is not None and p['hasta'] <= limite
+        ]
+        conn.rollback()
+
+        for particion in viejas:
+            nombre = sql.Identifier(particion['particion'])
+            inicio = time.perf_counter()
+
+            ruta = exportar_tabla(cursor, particion['particion'], directorio)
+            conn.commit()
+
+            cursor.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                sql.Identifier(TABLA), nombre
+            ))
+            if eliminar:
+                cursor.execute(sql.SQL("DROP TABLE {}").format(nombre))
+            conn.commit()
+
+            archivadas.append({
+                'particion': particion['particion'],
+                'desde': particion['desde'],
+                'hasta': particion['hasta'],
+                'archivo': ruta,
+                'eliminada': eliminar,
+                'segundos': round(time.perf_counter() - inicio, 2)
+            })
+        return archivadas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Gestión de particiones mensuales de transacciones')
+    parser.add_argument('--desde', type=lambda v: datetime.strptime(v, '%Y-%m').date(),
+                        help='Primer mes a crear (AAAA-MM); default: mes actual')
+    parser.add_argument('--meses-adelante', type=int, default=MESES_ADELANTE)
+    parser.add_argument('--archivar', action='store_true',
+                        help='Separar y exportar particiones más viejas que la retención')
+    parser.add_argument('--retencion-meses', type=int, default=RETENCION_MESES)
+    parser.add_argument('--eliminar', action='store_true',
+                        help='Borrar las particiones archivadas después de exportarlas')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - GESTOR DE PARTICIONES")
+    print("="*80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        creadas = crear_particiones(conn, args.desde, args.meses_adelante)
+        print(f"\n {len(creadas)} particiones creadas" + (f": {', '.join(creadas)}" if creadas else ""))
+
+        if args.archivar:
+            archivadas = archivar_particiones(conn, args.retencion_meses, args.eliminar)
+            print(f"\n {len(archivadas)} particiones archivadas (retención {args.retencion_meses} meses)")
+            if archivadas:
+                print(tabulate(archivadas, headers='keys', tablefmt='grid'))
+
+        cursor = conn.cursor()
+        particiones = listar_particiones(cursor)
+        en_default = filas_en_default(cursor)
+        conn.rollback()
+        cursor.close()
+    finally:
+        conn.close()
+
+    print(f"\nParticiones actuales ({len(particiones)}):")
+    print(tabulate(particiones, headers='keys', tablefmt='grid'))
+    if en_default:
+        print(f"\n {en_default:,} filas en {PARTICION_DEFAULT}: crear sus meses con --desde")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""
+CRYPTOOPS ANALYZER - Instrumentación de consultas
+Registra tiempo, filas y bytes de cada consulta a PostgreSQL (psycopg2 y SQLAlchemy)
+
+Las conexiones se crean con un cursor_factory que mide cada execute,
+executemany y copy_expert:
+    - conectar(**DB_CONFIG) en lugar de psycopg2.connect(**DB_CONFIG)
+    - crear_pool(minimo, maximo, **DB_CONFIG) en lugar de ThreadedConnectionPool
+    - create_engine(url, connect_args=argumentos_conexion()) para SQLAlchemy
+
+Cada registro lleva la etapa del pipeline (etapa('sql'), guardada en un
+contextvar), el script, el SQL normalizado y un hash del SQL sin
+literales para agrupar ejecuciones de la misma consulta. bytes_enviados
+es el SQL enviado; bytes_recibidos se estima a partir de las filas
+leídas (exacto en COPY). Con INSTRUMENTACION_EXPLAIN=1 se guarda además
+el plan (EXPLAIN sin ANALYZE) de cada SELECT.
+
+Destino (INSTRUMENTACION): 'archivo' (default, JSONL en
+data/processed/instrumentacion_consultas.jsonl), 'db' (logs_sistema.
+detalles_json), 'ambos' o '0' para desactivar. Los registros se vuelcan
+al terminar cada etapa y al salir del proceso.
+
+Uso:
+    python scripts/instrumentacion.py
+    python scripts/instrumentacion.py --etapa sql --top 10
+    python scripts/instrumentacion.py --verificar
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import tempfile
+import time
+import atexit
+import hashlib
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql as psql
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+DESTINO = os.getenv('INSTRUMENTACION', 'archivo').lower()
+HABILITADA = DESTINO not in ('0', 'no', 'ninguno')
+EXPLAIN_HABILITADO = os.getenv('INSTRUMENTACION_EXPLAIN', '0') == '1'
+RUTA_INSTRUMENTACION = os.getenv('INSTRUMENTACION_ARCHIVO', 'data/processed/instrumentacion_consultas.jsonl')
+
+MAX_REGISTROS_BUFFER = 1000
+LARGO_CONSULTA = 500
+FILAS_MUESTRA_BYTES = 100
+
+SCRIPT = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None
+
+_etapa_actual = contextvars.ContextVar('etapa_instrumentacion', default=None)
+_buffer = []
+_lock = threading.Lock()
+
+_PATRON_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+# ============================================
+# ETAPA Y REGISTROS
+# ============================================
+
+@contextmanager
+def etapa(nombre):
+    """Asocia las consultas ejecutadas dentro del bloque a una etapa del pipeline"""
+    token = _etapa_actual.set(nombre)
+    try:
+        yield
+    finally:
+        _etapa_actual.reset(token)
+        volcar()
+
+def _texto_sql(query, cursor):
+    if isinstance(query, psql.Composable):
+        query = query.as_string(cursor)
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', errors='replace')
+    return str(query)
+
+def _nuevo_registro(texto, tipo):
+    """Registro de una consulta; el SQL se normaliza y se trunca"""
+    normalizado = ' '.join(texto[:LARGO_CONSULTA * 4].split())
+    plantilla = _PATRON_LITERALES.sub('?', normalizado)
+    return {
+        'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+        'etapa': _etapa_actual.get(),
+        'script': SCRIPT,
+        'tipo': tipo,
+        'consulta': normalizado[:LARGO_CONSULTA],
+        'hash_consulta': hashlib.sha256(plantilla.encode()).hexdigest()[:12],
+        'segundos': None,
+        'filas': 0,
+        'bytes_enviados': 0,
+        'bytes_recibidos': 0,
+        'error': None
+    }
+
+def _registrar(registro):
+    # Se vuelca antes de agregar: el último registro sigue en memoria y
+    # puede completarse con las filas que se lean después del execute
+    with _lock:
+        lleno = len(_buffer) >= MAX_REGISTROS_BUFFER
+    if lleno:
+        volcar()
+    with _lock:
+        _buffer.append(registro)
+
+def _estimar_bytes(filas):
+    """Tamaño aproximado de las filas (texto de los valores, por muestra)"""
+    if not filas:
+        return 0
+    muestra = filas[:FILAS_MUESTRA_BYTES]
+    tamano = sum(len(str(valor)) for fila in muestra for valor in fila if valor is not None)
+    return int(tamano * len(filas) / len(muestra))
+
+def _tamano(datos):
+    return len(datos.encode('utf-8')) if isinstance(datos, str) else len(datos)
+
+class _ArchivoContado:
+    """Envuelve el archivo de COPY para contar los bytes que pasan por él"""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.bytes = 0
+
+    def read(self, *args):
+        datos = self.archivo.read(*args)
+        self.bytes += _tamano(datos)
+        return datos
+
+    def readline(self, *args):
+        datos = self.archivo.readline(*args)
+        self.bytes += _tamano(datos)
+        return datos
+
+    def write(self, datos):
+        self.bytes += _tamano(datos)
+        return self.archivo.write(datos)
+
+class _ArchivoTextoContado(_ArchivoContado, io.TextIOBase):
+    """
+    _ArchivoContado para archivos de texto
+
+    psycopg2 decide si entrega str o bytes con isinstance(archivo,
+    io.TextIOBase); el envoltorio tiene que pasar esa misma prueba.
+    """
+
+def _envolver_archivo(archivo):
+    if isinstance(archivo, io.TextIOBase):
+        return _ArchivoTextoContado(archivo)
+    return _ArchivoContado(archivo)
+
+# ============================================
+# CURSOR INSTRUMENTADO
+# ============================================
+
+class CursorInstrumentado(psycopg2.extensions.cursor):
+    """Cursor de psycopg2 que registra cada consulta"""
+
+    _registro = None
+
+    def _explicar(self, texto, vars):
+        try:
+            super().execute('EXPLAIN (FORMAT JSON) ' + texto, vars)
+            return super().fetchone()[0][0]['Plan']
+        except psycopg2.Error as e:
+            return {'error': str(e).strip().splitlines()[0]}
+
+    def _medir(self, registro, funcion, *args):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args)
+        except Exception as e:
+            registro['error'] = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+            raise
+        finally:
+            registro['segundos'] = round(time.perf_counter() - inicio, 6)
+            registro['filas'] = max(self.rowcount, 0)
+            self._registro = registro
+            _registrar(registro)
+
+    def execute(self, query, vars=None):
+        texto = _texto_sql(query, self)
+        registro = _nuevo_registro(texto, 'execute')
+        if EXPLAIN_HABILITADO and self.name is None and texto.lstrip().upper().startswith(('SELECT', 'WITH')):
+            registro['plan'] = self._explicar(texto, vars)
+        try:
+            return self._medir(registro, super().execute, query, vars)
+        finally:
+            registro['bytes_enviados'] = len(self.query or b'')
+
+    def executemany(self, query, vars_list):
+        registro = _nuevo_registro(_texto_sql(query, self), 'executemany')
+        return self._medir(registro, super().executemany, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        texto = _texto_sql(sql, self)
+        registro = _nuevo_registro(texto, 'copy')
+        campo = 'bytes_recibidos' if 'TO STDOUT' in texto.upper() else 'bytes_enviados'
+        archivo = _envolver_archivo(file)
+        try:
+            return self._medir(registro, super().copy_expert, sql, archivo, size)
+        finally:
+            registro[campo] = archivo.bytes
+
+    def _contar(self, filas):
+        if self._registro is None:
+            return
+        self._registro['bytes_recibidos'] += _estimar_bytes(filas)
+        if self.name is not None:
+            # Cursor del servidor: las filas llegan al leer, no en el execute
+            self._registro['filas'] += len(filas)
+
+    def fetchone(self):
+        fila = super().fetchone()
+        if fila is not None:
+            self._contar([fila])
+        return fila
+
+    def fetchmany(self, size=None):
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        self._contar(filas)
+        return filas
+
+    def fetchall(self):
+        filas = super().fetchall()
+        self._contar(filas)
+        return filas
+
+# ============================================
+# CONEXIONES
+# ============================================
+
+def argumentos_conexion():
+    """connect_args para create_engine (vacío si la instrumentación está desactivada)"""
+    return {'cursor_factory': CursorInstrumentado} if HABILITADA else {}
+
+def conectar(**config):
+    """psycopg2.connect con el cursor instrumentado"""
+    return psycopg2.connect(**config, **argumentos_conexion())
+
+def crear_pool(minimo, maximo, **config):
+    """ThreadedConnectionPool cuyas conexiones usan el cursor instrumentado"""
+    return ThreadedConnectionPool(minimo, maximo, **config, **argumentos_conexion())
+
+# ============================================
+# PERSISTENCIA
+# ============================================
+
+def _guardar_en_archivo(registros, ruta=RUTA_INSTRUMENTACION):
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, default=str, ensure_ascii=False) + '\n')
+
+def _guardar_en_logs(registros):
+    """Inserta los registros en logs_sistema (conexión sin instrumentar)"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO logs_sistema (nivel, componente, mensaje, detalles_json) VALUES %s
+        """, [
+            (
+                'ERROR' if registro['error'] else 'INFO',
+                'instrumentacion',
+                f"[{registro['etapa'] or registro['script']}] {registro['segundos']:.3f}s, "
+                f"{registro['filas']} filas: {registro['consulta'][:80]}",
+                json.dumps(registro, default=str)
+            )
+            for registro in registros
+        ])
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+def volcar():
+    """Escribe los registros pendientes en el destino configurado"""
+    with _lock:
+        registros = list(_buffer)
+        _buffer.clear()
+    if not registros:
+        return
+
+    if DESTINO in ('archivo', 'ambos'):
+        try:
+            _guardar_en_archivo(registros)
+        except OSError as e:
+            print(f" Instrumentación: no se pudo escribir {RUTA_INSTRUMENTACION}: {e}")
+    if DESTINO in ('db', 'ambos'):
+        try:
+            _guardar_en_logs(registros)
+        except psycopg2.Error as e:
+            print(f" Instrumentación: no se pudo guardar en logs_sistema: {e}")
+
+atexit.register(volcar)
+
+# ============================================
+# VERIFICACIÓN
+# ============================================
+
+CONSULTA_VERIFICACION_COPY = "COPY (SELECT 1 AS uno, 'año' AS texto) TO STDOUT WITH (FORMAT csv, HEADER)"
+
+def _copiar(conn, archivo):
+    cursor = conn.cursor()
+    try:
+        cursor.copy_expert(CONSULTA_VERIFICACION_COPY, archivo)
+    finally:
+        conn.rollback()
+        cursor.close()
+    archivo.seek(0)
+    contenido = archivo.read()
+    return contenido.decode('utf-8') if isinstance(contenido, bytes) else contenido
+
+def verificar_copy(config=DB_CONFIG):
+    """
+    COPY TO STDOUT con el cursor instrumentado hacia archivos de texto y binarios
+
+    El contenido tiene que coincidir con el de una conexión sin instrumentar
+    y el registro tiene que tener los bytes recibidos. Devuelve una lista de
+    (archivo, ok, detalle).
+    """
+    destinos = {
+        'io.StringIO': io.StringIO,
+        'io.BytesIO': io.BytesIO,
+        'archivo de texto': lambda: tempfile.TemporaryFile('w+', encoding='utf-8', newline=''),
+        'archivo binario': lambda: tempfile.TemporaryFile('w+b')
+    }
+    conn_base = psycopg2.connect(**config)
+    conn = psycopg2.connect(**config, cursor_factory=CursorInstrumentado)
+    resultados = []
+    try:
+        for nombre, crear in destinos.items():
+            try:
+                with crear() as archivo:
+                    esperado = _copiar(conn_base, archivo)
+                with crear() as archivo:
+                    obtenido = _copiar(conn, archivo)
+                registro = _buffer[-1] if _buffer else {}
+                ok = obtenido == esperado and registro.get('bytes_recibidos') == _tamano(esperado)
+                detalle = f"{registro.get('bytes_recibidos')} bytes registrados"
+            except Exception as e:
+                ok, detalle = False, f"{type(e).__name__}: {e}"
+            resultados.append((nombre, ok, detalle))
+    finally:
+        conn.close()
+        conn_base.close()
+    return resultados
+
+# ============================================
+# RESUMEN
+# ============================================
+
+def resumir(ruta=RUTA_INSTRUMENTACION, etapa=None):
+    """
+    Tiempos por etapa y consulta
+
+    regresion = última ejecución / mediana de las anteriores (>1 es más lenta).
+    """
+    df = pd.read_json(ruta, lines=True)
+    if etapa:
+        df = df[df['etapa'] == etapa]
+    df['etapa'] = df['etapa'].fillna(df['script'])
+    df = df.sort_values('timestamp')
+
+    def _resumen_grupo(grupo):
+        anteriores = grupo['segundos'].iloc[:-1]
+        ultimo = grupo['segundos'].iloc[-1]
+        mediana_previa = anteriores.median() if len(anteriores) else None
+        return pd.Series({
+            'consulta': grupo['consulta'].iloc[-1][:60],
+            'ejecuciones': len(grupo),
+            'segundos_total': round(grupo['segundos'].sum(), 3),
+            'segundos_mediana': round(grupo['segundos'].median(), 4),
+            'segundos_max': round(grupo['segundos'].max(), 4),
+            'ultimo': round(ultimo, 4),
+            'regresion': round(ultimo / mediana_previa, 2) if mediana_previa else None,
+            'filas_max': int(grupo['filas'].max()),
+            'mb_recibidos': round(grupo['bytes_recibidos'].sum() / 1024**2, 2),
+            'errores': int(grupo['error'].notna().sum())
+        })
+
+    resumen = df.groupby(['etapa', 'hash_consulta']).apply(_resumen_grupo).reset_index()
+    return resumen.sort_values('segundos_total', ascending=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Resumen de la instrumentación de consultas')
+    parser.add_argument('--etapa', help='Filtrar por etapa del pipeline')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--archivo', default=RUTA_INSTRUMENTACION)
+    parser.add_argument('--verificar', action='store_true',
+                        help='Comprobar COPY TO STDOUT con el cursor instrumentado contra la base')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - INSTRUMENTACIÓN DE CONSULTAS")
+    print("="*80)
+
+    if args.verificar:
+        resultados = verificar_copy()
+        print(tabulate(resultados, headers=['Destino COPY', 'OK', 'Detalle'], tablefmt='grid'))
+        if not all(ok for _, ok, _ in resultados):
+            sys.exit(1)
+        return
+
+    if not os.path.exists(args.archivo):
+        print(f"\nNo hay registros en {args.archivo} (INSTRUMENTACION={DESTINO})")
+        return
+
+    resumen = resumir(args.archivo, args.etapa)
+    print(f"\n{len(resumen)} consultas distintas; las {args.top} de más tiempo total:\n")
+    print(tabulate(resumen.head(args.top), headers='keys', tablefmt='grid', showindex=False))
+
+    print(f"\n{'='*80}")
+    print("TIEMPO POR ETAPA")
+    print(f"{'='*80}")
+    por_etapa = resumen.groupby('etapa')[['segundos_total', 'ejecuciones', 'errores']].sum()
+    print(tabulate(por_etapa.sort_values('segundos_total', ascending=False), headers='keys', tablefmt='grid'))
+
+if __name__ == "__main__":
+    main()
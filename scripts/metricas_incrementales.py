@@ -0,0 +1,235 @@
+"""
+CRYPTOOPS ANALYZER - Mantenimiento incremental de metricas_operativas
+Recalcula solo los buckets (fecha, hora) con transacciones nuevas o modificadas
+
+El watermark (máximo updated_at ya procesado) se guarda en
+configuracion_sistema bajo la clave 'metricas.watermark_updated_at'. En
+cada ejecución se buscan las horas de timestamp_inicio de las
+transacciones con updated_at posterior al watermark (menos un margen,
+para cubrir transacciones confirmadas tarde), se recalculan esas horas
+completas en PostgreSQL y se hace upsert sobre unique_fecha_hora. El
+costo depende de los datos nuevos, no del historial.
+
+Las métricas replican las de generar_metricas_operativas (02_crear_datos.py).
+No se contemplan borrados de transacciones ni cambios de timestamp_inicio
+entre horas; para eso está --completo.
+
+Uso:
+    python scripts/metricas_incrementales.py
+    python scripts/metricas_incrementales.py --completo
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+import psycopg2
+from dotenv import load_dotenv
+
+from sketch_cuantiles import ALPHA, gamma_sketch
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+CLAVE_WATERMARK = 'metricas.watermark_updated_at'
+MARGEN_WATERMARK = timedelta(minutes=5)
+
+# Recalcula las horas afectadas a partir de todas sus transacciones
+QUERY_UPSERT_METRICAS = """
+    WITH horas_afectadas AS (
+        SELECT DISTINCT date_trunc('hour', timestamp_inicio) AS inicio
+        FROM transacciones
+        WHERE updated_at > %(desde)s AND updated_at <= %(hasta)s
+    ),
+    transacciones_horas AS (
+        SELECT h.inicio, t.*
+        FROM horas_afectadas h
+        JOIN transacciones t
+            ON t.timestamp_inicio >= h.inicio
+            AND t.timestamp_inicio < h.inicio + INTERVAL '1 hour'
+    ),
+    agregadas AS (
+        SELECT
+            inicio,
+            COUNT(*) AS num_transacciones,
+            COUNT(*) FILTER (WHERE estado = 'exitosa') AS num_transacciones_exitosas,
+            COUNT(*) FILTER (WHERE estado = 'fallida') AS num_transacciones_fallidas,
+            COUNT(DISTINCT user_id) AS num_usuarios_activos,
+            ROUND(AVG(tiempo_procesamiento), 2) AS tiempo_promedio_procesamiento,
+            ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY tiempo_procesamiento)::numeric, 2)
+                AS tiempo_mediano_procesamiento,
+            ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY tiempo_procesamiento)::numeric, 2)
+                AS tiempo_p95_procesamiento,
+            MAX(tiempo_procesamiento) AS tiempo_max_procesamiento,
+            ROUND(COUNT(*) FILTER (WHERE estado = 'fallida') * 100.0 / COUNT(*), 2) AS tasa_error,
+            ROUND(COUNT(*) FILTER (WHERE requiere_validacion_manual) * 100.0 / COUNT(*), 2)
+                AS tasa_validacion_manual,
+            ROUND(COUNT(*) FILTER (WHERE flagged_fraude) * 100.0 / COUNT(*), 2) AS tasa_fraude,
+            SUM(monto_usd) AS volumen_total_usd,
+            ROUND(AVG(monto_usd), 2) AS volumen_promedio_usd,
+            SUM(comision_usd) AS comisiones_totales_usd,
+            COUNT(*) FILTER (WHERE tipo_operacion = 'compra') AS num_compras,
+            COUNT(*) FILTER (WHERE tipo_operacion = 'venta') AS num_ventas,
+            COUNT(*) FILTER (WHERE tipo_operacion = 'swap') AS num_swaps,
+            COUNT(*) FILTER (WHERE tipo_operacion = 'retiro') AS num_retiros
+        FROM transacciones_horas
+        GROUP BY inicio
+    ),
+    -- Sketch de tiempos: conteos por índice ceil(ln(x) / ln(gamma)), como sketch_cuantiles.py
+    buckets_sketch AS (
+        SELECT
+            inicio,
+            CASE WHEN tiempo_procesamiento > 0
+                THEN CEIL(LN(tiempo_procesamiento::float8) / LN(%(gamma)s::float8))::int END AS indice,
+            COUNT(*) AS conteo
+        FROM transacciones_horas
+        WHERE tiempo_procesamiento IS NOT NULL
+        GROUP BY 1, 2
+    ),
+    sketches AS (
+        SELECT
+            inicio,
+            jsonb_build_object(
+                'alpha', %(alpha)s,
+                'ceros', COALESCE(SUM(conteo) FILTER (WHERE indice IS NULL), 0),
+                'indices', COALESCE(jsonb_agg(indice ORDER BY indice) FILTER (WHERE indice IS NOT NULL), '[]'::jsonb),
+                'conteos', COALESCE(jsonb_agg(conteo ORDER BY indice) FILTER (WHERE indice IS NOT NULL), '[]'::jsonb)
+            ) AS sketch_tiempo
+        FROM buckets_sketch
+        GROUP BY inicio
+    )
+    INSERT INTO metricas_operativas (
+        fecha, hora, num_transacciones, num_transacciones_exitosas,
+        num_transacciones_fallidas, num_usuarios_activos,
+        tiempo_promedio_procesamiento, tiempo_mediano_procesamiento,
+        tiempo_p95_procesamiento, tiempo_max_procesamiento,
+        tasa_error, tasa_validacion_manual, tasa_fraude,
+        volumen_total_usd, volumen_promedio_usd, comisiones_totales_usd,
+        num_compras, num_ventas, num_swaps, num_retiros, sketch_tiempo
+    )
+    SELECT
+        a.inicio::date,
+        EXTRACT(HOUR FROM a.inicio)::int,
+        a.num_transacciones, a.num_transacciones_exitosas,
+        a.num_transacciones_fallidas, a.num_usuarios_activos,
+        a.tiempo_promedio_procesamiento, a.tiempo_mediano_procesamiento,
+        a.tiempo_p95_procesamiento, a.tiempo_max_procesamiento,
+        a.tasa_error, a.tasa_validacion_manual, a.tasa_fraude,
+        a.volumen_total_usd, a.volumen_promedio_usd, a.comisiones_totales_usd,
+        a.num_compras, a.num_ventas, a.num_swaps, a.num_retiros,
+        s.sketch_tiempo
+    FROM agregadas a
+    LEFT JOIN sketches s ON s.inicio = a.inicio
+    ON CONFLICT ON CONSTRAINT unique_fecha_hora DO UPDATE SET
+        num_transacciones = EXCLUDED.num_transacciones,
+        num_transacciones_exitosas = EXCLUDED.num_transacciones_exitosas,
+        num_transacciones_fallidas = EXCLUDED.num_transacciones_fallidas,
+        num_usuarios_activos = EXCLUDED.num_usuarios_activos,
+        tiempo_promedio_procesamiento = EXCLUDED.tiempo_promedio_procesamiento,
+        tiempo_mediano_procesamiento = EXCLUDED.tiempo_mediano_procesamiento,
+        tiempo_p95_procesamiento = EXCLUDED.tiempo_p95_procesamiento,
+        tiempo_max_procesamiento = EXCLUDED.tiempo_max_procesamiento,
+        tasa_error = EXCLUDED.tasa_error,
+        tasa_validacion_manual = EXCLUDED.tasa_validacion_manual,
+        tasa_fraude = EXCLUDED.tasa_fraude,
+        volumen_total_usd = EXCLUDED.volumen_total_usd,
+        volumen_promedio_usd = EXCLUDED.volumen_promedio_usd,
+        comisiones_totales_usd = EXCLUDED.comisiones_totales_usd,
+        num_compras = EXCLUDED.num_compras,
+        num_ventas = EXCLUDED.num_ventas,
+        num_swaps = EXCLUDED.num_swaps,
+        num_retiros = EXCLUDED.num_retiros,
+        sketch_tiempo = EXCLUDED.sketch_tiempo,
+        updated_at = NOW()
+"""
+
+# ============================================
+# WATERMARK
+# ============================================
+
+def leer_watermark(cursor):
+    """Último updated_at procesado (None si nunca se ejecutó)"""
+    cursor.execute("SELECT valor FROM configuracion_sistema WHERE clave = %s", (CLAVE_WATERMARK,))
+    fila = cursor.fetchone()
+    return datetime.fromisoformat(fila[0]) if fila else None
+
+def guardar_watermark(cursor, watermark):
+    cursor.execute("""
+        INSERT INTO configuracion_sistema (clave, valor, descripcion, updated_at)
+        VALUES (%s, %s, 'Último updated_at de transacciones incluido en metricas_operativas', NOW())
+        ON CONFLICT (clave) DO UPDATE SET valor = EXCLUDED.valor, updated_at = NOW()
+    """, (CLAVE_WATERMARK, watermark.isoformat()))
+
+# ============================================
+# ACTUALIZACIÓN
+# ============================================
+
+def actualizar_metricas(conn, completo=False, margen=MARGEN_WATERMARK):
+    """
+    Recalcula las horas afectadas desde el watermark y lo avanza
+
+    Upsert y watermark se confirman en la misma transacción. Devuelve
+    (horas_actualizadas, desde, hasta).
+    """
+    cursor = conn.cursor()
+    try:
+        watermark = None if completo else leer_watermark(cursor)
+        desde = watermark - margen if watermark else datetime.min
+
+        cursor.execute("SELECT MAX(updated_at) FROM transacciones")
+        hasta = cursor.fetchone()[0]
+        if hasta is None or (watermark is not None and hasta <= watermark):
+            conn.rollback()
+            return 0, desde, watermark
+
+        cursor.execute(QUERY_UPSERT_METRICAS, {
+            'desde': desde, 'hasta': hasta, 'alpha': ALPHA, 'gamma': gamma_sketch(ALPHA)
+        })
+        horas = cursor.rowcount
+        guardar_watermark(cursor, hasta)
+        conn.commit()
+        return horas, desde, hasta
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Actualización incremental de metricas_operativas')
+    parser.add_argument('--completo', action='store_true',
+                        help='Ignorar el watermark y recalcular todas las horas')
+    parser.add_argument('--margen-minutos', type=float, default=MARGEN_WATERMARK.total_seconds() / 60,
+                        help='Margen hacia atrás desde el watermark')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - MÉTRICAS OPERATIVAS INCREMENTALES")
+    print("="*80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        inicio = time.perf_counter()
+        horas, desde, hasta = actualizar_metricas(
+            conn, completo=args.completo, margen=timedelta(minutes=args.margen_minutos)
+        )
+        segundos = time.perf_counter() - inicio
+
+        if horas == 0:
+            print(f"\nSin transacciones nuevas desde {hasta}")
+        else:
+            print(f"\n {horas:,} horas recalculadas en {segundos:.2f}s")
+            print(f"   Cambios desde: {'inicio' if desde == datetime.min else desde}")
+            print(f"   Nuevo watermark: {hasta}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
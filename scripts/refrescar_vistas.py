@@ -0,0 +1,143 @@
+"""
+CRYPTOOPS ANALYZER - Refresco de vistas materializadas
+Refresca mv_resumen_usuarios y mv_top_criptos y mide cuánto tarda cada una
+
+Las vistas materializadas reemplazan en lectura a vista_resumen_usuarios y
+vista_top_criptos (que recalculan el JOIN/GROUP BY en cada consulta). Por
+defecto se usa REFRESH MATERIALIZED VIEW CONCURRENTLY, que no bloquea las
+lecturas mientras se recalcula (necesita el índice único de cada vista);
+si la vista nunca se pobló se hace un refresco normal.
+
+Cada refresco queda registrado en logs_sistema (componente
+'refrescar_vistas') con la duración y la cantidad de filas.
+
+Uso:
+    python scripts/refrescar_vistas.py
+    python scripts/refrescar_vistas.py --vistas mv_top_criptos
+    python scripts/refrescar_vistas.py --bloqueante
+"""
+
+import os
+import json
+import time
+import argparse
+import psycopg2
+from psycopg2 import sql
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+VISTAS_MATERIALIZADAS = ('mv_resumen_usuarios', 'mv_top_criptos')
+
+# ============================================
+# ESTADO
+# ============================================
+
+def estado_vistas(cursor, vistas=VISTAS_MATERIALIZADAS):
+    """{vista: poblada} según pg_matviews (solo las que existen)"""
+    cursor.execute("""
+        SELECT matviewname, ispopulated
+        FROM pg_matviews
+        WHERE schemaname = 'public' AND matviewname = ANY(%s)
+    """, (list(vistas),))
+    return dict(cursor.fetchall())
+
+# ============================================
+# REFRESCO
+# ============================================
+
+def refrescar_vista(conn, vista, concurrente=True):
+    """
+    Refresca una vista materializada y confirma
+
+    Devuelve un dict con vista, modo, segundos y filas.
+    """
+    if vista not in VISTAS_MATERIALIZADAS:
+        raise ValueError(f"Vista no soportada: {vista} (opciones: {', '.join(VISTAS_MATERIALIZADAS)})")
+
+    cursor = conn.cursor()
+    try:
+        poblada = estado_vistas(cursor, [vista]).get(vista)
+        if poblada is None:
+            raise RuntimeError(f"{vista} no existe; ejecutar sql/01_schema_creation.sql")
+
+        # CONCURRENTLY no se puede usar sobre una vista sin datos
+        concurrente = concurrente and poblada
+        modo = sql.SQL('CONCURRENTLY ') if concurrente else sql.SQL('')
+
+        inicio = time.perf_counter()
+        cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW {}{}").format(modo, sql.Identifier(vista)))
+        conn.commit()
+        segundos = time.perf_counter() - inicio
+
+        cursor.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(vista)))
+        filas = cursor.fetchone()[0]
+        return {
+            'vista': vista,
+            'modo': 'concurrente' if concurrente else 'bloqueante',
+            'segundos': round(segundos, 3),
+            'filas': filas
+        }
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def registrar_refresco(conn, resultado):
+    """Deja el refresco en logs_sistema"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO logs_sistema (nivel, componente, mensaje, detalles_json)
+            VALUES ('INFO', 'refrescar_vistas', %s, %s)
+        """, (
+            f"{resultado['vista']} refrescada en {resultado['segundos']:.2f}s",
+            json.dumps(resultado)
+        ))
+        conn.commit()
+    finally:
+        cursor.close()
+
+def refrescar_vistas(conn, vistas=VISTAS_MATERIALIZADAS, concurrente=True):
+    """Refresca cada vista en orden y devuelve la lista de resultados"""
+    resultados = []
+    for vista in vistas:
+        resultado = refrescar_vista(conn, vista, concurrente=concurrente)
+        registrar_refresco(conn, resultado)
+        resultados.append(resultado)
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresco de vistas materializadas')
+    parser.add_argument('--vistas', nargs='+', choices=VISTAS_MATERIALIZADAS,
+                        default=list(VISTAS_MATERIALIZADAS))
+    parser.add_argument('--bloqueante', action='store_true',
+                        help='Refrescar sin CONCURRENTLY (más rápido, bloquea lecturas)')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - REFRESCO DE VISTAS MATERIALIZADAS")
+    print("="*80)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        resultados = refrescar_vistas(conn, args.vistas, concurrente=not args.bloqueante)
+    finally:
+        conn.close()
+
+    print()
+    print(tabulate(resultados, headers='keys', tablefmt='grid'))
+    print(f"\n Tiempo total: {sum(r['segundos'] for r in resultados):.2f}s")
+
+if __name__ == "__main__":
+    main()
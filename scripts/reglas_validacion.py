@@ -0,0 +1,237 @@
+"""
+CRYPTOOPS ANALYZER - Reglas de validación automática declarativas
+Carga, compilación y recarga en caliente de las reglas del validador
+
+Las reglas se definen como datos en config/reglas_validacion.json y se
+pueden ajustar desde configuracion_sistema (claves 'validacion.<regla>').
+Cada definición se compila una vez en un PlanValidacion inmutable:
+conjuntos precalculados (frozenset) para las reglas de pertenencia y
+orden de evaluación por selectividad (primero las reglas que más
+transacciones envían a revisión). El orden de las reglas en el archivo
+define la prioridad del motivo reportado, igual que antes.
+
+GestorReglas revisa el archivo y la tabla cada pocos segundos y, si
+cambiaron, compila un plan nuevo y lo reemplaza de forma atómica; cada
+lote se evalúa completo con el plan vigente al empezar.
+"""
+
+import os
+import json
+import time
+import threading
+import numpy as np
+
+RUTA_REGLAS = os.getenv(
+    'RUTA_REGLAS_VALIDACION',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'reglas_validacion.json')
+)
+PREFIJO_CONFIG = 'validacion.'
+INTERVALO_REVISION = 5  # segundos entre revisiones de cambios
+
+TIPOS_REGLA = ('maximo', 'minimo', 'pertenece')
+
+# ============================================
+# DEFINICIÓN (DATOS)
+# ============================================
+
+def cargar_definicion(ruta=RUTA_REGLAS):
+    """Lee la definición de reglas desde JSON"""
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+def leer_overrides_db(conn):
+    """Lee los ajustes 'validacion.*' de configuracion_sistema"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT clave, valor FROM configuracion_sistema WHERE clave LIKE %s",
+        (PREFIJO_CONFIG + '%',)
+    )
+    overrides = {clave[len(PREFIJO_CONFIG):]: valor for clave, valor in cursor.fetchall()}
+    cursor.close()
+    return overrides
+
+def aplicar_overrides(definicion, overrides):
+    """
+    Aplica ajustes (valores TEXT de configuracion_sistema) sobre la definición
+
+    'tiempo_validacion_auto' / 'tiempo_validacion_manual' -> tiempos
+    '<regla>' -> umbral (reglas maximo/minimo) o lista separada por comas
+    (reglas pertenece)
+    """
+    definicion = json.loads(json.dumps(definicion))
+    for clave in ('tiempo_validacion_auto', 'tiempo_validacion_manual'):
+        if clave in overrides:
+            definicion[clave] = int(overrides[clave])
+
+    for regla in definicion['reglas']:
+        if regla['nombre'] not in overrides:
+            continue
+        valor = overrides[regla['nombre']]
+        if regla['tipo'] == 'pertenece':
+            regla['valores'] = [v.strip() for v in valor.split(',') if v.strip()]
+        else:
+            regla['umbral'] = float(valor)
+    return definicion
+
+# ============================================
+# PLAN COMPILADO
+# ============================================
+
+class ReglaCompilada:
+    """Regla lista para evaluar (escalar y vectorizada)"""
+
+    __slots__ = ('nombre', 'tipo', 'campo', 'umbral', 'valores', 'valores_lista', 'motivo', 'prioridad')
+
+    def __init__(self, definicion, prioridad):
+        if definicion['tipo'] not in TIPOS_REGLA:
+            raise ValueError(f"Tipo de regla no soportado: {definicion['tipo']}")
+        self.nombre = definicion['nombre']
+        self.tipo = definicion['tipo']
+        self.campo = definicion['campo']
+        self.umbral = definicion.get('umbral')
+        self.valores = frozenset(definicion.get('valores', ()))
+        self.valores_lista = list(self.valores)
+        self.motivo = definicion['motivo']
+        self.prioridad = prioridad
+
+    def falla(self, valor):
+        """True si el valor envía la transacción a revisión manual"""
+        if self.tipo == 'maximo':
+            return valor > self.umbral
+        if self.tipo == 'minimo':
+            return valor < self.umbral
+        return valor not in self.valores
+
+    def falla_vector(self, serie):
+        """Versión vectorizada de falla (misma semántica con NaN: solo falla 'pertenece')"""
+        if self.tipo == 'maximo':
+            return (serie > self.umbral).to_numpy()
+        if self.tipo == 'minimo':
+            return (serie < self.umbral).to_numpy()
+        return ~serie.isin(self.valores_lista).to_numpy()
+
+class PlanValidacion:
+    """Plan inmutable: reglas por prioridad y orden de evaluación por selectividad"""
+
+    def __init__(self, definicion, selectividad=None):
+        self.definicion = definicion
+        self.tiempo_validacion_auto = definicion['tiempo_validacion_auto']
+        self.tiempo_validacion_manual = definicion['tiempo_validacion_manual']
+        self.reglas = [ReglaCompilada(r, i + 1) for i, r in enumerate(definicion['reglas'])]
+
+        # Más selectiva primero; a igual selectividad se respeta la prioridad
+        selectividad = selectividad or {}
+        self.orden_evaluacion = sorted(
+            self.reglas, key=lambda r: (-selectividad.get(r.nombre, 0.0), r.prioridad)
+        )
+
+    def evaluar(self, txn):
+        """
+        Devuelve la regla de mayor prioridad que falla (o None si se aprueba)
+
+        Evalúa en orden de selectividad; tras una falla solo revisa las
+        reglas de mayor prioridad que la encontrada.
+        """
+        fallida = None
+        for regla in self.orden_evaluacion:
+            if fallida is not None and regla.prioridad > fallida.prioridad:
+                continue
+            if regla.falla(txn[regla.campo]):
+                fallida = regla
+                if regla.prioridad == 1:
+                    break
+        return fallida
+
+    def evaluar_lote(self, df):
+        """
+        Devuelve, por fila, la prioridad de la regla que falla (0 = aprobada)
+
+        Cada regla se evalúa solo sobre las filas que aún no tienen una
+        falla de mayor prioridad.
+        """
+        n = len(df)
+        regla = np.zeros(n, dtype=np.int16)
+        for compilada in self.orden_evaluacion:
+            candidatas = np.flatnonzero((regla == 0) | (regla > compilada.prioridad))
+            if len(candidatas) == 0:
+                continue
+            serie = df[compilada.campo]
+            if len(candidatas) < n:
+                serie = serie.iloc[candidatas]
+            regla[candidatas[compilada.falla_vector(serie)]] = compilada.prioridad
+        return regla
+
+    def como_dict(self):
+        """Vista plana de umbrales y tiempos (formato del antiguo _cargar_reglas)"""
+        reglas = {
+            'tiempo_validacion_auto': self.tiempo_validacion_auto,
+            'tiempo_validacion_manual': self.tiempo_validacion_manual
+        }
+        for regla in self.reglas:
+            reglas[regla.nombre] = sorted(regla.valores) if regla.tipo == 'pertenece' else regla.umbral
+        return reglas
+
+def estimar_selectividad(plan, muestra):
+    """Fracción de la muestra que falla cada regla (evaluada de forma independiente)"""
+    if len(muestra) == 0:
+        return {}
+    return {regla.nombre: float(regla.falla_vector(muestra[regla.campo]).mean()) for regla in plan.reglas}
+
+# ============================================
+# RECARGA EN CALIENTE
+# ============================================
+
+class GestorReglas:
+    """
+    Mantiene el plan vigente y lo recompila cuando cambian el archivo
+    de reglas o los ajustes en configuracion_sistema
+    """
+
+    def __init__(self, ruta=RUTA_REGLAS, conn=None, intervalo_revision=INTERVALO_REVISION):
+        self.ruta = ruta
+        self.conn = conn
+        self.intervalo_revision = intervalo_revision
+        self.selectividad = {}
+        self._lock = threading.Lock()
+        self._ultima_revision = 0.0
+        self._firma = None
+        self._plan = None
+        self.recargar(forzar=True)
+
+    def _firma_actual(self):
+        """mtime del archivo + ajustes vigentes en la base de datos"""
+        overrides = leer_overrides_db(self.conn) if self.conn is not None else {}
+        return (os.path.getmtime(self.ruta), tuple(sorted(overrides.items()))), overrides
+
+    def recargar(self, forzar=False):
+        """Compila un plan nuevo si cambió la configuración; devuelve True si lo reemplazó"""
+        with self._lock:
+            self._ultima_revision = time.time()
+            try:
+                firma, overrides = self._firma_actual()
+                if not forzar and firma == self._firma:
+                    return False
+                definicion = aplicar_overrides(cargar_definicion(self.ruta), overrides)
+                plan = PlanValidacion(definicion, self.selectividad)
+            except Exception as e:
+                if self._plan is None:
+                    raise
+                print(f" Error recargando reglas de validación, se mantiene el plan anterior: {e}")
+                return False
+
+            # Reemplazo atómico: los lotes en curso conservan su referencia al plan anterior
+            self._plan = plan
+            self._firma = firma
+            return True
+
+    def calibrar(self, muestra):
+        """Reordena la evaluación según la selectividad observada en una muestra"""
+        self.selectividad = estimar_selectividad(self._plan, muestra)
+        with self._lock:
+            self._plan = PlanValidacion(self._plan.definicion, self.selectividad)
+
+    def plan(self):
+        """Plan vigente (revisa cambios como máximo cada intervalo_revision segundos)"""
+        if time.time() - self._ultima_revision >= self.intervalo_revision:
+            self.recargar()
+        return self._plan
@@ -0,0 +1,324 @@
+"""
+CRYPTOOPS ANALYZER - Servicio de validación automática en línea
+Valida transacciones pendientes a medida que se insertan
+
+Un productor espera avisos de PostgreSQL (LISTEN transacciones_pendientes,
+emitido por trigger_notificar_transacciones_pendientes) o, sin LISTEN,
+consulta cada INTERVALO_POLL segundos. Las transacciones pendientes sin
+validación se leen en micro-lotes y pasan por una asyncio.Queue acotada a
+los workers, que aplican ValidadorAutomatico y registran el resultado en
+validaciones. Las llamadas a la base de datos corren en un executor para
+no bloquear el loop.
+
+Backpressure: la cola interna acotada frena al productor si los workers
+no dan abasto, y si la cola de revisión manual supera LIMITE_COLA_MANUAL
+el productor reduce el tamaño de lote y espera antes de seguir leyendo.
+
+Pensado para una sola instancia del servicio por base de datos.
+
+Uso:
+    python scripts/servicio_validacion.py
+    python scripts/servicio_validacion.py --workers 4 --sin-listen --duracion 60
+"""
+
+import os
+import time
+import signal
+import asyncio
+import argparse
+import importlib
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import psycopg2
+from dotenv import load_dotenv
+
+from acceso_datos import aplicar_tipos
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST'),
+    'port': os.getenv('DB_PORT'),
+    'database': os.getenv('DB_NAME'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD')
+}
+
+CANAL_NOTIFICACIONES = 'transacciones_pendientes'
+NUM_WORKERS = int(os.getenv('WORKERS_SERVICIO_VALIDACION', '2'))
+TAMANO_LOTE = 500             # transacciones por micro-lote
+TAMANO_LOTE_MINIMO = 50       # micro-lote con backpressure activo
+MAX_LOTES_EN_COLA = 4         # micro-lotes esperando worker
+INTERVALO_POLL = 0.5          # segundos entre consultas sin aviso
+LIMITE_COLA_MANUAL = int(os.getenv('LIMITE_COLA_MANUAL', '500'))
+PAUSA_BACKPRESSURE = 2.0      # segundos de espera con la cola manual llena
+INTERVALO_COLA_MANUAL = 5.0   # segundos entre mediciones de la cola manual
+INTERVALO_REPORTE = 30.0      # segundos entre reportes de estado
+
+COLUMNAS_VALIDACION = [
+    'transaction_id', 'timestamp_inicio', 'monto_usd', 'score_fraude', 'metodo_pago', 'nivel_verificacion'
+]
+
+QUERY_PENDIENTES = """
+    SELECT t.transaction_id, t.timestamp_inicio, t.monto_usd, t.score_fraude,
+           t.metodo_pago, u.nivel_verificacion
+    FROM transacciones t
+    JOIN usuarios u ON t.user_id = u.user_id
+    WHERE t.estado = 'pendiente'
+      AND t.transaction_id > %s
+      AND NOT EXISTS (
+          SELECT 1 FROM validaciones v
+          WHERE v.transaction_id = t.transaction_id
+            AND v.tipo_validacion IN ('automatica', 'manual')
+      )
+    ORDER BY t.transaction_id
+    LIMIT %s
+"""
+
+QUERY_COLA_MANUAL = """
+    SELECT COUNT(*)
+    FROM transacciones
+    WHERE requiere_validacion_manual = TRUE
+      AND fecha_validacion_manual IS NULL
+      AND estado IN ('pendiente', 'procesando')
+"""
+
+# ============================================
+# ACCESO A BASE DE DATOS (SÍNCRONO, CORRE EN EL EXECUTOR)
+# ============================================
+
+def leer_pendientes(conn, ultimo_id, limite):
+    """Transacciones pendientes sin validación, con los campos que usan las reglas"""
+    cursor = conn.cursor()
+    cursor.execute(QUERY_PENDIENTES, (ultimo_id, limite))
+    filas = cursor.fetchall()
+    cursor.close()
+    conn.commit()
+    return aplicar_tipos(pd.DataFrame(filas, columns=COLUMNAS_VALIDACION))
+
+def medir_cola_manual(conn):
+    """Transacciones esperando revisión manual"""
+    cursor = conn.cursor()
+    cursor.execute(QUERY_COLA_MANUAL)
+    total = cursor.fetchone()[0]
+    cursor.close()
+    conn.commit()
+    return total
+
+# ============================================
+# SERVICIO
+# ============================================
+
+class ServicioValidacion:
+    """Productor (LISTEN/poll) + workers asyncio sobre una cola acotada"""
+
+    def __init__(self, num_workers=NUM_WORKERS, tamano_lote=TAMANO_LOTE, usar_listen=True,
+                 limite_cola_manual=LIMITE_COLA_MANUAL):
+        self.num_workers = num_workers
+        self.tamano_lote = tamano_lote
+        self.usar_listen = usar_listen
+        self.limite_cola_manual = limite_cola_manual
+
+        self.conn_lectura = psycopg2.connect(**DB_CONFIG)
+        self.conexiones_workers = [psycopg2.connect(**DB_CONFIG) for _ in range(num_workers)]
+        self.conn_listen = None
+
+        modulo = importlib.import_module('06_optimizacion_batch_processing')
+        self.guardar_validaciones = modulo.guardar_validaciones
+        conn_reglas = psycopg2.connect(**DB_CONFIG)
+        conn_reglas.autocommit = True
+        self.gestor_reglas = modulo.GestorReglas(modulo.RUTA_REGLAS, conn_reglas)
+        # Un validador por worker (sus stats se actualizan desde hilos del
+        # executor); todos comparten el plan de reglas
+        self.validadores = [
+            modulo.ValidadorAutomatico(conn_reglas, gestor_reglas=self.gestor_reglas)
+            for _ in range(num_workers)
+        ]
+
+        self.cola = None
+        self.aviso = None
+        self.detener = None
+        self.ultimo_id = 0
+        self.reintentar_desde = None
+        self.en_proceso = set()  # ids leídos que todavía no se registraron
+        self.cola_manual = 0
+        self.latencias = deque(maxlen=10000)
+        self.stats = {'lotes': 0, 'validadas': 0, 'manuales': 0, 'errores': 0, 'pausas_backpressure': 0}
+
+    # --- LISTEN/NOTIFY ---
+
+    def _escuchar(self, loop):
+        """Registra LISTEN y despierta al productor cuando llega un aviso"""
+        self.conn_listen = psycopg2.connect(**DB_CONFIG)
+        self.conn_listen.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = self.conn_listen.cursor()
+        cursor.execute(f"LISTEN {CANAL_NOTIFICACIONES}")
+        cursor.close()
+
+        def _al_recibir():
+            self.conn_listen.poll()
+            if self.conn_listen.notifies:
+                self.conn_listen.notifies.clear()
+                self.aviso.set()
+
+        loop.add_reader(self.conn_listen.fileno(), _al_recibir)
+
+    # --- PRODUCTOR ---
+
+    async def _esperar_trabajo(self):
+        """Espera un aviso o el intervalo de poll"""
+        try:
+            await asyncio.wait_for(self.aviso.wait(), timeout=INTERVALO_POLL)
+        except asyncio.TimeoutError:
+            pass
+        self.aviso.clear()
+
+    async def productor(self):
+        loop = asyncio.get_running_loop()
+        ultima_medicion = 0.0
+
+        while not self.detener.is_set():
+            if time.time() - ultima_medicion >= INTERVALO_COLA_MANUAL:
+                self.cola_manual = await loop.run_in_executor(None, medir_cola_manual, self.conn_lectura)
+                ultima_medicion = time.time()
+
+            limite = self.tamano_lote
+            if self.cola_manual > self.limite_cola_manual:
+                # Cola manual llena: lotes chicos y pausa antes de seguir leyendo
+                self.stats['pausas_backpressure'] += 1
+                limite = TAMANO_LOTE_MINIMO
+                await asyncio.sleep(PAUSA_BACKPRESSURE)
+
+            if self.reintentar_desde is not None:
+                self.ultimo_id, self.reintentar_desde = self.reintentar_desde, None
+
+            lote = await loop.run_in_executor(None, leer_pendientes, self.conn_lectura, self.ultimo_id, limite)
+            if not lote.empty:
+                self.ultimo_id = int(lote['transaction_id'].max())
+                lote = lote[~lote['transaction_id'].isin(self.en_proceso)]
+            if lote.empty:
+                # Sin trabajo: la próxima lectura vuelve a empezar desde el principio
+                # para recoger ids menores confirmados tarde (inserciones concurrentes)
+                self.ultimo_id = 0
+                await self._esperar_trabajo()
+                continue
+
+            self.en_proceso.update(lote['transaction_id'].tolist())
+            await self.cola.put(lote)  # bloquea si los workers van atrasados
+
+    # --- WORKERS ---
+
+    def _procesar_microlote(self, conn, validador, lote):
+        """Valida y registra un micro-lote (corre en el executor)"""
+        # Un solo plan para evaluar y para registrar las reglas aplicadas
+        plan = self.gestor_reglas.plan()
+        resultados = validador.procesar_lote(lote, plan=plan)
+        reglas_aplicadas = [regla.nombre for regla in plan.reglas]
+        self.guardar_validaciones(conn, lote, resultados, reglas_aplicadas)
+        return int((resultados['resultado'] == 'revision_manual').sum())
+
+    async def worker(self, conn, validador):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = await self.cola.get()
+            try:
+                manuales = await loop.run_in_executor(None, self._procesar_microlote, conn, validador, lote)
+                ahora = datetime.now()
+                self.latencias.extend((ahora - pd.to_datetime(lote['timestamp_inicio'])).dt.total_seconds())
+                self.stats['lotes'] += 1
+                self.stats['validadas'] += len(lote)
+                self.stats['manuales'] += manuales
+                self.cola_manual += manuales
+            except Exception as e:
+                # Las transacciones del lote siguen sin validación y se reintentan
+                self.stats['errores'] += 1
+                desde = int(lote['transaction_id'].min()) - 1
+                self.reintentar_desde = desde if self.reintentar_desde is None else min(self.reintentar_desde, desde)
+                print(f" Error validando micro-lote: {e}")
+            finally:
+                self.en_proceso.difference_update(lote['transaction_id'].tolist())
+                self.cola.task_done()
+
+    # --- REPORTE ---
+
+    def reportar(self):
+        latencias = np.array(self.latencias)
+        p95 = np.percentile(latencias, 95) if len(latencias) else 0.0
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] "
+              f"validadas={self.stats['validadas']:,} manuales={self.stats['manuales']:,} "
+              f"lotes={self.stats['lotes']:,} errores={self.stats['errores']} "
+              f"cola_manual={self.cola_manual:,} pausas={self.stats['pausas_backpressure']} "
+              f"latencia_p95={p95:.2f}s")
+
+    async def _reportar_periodicamente(self):
+        while not self.detener.is_set():
+            try:
+                await asyncio.wait_for(self.detener.wait(), timeout=INTERVALO_REPORTE)
+            except asyncio.TimeoutError:
+                self.reportar()
+
+    # --- CICLO DE VIDA ---
+
+    async def ejecutar(self, duracion=None):
+        loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=MAX_LOTES_EN_COLA)
+        self.aviso = asyncio.Event()
+        self.detener = asyncio.Event()
+
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(senal, self.detener.set)
+        if self.usar_listen:
+            self._escuchar(loop)
+        if duracion:
+            loop.call_later(duracion, self.detener.set)
+
+        workers = [
+            asyncio.create_task(self.worker(conn, validador))
+            for conn, validador in zip(self.conexiones_workers, self.validadores)
+        ]
+        productor = asyncio.create_task(self.productor())
+        reporte = asyncio.create_task(self._reportar_periodicamente())
+
+        await self.detener.wait()
+        print("\nDeteniendo servicio, terminando micro-lotes en curso...")
+        productor.cancel()
+        await asyncio.gather(productor, return_exceptions=True)
+        await self.cola.join()
+        for tarea in workers + [reporte]:
+            tarea.cancel()
+        await asyncio.gather(*workers, reporte, return_exceptions=True)
+
+        if self.conn_listen is not None:
+            loop.remove_reader(self.conn_listen.fileno())
+        self.reportar()
+
+    def cerrar(self):
+        for conn in [self.conn_lectura, self.conn_listen, self.gestor_reglas.conn] + self.conexiones_workers:
+            if conn is not None:
+                conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Servicio de validación automática en línea')
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS)
+    parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+    parser.add_argument('--sin-listen', action='store_true', help='Solo consultar cada INTERVALO_POLL segundos')
+    parser.add_argument('--duracion', type=float, help='Detener tras N segundos')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - SERVICIO DE VALIDACIÓN")
+    print("="*80)
+    print(f"Workers: {args.workers} | Micro-lote: {args.tamano_lote} | "
+          f"{'Poll' if args.sin_listen else 'LISTEN ' + CANAL_NOTIFICACIONES} | "
+          f"Límite cola manual: {LIMITE_COLA_MANUAL}")
+
+    servicio = ServicioValidacion(args.workers, args.tamano_lote, usar_listen=not args.sin_listen)
+    try:
+        asyncio.run(servicio.ejecutar(args.duracion))
+    finally:
+        servicio.cerrar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+CRYPTOOPS ANALYZER - Simulador de capacidad para hora pico
+Simulación de eventos discretos del procesamiento de transacciones
+
+Reproduce las llegadas reales (timestamp_inicio, resolución de segundos)
+de la franja 18-23h contra dos etapas en serie, cada una con un pool de
+workers y cola FIFO:
+
+    1. Validación: manual (tiempo_validacion_manual) para las transacciones
+       que la requieren; en el escenario optimizado las que aprueba el
+       validador automático usan tiempo_validacion_auto.
+    2. Procesamiento: latencia del método de pago, muestreada de la
+       distribución observada de tiempo_procesamiento por método.
+
+Reporta largo de cola, percentiles de espera y utilización por etapa, y
+guarda la reducción de tiempo simulada para los scripts 06-08.
+
+Uso:
+    python scripts/simulador_capacidad.py
+    python scripts/simulador_capacidad.py --workers-validacion 4 --workers-procesamiento 6
+"""
+
+import os
+import json
+import heapq
+import argparse
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+from acceso_datos import cargar_transacciones
+from reglas_validacion import GestorReglas
+
+HORAS_PICO = (18, 23)
+WORKERS_VALIDACION = int(os.getenv('WORKERS_VALIDACION', '3'))
+WORKERS_PROCESAMIENTO = int(os.getenv('WORKERS_PROCESAMIENTO', '3'))
+SEED = 42
+
+RUTA_RESULTADO = 'data/processed/simulacion_capacidad.json'
+
+# Valores usados por 07/08 si todavía no se ejecutó la simulación
+REDUCCION_TIEMPO_DEFAULT = 0.227
+
+# ============================================
+# MOTOR DE SIMULACIÓN
+# ============================================
+
+def simular_etapa(llegadas, servicios, workers):
+    """
+    Cola FIFO con `workers` servidores (eventos de llegada y fin de servicio)
+
+    llegadas debe estar ordenado. Devuelve (inicio, fin) por transacción.
+    """
+    libres = [0.0] * workers  # heap con el instante en que se libera cada worker
+    inicio = np.empty(len(llegadas))
+    fin = np.empty(len(llegadas))
+
+    for i, (llegada, servicio) in enumerate(zip(llegadas, servicios)):
+        disponible = heapq.heappop(libres)
+        inicio[i] = max(llegada, disponible)
+        fin[i] = inicio[i] + servicio
+        heapq.heappush(libres, fin[i])
+
+    return inicio, fin
+
+def largo_cola_en_llegadas(llegadas, inicios):
+    """Transacciones esperando (sin empezar) que ve cada llegada"""
+    llegadas_ordenadas = np.sort(llegadas)
+    inicios_ordenados = np.sort(inicios)
+    llegadas_previas = np.searchsorted(llegadas_ordenadas, llegadas, side='left')
+    iniciadas = np.searchsorted(inicios_ordenados, llegadas, side='right')
+    return np.maximum(llegadas_previas - iniciadas, 0)
+
+def _simular_con_cola(llegadas, servicios, workers):
+    """Simula solo las transacciones que pasan por la etapa (servicio > 0)"""
+    pasan = servicios > 0
+    inicio = llegadas.copy()
+    fin = llegadas.copy()
+    resumen = {'espera': np.array([]), 'cola': np.array([]), 'ocupado': 0.0, 'atendidas': 0}
+
+    if pasan.any():
+        orden = np.flatnonzero(pasan)[np.argsort(llegadas[pasan], kind='stable')]
+        inicio_etapa, fin_etapa = simular_etapa(llegadas[orden], servicios[orden], workers)
+        inicio[orden] = inicio_etapa
+        fin[orden] = fin_etapa
+        resumen = {
+            'espera': inicio_etapa - llegadas[orden],
+            'cola': largo_cola_en_llegadas(llegadas[orden], inicio_etapa),
+            'ocupado': float(servicios[orden].sum()),
+            'atendidas': len(orden)
+        }
+
+    return inicio, fin, resumen
+
+# ============================================
+# ESCENARIOS
+# ============================================
+
+def preparar_llegadas(df, horas=HORAS_PICO):
+    """Filtra la franja pico y expresa las llegadas en segundos desde la primera"""
+    ts = pd.to_datetime(df['timestamp_inicio'])
+    pico = df[ts.dt.hour.between(*horas)].copy()
+    ts = pd.to_datetime(pico['timestamp_inicio']).dt.floor('s')
+    pico['llegada'] = (ts - ts.min()).dt.total_seconds().to_numpy()
+    pico['dia'] = ts.dt.date
+    return pico.sort_values('llegada', kind='stable').reset_index(drop=True)
+
+def latencias_por_metodo(df):
+    """Tiempos observados sin validación manual, por método de pago"""
+    base = df[(df['requiere_validacion_manual'] != True) & df['tiempo_procesamiento'].notna()]
+    return {
+        metodo: grupo.to_numpy(dtype=float)
+        for metodo, grupo in base.groupby('metodo_pago', observed=True)['tiempo_procesamiento']
+    }
+
+def muestrear_latencias(metodos, latencias, seed=SEED):
+    """Latencia de procesamiento por transacción (muestreo de la distribución de su método)"""
+    rng = np.random.default_rng(seed)
+    todas = np.concatenate(list(latencias.values())) if latencias else np.array([60.0])
+    resultado = np.empty(len(metodos))
+    for metodo in pd.unique(metodos):
+        mascara = metodos == metodo
+        muestra = latencias.get(metodo, todas)
+        resultado[mascara] = rng.choice(muestra, size=mascara.sum())
+    return resultado
+
+def simular_escenario(llegadas, servicio_validacion, servicio_procesamiento,
+                      workers_validacion=WORKERS_VALIDACION,
+                      workers_procesamiento=WORKERS_PROCESAMIENTO):
+    """Simula validación -> procesamiento y devuelve métricas del escenario"""
+    t_llegada = llegadas['llegada'].to_numpy(dtype=float)
+
+    _, fin_validacion, val = _simular_con_cola(t_llegada, servicio_validacion, workers_validacion)
+    _, fin_procesamiento, proc = _simular_con_cola(fin_validacion, servicio_procesamiento, workers_procesamiento)
+
+    tiempo_total = fin_procesamiento - t_llegada
+    horizonte = llegadas['dia'].nunique() * (HORAS_PICO[1] - HORAS_PICO[0] + 1) * 3600
+
+    def _percentil(valores, q):
+        return float(np.percentile(valores, q)) if len(valores) else 0.0
+
+    return {
+        'transacciones': len(llegadas),
+        'tiempo_total_medio': float(tiempo_total.mean()) if len(tiempo_total) else 0.0,
+        'tiempo_total_p95': _percentil(tiempo_total, 95),
+        'espera_validacion_p50': _percentil(val['espera'], 50),
+        'espera_validacion_p95': _percentil(val['espera'], 95),
+        'espera_validacion_p99': _percentil(val['espera'], 99),
+        'espera_procesamiento_p50': _percentil(proc['espera'], 50),
+        'espera_procesamiento_p95': _percentil(proc['espera'], 95),
+        'espera_procesamiento_p99': _percentil(proc['espera'], 99),
+        'cola_validacion_media': float(val['cola'].mean()) if len(val['cola']) else 0.0,
+        'cola_validacion_max': int(val['cola'].max()) if len(val['cola']) else 0,
+        'cola_procesamiento_media': float(proc['cola'].mean()) if len(proc['cola']) else 0.0,
+        'cola_procesamiento_max': int(proc['cola'].max()) if len(proc['cola']) else 0,
+        'utilizacion_validacion': val['ocupado'] / (horizonte * workers_validacion) if horizonte else 0.0,
+        'utilizacion_procesamiento': proc['ocupado'] / (horizonte * workers_procesamiento) if horizonte else 0.0
+    }
+
+def comparar_escenarios(df, aprobadas_auto, plan,
+                        workers_validacion=WORKERS_VALIDACION,
+                        workers_procesamiento=WORKERS_PROCESAMIENTO, seed=SEED):
+    """
+    Simula el escenario actual y el optimizado sobre las mismas llegadas
+
+    aprobadas_auto: Serie booleana (índice de df) con las transacciones que
+    el validador automático aprueba. Ambos escenarios usan las mismas
+    latencias muestreadas, así la diferencia se debe solo a la validación.
+    """
+    df = df.assign(_aprobada_auto=aprobadas_auto.reindex(df.index).fillna(False).astype(bool))
+    llegadas = preparar_llegadas(df)
+    latencias = muestrear_latencias(llegadas['metodo_pago'].astype(str).to_numpy(), latencias_por_metodo(df), seed)
+
+    manual = (llegadas['requiere_validacion_manual'] == True).to_numpy()
+    auto = manual & llegadas['_aprobada_auto'].to_numpy()
+
+    servicio_actual = np.where(manual, plan.tiempo_validacion_manual, 0.0)
+    servicio_optimizado = np.where(
+        auto, plan.tiempo_validacion_auto, np.where(manual, plan.tiempo_validacion_manual, 0.0)
+    )
+
+    resultados = {
+        'actual': simular_escenario(llegadas, servicio_actual, latencias, workers_validacion, workers_procesamiento),
+        'optimizado': simular_escenario(llegadas, servicio_optimizado, latencias, workers_validacion, workers_procesamiento)
+    }
+
+    medio_actual = resultados['actual']['tiempo_total_medio']
+    reduccion = 1 - resultados['optimizado']['tiempo_total_medio'] / medio_actual if medio_actual else 0.0
+
+    return pd.DataFrame(resultados), reduccion
+
+def mostrar_resultados(resumen, reduccion, workers_validacion, workers_procesamiento):
+    """Imprime la comparación de escenarios"""
+    print("\n" + "="*80)
+    print(f"SIMULACIÓN DE CAPACIDAD HORA PICO ({HORAS_PICO[0]}-{HORAS_PICO[1]}h)")
+    print("="*80)
+    print(f"Workers: {workers_validacion} validación, {workers_procesamiento} procesamiento")
+    print("\n")
+    print(tabulate(resumen.round(2), headers=['Métrica', 'Actual', 'Optimizado'], tablefmt='grid'))
+    print(f"\n REDUCCIÓN DE TIEMPO TOTAL (simulada): {reduccion*100:.1f}%")
+
+def guardar_resultado(resumen, reduccion, workers_validacion, workers_procesamiento, ruta=RUTA_RESULTADO):
+    """Guarda el resultado para que 06-08 usen la reducción simulada"""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'w') as f:
+        json.dump({
+            'reduccion_tiempo': reduccion,
+            'workers_validacion': workers_validacion,
+            'workers_procesamiento': workers_procesamiento,
+            'escenarios': resumen.to_dict()
+        }, f, indent=2)
+
+def cargar_reduccion_simulada(ruta=RUTA_RESULTADO, default=REDUCCION_TIEMPO_DEFAULT):
+    """Reducción de tiempo de la última simulación (o el valor por defecto)"""
+    try:
+        with open(ruta) as f:
+            return float(json.load(f)['reduccion_tiempo'])
+    except (OSError, KeyError, ValueError):
+        return default
+
+def ejecutar_simulacion(df, aprobadas_auto, plan, workers_validacion=WORKERS_VALIDACION,
+                        workers_procesamiento=WORKERS_PROCESAMIENTO):
+    """Compara escenarios, muestra y guarda el resultado; devuelve la reducción"""
+    resumen, reduccion = comparar_escenarios(
+        df, aprobadas_auto, plan, workers_validacion, workers_procesamiento
+    )
+    mostrar_resultados(resumen, reduccion, workers_validacion, workers_procesamiento)
+    guardar_resultado(resumen, reduccion, workers_validacion, workers_procesamiento)
+    print(f" Resultado guardado: {RUTA_RESULTADO}")
+    return resumen, reduccion
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulador de capacidad de hora pico')
+    parser.add_argument('--workers-validacion', type=int, default=WORKERS_VALIDACION)
+    parser.add_argument('--workers-procesamiento', type=int, default=WORKERS_PROCESAMIENTO)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("CRYPTOOPS ANALYZER - SIMULADOR DE CAPACIDAD")
+    print("="*80)
+
+    print("\nCargando transacciones...")
+    df = cargar_transacciones(
+        columnas=[
+            'transaction_id', 'timestamp_inicio', 'metodo_pago', 'tiempo_procesamiento',
+            'requiere_validacion_manual', 'monto_usd', 'score_fraude'
+        ],
+        estados=['exitosa', 'fallida'],
+        columnas_usuario=['nivel_verificacion']
+    )
+    print(f" {len(df):,} transacciones cargadas")
+
+    plan = GestorReglas().plan()
+    aprobadas_auto = pd.Series(plan.evaluar_lote(df) == 0, index=df.index)
+
+    ejecutar_simulacion(df, aprobadas_auto, plan, args.workers_validacion, args.workers_procesamiento)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+CRYPTOOPS ANALYZER - Sketches de cuantiles combinables
+Percentiles de tiempo_procesamiento por día, semana o periodo sin leer transacciones
+
+Cada hora de metricas_operativas guarda en sketch_tiempo un sketch tipo
+DDSketch de sus tiempos de procesamiento: conteos por bucket logarítmico
+(índice k = ceil(log(x) / log(gamma)), gamma = (1 + alpha) / (1 - alpha)).
+Combinar horas es sumar conteos por índice, y cualquier cuantil de la
+combinación tiene error relativo de a lo sumo alpha (1%) respecto del
+valor observado en ese rango (sin la interpolación de pandas).
+
+Formato JSONB: {"alpha": 0.01, "ceros": n, "indices": [...], "conteos": [...]}
+(los valores <= 0 se cuentan en "ceros"). El SQL incremental de
+metricas_incrementales.py usa la misma fórmula de índice.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+ALPHA = 0.01
+CUANTILES_ROLLUP = (0.5, 0.95, 0.99)
+NIVELES_ROLLUP = ('dia', 'semana', 'hora', 'periodo')
+
+def gamma_sketch(alpha=ALPHA):
+    return (1 + alpha) / (1 - alpha)
+
+def indices_sketch(valores, alpha=ALPHA):
+    """Índice de bucket de cada valor (> 0); los demás quedan en -1"""
+    valores = np.asarray(valores, dtype=float)
+    indices = np.full(len(valores), -1, dtype=np.int64)
+    positivos = valores > 0
+    indices[positivos] = np.ceil(np.log(valores[positivos]) / np.log(gamma_sketch(alpha)))
+    return indices
+
+class SketchCuantiles:
+    """Sketch combinable: conteos por índice de bucket logarítmico"""
+
+    def __init__(self, alpha=ALPHA, conteos=None, ceros=0):
+        self.alpha = alpha
+        self.conteos = dict(conteos or {})
+        self.ceros = int(ceros)
+
+    @property
+    def total(self):
+        return self.ceros + sum(self.conteos.values())
+
+    def agregar(self, valores):
+        """Incorpora un array de valores (NaN se ignora)"""
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        indices = indices_sketch(valores, self.alpha)
+        self.ceros += int((indices < 0).sum())
+        unicos, conteos = np.unique(indices[indices >= 0], return_counts=True)
+        for indice, conteo in zip(unicos.tolist(), conteos.tolist()):
+            self.conteos[indice] = self.conteos.get(indice, 0) + conteo
+        return self
+
+    def fusionar(self, otro):
+        """Suma los conteos de otro sketch (mismo alpha)"""
+        if otro.alpha != self.alpha:
+            raise ValueError(f"No se pueden combinar sketches con alpha {self.alpha} y {otro.alpha}")
+        self.ceros += otro.ceros
+        for indice, conteo in otro.conteos.items():
+            self.conteos[indice] = self.conteos.get(indice, 0) + conteo
+        return self
+
+    def cuantil(self, q):
+        """Cuantil q (0-1); NaN si el sketch está vacío"""
+        total = self.total
+        if total == 0:
+            return np.nan
+        rango = q * (total - 1)
+        if rango < self.ceros:
+            return 0.0
+        indices = sorted(self.conteos)
+        acumulado = np.cumsum([self.conteos[i] for i in indices]) + self.ceros
+        k = indices[int(np.searchsorted(acumulado, rango, side='right'))]
+        gamma = gamma_sketch(self.alpha)
+        return 2 * gamma ** k / (gamma + 1)
+
+    def a_dict(self):
+        indices = sorted(self.conteos)
+        return {
+            'alpha': self.alpha,
+            'ceros': self.ceros,
+            'indices': indices,
+            'conteos': [self.conteos[i] for i in indices]
+        }
+
+    def a_json(self):
+        return json.dumps(self.a_dict(), separators=(',', ':'))
+
+    @classmethod
+    def desde_serializado(cls, valor):
+        """Crea el sketch desde el JSONB (dict) o su texto; None/NaN -> sketch vacío"""
+        if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+            return cls()
+        datos = json.loads(valor) if isinstance(valor, (str, bytes)) else valor
+        return cls(
+            alpha=datos.get('alpha', ALPHA),
+            conteos=dict(zip(datos.get('indices', []), datos.get('conteos', []))),
+            ceros=datos.get('ceros', 0)
+        )
+
+# ============================================
+# CONSTRUCCIÓN VECTORIZADA
+# ============================================
+
+def sketches_por_grupo(grupos, valores, alpha=ALPHA):
+    """
+    Sketch (JSON) por grupo, en una sola pasada
+
+    grupos: Serie con la clave de cada fila (por ejemplo, la hora truncada)
+    valores: Serie alineada con los valores (NaN se ignora)
+    """
+    valores = pd.Series(np.asarray(valores, dtype=float), index=grupos.index)
+    validos = valores.notna()
+    conteos = pd.DataFrame({
+        'grupo': grupos[validos].to_numpy(),
+        'indice': indices_sketch(valores[validos].to_numpy(), alpha)
+    }).groupby(['grupo', 'indice'], sort=True).size()
+
+    resultado = {}
+    for grupo, serie in conteos.groupby(level='grupo', sort=False):
+        indices = serie.index.get_level_values('indice').to_numpy()
+        cuentas = serie.to_numpy()
+        positivos = indices >= 0
+        resultado[grupo] = json.dumps({
+            'alpha': alpha,
+            'ceros': int(cuentas[~positivos].sum()),
+            'indices': indices[positivos].tolist(),
+            'conteos': cuentas[positivos].tolist()
+        }, separators=(',', ':'))
+    return pd.Series(resultado, dtype=object)
+
+def sketches_desde_histograma(histograma, alpha=ALPHA):
+    """
+    Sketch (JSON) por fila de un histograma de valores enteros
+    (columna j = cantidad de veces que se observó el valor j)
+    """
+    indices = indices_sketch(np.arange(histograma.shape[1]), alpha)
+    ceros = histograma[:, indices < 0].sum(axis=1)
+    positivos = np.flatnonzero(indices >= 0)
+    unicos, posicion = np.unique(indices[positivos], return_inverse=True)
+
+    # Suma las columnas del histograma que caen en el mismo bucket
+    por_bucket = np.zeros((histograma.shape[0], len(unicos)), dtype=np.int64)
+    np.add.at(por_bucket.T, posicion, histograma[:, positivos].T)
+
+    sketches = []
+    for fila, cero in zip(por_bucket, ceros):
+        con_datos = fila > 0
+        sketches.append(json.dumps({
+            'alpha': alpha,
+            'ceros': int(cero),
+            'indices': unicos[con_datos].tolist(),
+            'conteos': fila[con_datos].tolist()
+        }, separators=(',', ':')))
+    return sketches
+
+# ============================================
+# ROLLUP
+# ============================================
+
+def _clave_rollup(df_metricas, nivel):
+    if nivel == 'dia':
+        return pd.to_datetime(df_metricas['fecha'])
+    if nivel == 'semana':
+        return pd.to_datetime(df_metricas['fecha']).dt.to_period('W').dt.start_time
+    if nivel == 'hora':
+        return df_metricas['hora'].astype(int)
+    if nivel == 'periodo':
+        return df_metricas['hora'].astype(int).between(18, 23).map({True: 'Hora Pico', False: 'Hora Normal'})
+    raise ValueError(f"Nivel de rollup no soportado: {nivel} (opciones: {', '.join(NIVELES_ROLLUP)})")
+
+def combinar_sketches(serializados):
+    """Combina sketches serializados en uno solo"""
+    sketch = SketchCuantiles()
+    for valor in serializados:
+        sketch.fusionar(SketchCuantiles.desde_serializado(valor))
+    return sketch
+
+def rollup_metricas(df_metricas, nivel='dia', cuantiles=CUANTILES_ROLLUP):
+    """
+    Agrega métricas horarias por día, semana, hora del día o periodo
+
+    Los cuantiles salen de combinar los sketch_tiempo de las horas del
+    grupo; el promedio se pondera por la cantidad de tiempos de cada hora.
+    Devuelve una fila por grupo con num_transacciones, tiempo_promedio y
+    tiempo_p<q> para cada cuantil.
+    """
+    clave = _clave_rollup(df_metricas, nivel)
+    sketches = df_metricas['sketch_tiempo'].map(SketchCuantiles.desde_serializado)
+    filas = []
+    for grupo, metricas in df_metricas.groupby(clave, sort=True):
+        sketch = SketchCuantiles()
+        for parcial in sketches[metricas.index]:
+            sketch.fusionar(parcial)
+        pesos = sketches[metricas.index].map(lambda parcial: parcial.total)
+        promedio = metricas['tiempo_promedio_procesamiento'].astype(float)
+        fila = {
+            nivel: grupo,
+            'num_transacciones': int(metricas['num_transacciones'].sum()),
+            'tiempo_promedio': (promedio * pesos).sum() / pesos.sum() if pesos.sum() else np.nan
+        }
+        for q in cuantiles:
+            fila[f'tiempo_p{q * 100:g}'] = sketch.cuantil(q)
+        filas.append(fila)
+    return pd.DataFrame(filas)
@@ -5,6 +5,7 @@ Verifica que todas las tablas, índices y constraints estén creados correctamen
 
 import psycopg2
 import os
+from datetime import date
 from dotenv import load_dotenv
 from psycopg2.extras import DictCursor
 from tabulate import tabulate
@@ -24,7 +25,8 @@ EXPECTED_TABLES = {
     "metricas_operativas",
     "validaciones",
     "logs_sistema",
-    "configuracion_sistema"
+    "configuracion_sistema",
+    "cargas_transacciones"
 }
 
 EXPECTED_VIEWS = {
@@ -33,9 +35,16 @@ EXPECTED_VIEWS = {
     "vista_resumen_usuarios"
 }
 
+# Vista materializada -> índice único (requerido por REFRESH ... CONCURRENTLY)
+EXPECTED_MATVIEWS = {
+    "mv_resumen_usuarios": "idx_mv_resumen_usuarios_user_id",
+    "mv_top_criptos": "idx_mv_top_criptos_cripto"
+}
+
 EXPECTED_TRIGGERS = {
     "trigger_actualizar_tiempo_procesamiento",
-    "trigger_actualizar_estadisticas_usuario"
+    "trigger_actualizar_estadisticas_usuario",
+    "trigger_notificar_transacciones_pendientes"
 }
 
 EXPECTED_INDEXES = {
@@ -43,7 +52,8 @@ EXPECTED_INDEXES = {
         "idx_usuarios_pais",
         "idx_usuarios_nivel_verificacion",
         "idx_usuarios_estado_cuenta",
-        "idx_usuarios_fecha_registro"
+        "idx_usuarios_fecha_registro",
+        "idx_usuarios_updated_at"
     },
     "transacciones": {
         "idx_transacciones_user_id",
@@ -51,7 +61,8 @@ EXPECTED_INDEXES = {
         "idx_transacciones_estado",
         "idx_transacciones_tipo_operacion",
         "idx_transacciones_cripto",
-        "idx_transacciones_metodo_pago"
+        "idx_transacciones_metodo_pago",
+        "idx_transacciones_updated_at"
     }
 }
 
@@ -62,6 +73,12 @@ EXPECTED_FKS = {
     ("logs_sistema", "user_id", "usuarios")
 }
 
+# Con el schema particionado (sql/03_schema_particionado.sql) estas FKs no existen
+FKS_A_TRANSACCIONES = {fk for fk in EXPECTED_FKS if fk[2] == "transacciones"}
+
+PARTICION_DEFAULT = "transacciones_default"
+MESES_PARTICIONES_FUTURAS = 1  # meses después del actual que ya deben tener partición
+
 def print_section(title):
     print("\n" + "=" * 80)
     print(title)
@@ -88,6 +105,44 @@ def main():
     tables_ok = EXPECTED_TABLES.issubset(tables)
     print("Esperadas:", EXPECTED_TABLES)
 
+    # --- PARTICIONES ---
+    print_section("VERIFICACIÓN DE PARTICIONES")
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('transacciones')")
+    particionada = (cur.fetchone() or [None])[0] == "p"
+    partitions_ok = True
+
+    if not particionada:
+        print("transacciones sin particionar (sql/03_schema_particionado.sql no aplicado)")
+    else:
+        cur.execute("""
+            SELECT c.relname AS particion,
+                   pg_get_expr(c.relpartbound, c.oid) AS rango,
+                   c.reltuples::bigint AS filas
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'transacciones'::regclass
+            ORDER BY c.relname
+        """)
+        particiones = {r["particion"]: r for r in cur.fetchall()}
+        print(f"Encontradas: {len(particiones)}")
+
+        if PARTICION_DEFAULT not in particiones:
+            print(f" FALTA partición default {PARTICION_DEFAULT}")
+            partitions_ok = False
+        else:
+            cur.execute(f"SELECT COUNT(*) FROM {PARTICION_DEFAULT}")
+            en_default = cur.fetchone()[0]
+            if en_default:
+                print(f" {en_default:,} filas en {PARTICION_DEFAULT}: crear sus meses con scripts/gestor_particiones.py --desde")
+
+        hoy = date.today()
+        for i in range(MESES_PARTICIONES_FUTURAS + 1):
+            total = hoy.year * 12 + hoy.month - 1 + i
+            nombre = f"transacciones_p{total // 12:04d}_{total % 12 + 1:02d}"
+            if nombre not in particiones:
+                print(f" FALTA partición {nombre}: ejecutar scripts/gestor_particiones.py")
+                partitions_ok = False
+
     # --- VISTAS ---
     print_section("VERIFICACIÓN DE VISTAS")
     cur.execute("""
@@ -99,6 +154,37 @@ def main():
     print("Encontradas:", views)
     views_ok = EXPECTED_VIEWS.issubset(views)
 
+    # --- VISTAS MATERIALIZADAS ---
+    print_section("VERIFICACIÓN DE VISTAS MATERIALIZADAS")
+    cur.execute("""
+        SELECT m.matviewname, m.ispopulated, i.indexname
+        FROM pg_matviews m
+        LEFT JOIN pg_indexes i
+            ON i.schemaname = m.schemaname
+            AND i.tablename = m.matviewname
+            AND i.indexdef LIKE 'CREATE UNIQUE INDEX%'
+        WHERE m.schemaname='public'
+    """)
+    matviews = {}
+    for r in cur.fetchall():
+        info = matviews.setdefault(r["matviewname"], {"poblada": r["ispopulated"], "unicos": set()})
+        if r["indexname"]:
+            info["unicos"].add(r["indexname"])
+    print("Encontradas:", set(matviews))
+
+    matviews_ok = True
+    for vista, indice in EXPECTED_MATVIEWS.items():
+        info = matviews.get(vista)
+        if info is None:
+            print(f" FALTA vista materializada {vista}")
+            matviews_ok = False
+        elif indice not in info["unicos"]:
+            print(f" FALTA índice único {indice} en {vista} (necesario para REFRESH CONCURRENTLY)")
+            matviews_ok = False
+        elif not info["poblada"]:
+            print(f" {vista} sin datos: ejecutar scripts/refrescar_vistas.py --bloqueante")
+            matviews_ok = False
+
     # --- TRIGGERS ---
     print_section("VERIFICACIÓN DE TRIGGERS")
     cur.execute("""
@@ -145,7 +231,8 @@ def main():
     """)
     fks = {(r["table_name"], r["column_name"], r["foreign_table"]) for r in cur.fetchall()}
     print("Encontradas:", fks)
-    fks_ok = EXPECTED_FKS.issubset(fks)
+    fks_esperadas = EXPECTED_FKS - FKS_A_TRANSACCIONES if particionada else EXPECTED_FKS
+    fks_ok = fks_esperadas.issubset(fks)
 
     # --- TEST DE INSERCIÓN ---
     print_section("TEST DE INSERCIÓN")
@@ -183,7 +270,9 @@ def main():
 
     checks = {
         "Tablas": tables_ok,
+        "Particiones": partitions_ok,
         "Vistas": views_ok,
+        "Vistas materializadas": matviews_ok,
         "Triggers": triggers_ok,
         "Índices": indexes_ok,
         "Foreign Keys": fks_ok,
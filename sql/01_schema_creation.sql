@@ -1,5 +1,8 @@
 -- Eliminar tablas si existen (para desarrollo)
+DROP MATERIALIZED VIEW IF EXISTS mv_top_criptos;
+DROP MATERIALIZED VIEW IF EXISTS mv_resumen_usuarios;
 DROP TABLE IF EXISTS logs_sistema CASCADE;
+DROP TABLE IF EXISTS cargas_transacciones CASCADE;
 DROP TABLE IF EXISTS validaciones CASCADE;
 DROP TABLE IF EXISTS metricas_operativas CASCADE;
 DROP TABLE IF EXISTS transacciones CASCADE;
@@ -33,6 +36,7 @@ CREATE INDEX idx_usuarios_pais ON usuarios(pais);
 CREATE INDEX idx_usuarios_nivel_verificacion ON usuarios(nivel_verificacion);
 CREATE INDEX idx_usuarios_estado_cuenta ON usuarios(estado_cuenta);
 CREATE INDEX idx_usuarios_fecha_registro ON usuarios(fecha_registro);
+CREATE INDEX idx_usuarios_updated_at ON usuarios(updated_at);
 
 -- ============================================
 -- TABLA: transacciones
@@ -97,6 +101,7 @@ CREATE INDEX idx_transacciones_tipo_operacion ON transacciones(tipo_operacion);
 CREATE INDEX idx_transacciones_cripto ON transacciones(cripto);
 CREATE INDEX idx_transacciones_metodo_pago ON transacciones(metodo_pago);
 CREATE INDEX idx_transacciones_tiempo_procesamiento ON transacciones(tiempo_procesamiento);
+CREATE INDEX idx_transacciones_updated_at ON transacciones(updated_at); -- watermark del cache de consultas
 CREATE INDEX idx_transacciones_flagged_fraude ON transacciones(flagged_fraude) WHERE flagged_fraude = TRUE;
 
 -- Índice compuesto para análisis por hora
@@ -143,7 +148,11 @@ CREATE TABLE metricas_operativas (
     num_swaps INT DEFAULT 0,
     num_retiros INT DEFAULT 0,
     
+    -- Sketch combinable de tiempos de procesamiento (rollups por día/semana)
+    sketch_tiempo JSONB,
+    
     created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(), -- lo renuevan los upserts de metricas_incrementales.py
     
     -- Constraint único: una fila por fecha-hora
     CONSTRAINT unique_fecha_hora UNIQUE (fecha, hora)
@@ -153,6 +162,7 @@ CREATE TABLE metricas_operativas (
 CREATE INDEX idx_metricas_fecha ON metricas_operativas(fecha);
 CREATE INDEX idx_metricas_hora ON metricas_operativas(hora);
 CREATE INDEX idx_metricas_fecha_hora ON metricas_operativas(fecha, hora);
+CREATE INDEX idx_metricas_updated_at ON metricas_operativas(updated_at); -- watermark del cache de consultas
 
 -- ============================================
 -- TABLA: validaciones
@@ -188,6 +198,19 @@ CREATE INDEX idx_validaciones_tipo ON validaciones(tipo_validacion);
 CREATE INDEX idx_validaciones_resultado ON validaciones(resultado);
 CREATE INDEX idx_validaciones_timestamp ON validaciones(timestamp_validacion);
 
+-- ============================================
+-- TABLA: cargas_transacciones
+-- Control de cargas paralelas: particiones completadas por lote
+-- ============================================
+
+CREATE TABLE cargas_transacciones (
+    lote_id VARCHAR(64) NOT NULL,
+    particion INT NOT NULL,
+    filas INT NOT NULL,
+    completada_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (lote_id, particion)
+);
+
 -- ============================================
 -- TABLA: logs_sistema
 -- Registro de eventos y errores del sistema
@@ -219,7 +242,7 @@ CREATE INDEX idx_logs_nivel ON logs_sistema(nivel);
 CREATE INDEX idx_logs_componente ON logs_sistema(componente);
 CREATE INDEX idx_logs_transaction_id ON logs_sistema(transaction_id) WHERE transaction_id IS NOT NULL;
 
-- ============================================
+-- ============================================
 -- VISTAS ÚTILES
 -- ============================================
 
@@ -268,6 +291,66 @@ WHERE timestamp_inicio >= NOW() - INTERVAL '30 days'
 GROUP BY cripto
 ORDER BY volumen_total_usd DESC;
 
+-- ============================================
+-- VISTAS MATERIALIZADAS
+-- Versiones precalculadas de vista_resumen_usuarios y vista_top_criptos.
+-- Se refrescan con scripts/refrescar_vistas.py (REFRESH ... CONCURRENTLY,
+-- que requiere un índice único); las lecturas son búsquedas por índice.
+-- ============================================
+
+-- Resumen por usuario: agrega transacciones por user_id antes del join
+CREATE MATERIALIZED VIEW mv_resumen_usuarios AS
+WITH por_usuario AS (
+    SELECT 
+        user_id,
+        COUNT(*) as total_transacciones,
+        COUNT(*) FILTER (WHERE estado = 'exitosa') as transacciones_exitosas,
+        COUNT(*) FILTER (WHERE estado = 'fallida') as transacciones_fallidas,
+        SUM(monto_usd) FILTER (WHERE estado = 'exitosa') as volumen_total_usd,
+        AVG(tiempo_procesamiento) FILTER (WHERE estado = 'exitosa') as tiempo_promedio_procesamiento,
+        MAX(timestamp_inicio) as fecha_ultima_transaccion
+    FROM transacciones
+    GROUP BY user_id
+)
+SELECT 
+    u.user_id,
+    u.username,
+    u.email,
+    u.pais,
+    u.nivel_verificacion,
+    u.estado_cuenta,
+    u.fecha_registro,
+    COALESCE(p.total_transacciones, 0) as total_transacciones,
+    COALESCE(p.transacciones_exitosas, 0) as transacciones_exitosas,
+    COALESCE(p.transacciones_fallidas, 0) as transacciones_fallidas,
+    COALESCE(p.volumen_total_usd, 0) as volumen_total_usd,
+    p.tiempo_promedio_procesamiento,
+    p.fecha_ultima_transaccion
+FROM usuarios u
+LEFT JOIN por_usuario p ON p.user_id = u.user_id
+WITH DATA;
+
+CREATE UNIQUE INDEX idx_mv_resumen_usuarios_user_id ON mv_resumen_usuarios(user_id);
+CREATE INDEX idx_mv_resumen_usuarios_pais ON mv_resumen_usuarios(pais);
+CREATE INDEX idx_mv_resumen_usuarios_volumen ON mv_resumen_usuarios(volumen_total_usd DESC);
+
+-- Top criptomonedas: ventana de 30 días fijada al momento del refresco
+CREATE MATERIALIZED VIEW mv_top_criptos AS
+SELECT 
+    cripto,
+    COUNT(*) as num_transacciones,
+    SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_total_usd,
+    AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END) as tiempo_promedio_seg,
+    COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*) as tasa_error_pct,
+    NOW() as actualizado_en
+FROM transacciones
+WHERE timestamp_inicio >= NOW() - INTERVAL '30 days'
+GROUP BY cripto
+WITH DATA;
+
+CREATE UNIQUE INDEX idx_mv_top_criptos_cripto ON mv_top_criptos(cripto);
+CREATE INDEX idx_mv_top_criptos_volumen ON mv_top_criptos(volumen_total_usd DESC);
+
 -- ============================================
 -- FUNCIONES ÚTILES
 -- ============================================
@@ -291,29 +374,56 @@ CREATE TRIGGER trigger_actualizar_tiempo_procesamiento
     EXECUTE FUNCTION actualizar_tiempo_procesamiento();
 
 -- Función: Actualizar estadísticas de usuario
+-- Trigger por sentencia con tablas de transición: las transacciones que
+-- pasan a 'exitosa' se agregan por user_id y se hace un UPDATE de usuarios
+-- por sentencia (en lugar de uno por fila)
 CREATE OR REPLACE FUNCTION actualizar_estadisticas_usuario()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF NEW.estado = 'exitosa' AND (OLD.estado IS NULL OR OLD.estado != 'exitosa') THEN
-        UPDATE usuarios 
-        SET 
-            total_transacciones = total_transacciones + 1,
-            volumen_total_usd = volumen_total_usd + NEW.monto_usd,
-            fecha_ultima_transaccion = NEW.timestamp_completado,
-            updated_at = NOW()
-        WHERE user_id = NEW.user_id;
-    END IF;
+    UPDATE usuarios u
+    SET 
+        total_transacciones = u.total_transacciones + d.num_exitosas,
+        volumen_total_usd = u.volumen_total_usd + d.volumen_usd,
+        fecha_ultima_transaccion = d.ultima_completada,
+        updated_at = NOW()
+    FROM (
+        SELECT 
+            n.user_id,
+            COUNT(*) as num_exitosas,
+            SUM(n.monto_usd) as volumen_usd,
+            MAX(n.timestamp_completado) as ultima_completada
+        FROM nuevas n
+        JOIN anteriores o ON o.transaction_id = n.transaction_id
+        WHERE n.estado = 'exitosa' AND o.estado IS DISTINCT FROM 'exitosa'
+        GROUP BY n.user_id
+    ) d
+    WHERE u.user_id = d.user_id;
     
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trigger_actualizar_estadisticas_usuario
     AFTER UPDATE ON transacciones
-    FOR EACH ROW
-    WHEN (NEW.estado = 'exitosa')
+    REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT
     EXECUTE FUNCTION actualizar_estadisticas_usuario();
 
+-- Función: Avisar al servicio de validación que hay transacciones nuevas
+-- (una notificación por sentencia; el servicio lee las pendientes en lote)
+CREATE OR REPLACE FUNCTION notificar_transacciones_pendientes()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('transacciones_pendientes', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_notificar_transacciones_pendientes
+    AFTER INSERT ON transacciones
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_transacciones_pendientes();
+
 -- ============================================
 -- DATOS DE CONFIGURACIÓN INICIAL
 -- ============================================
@@ -353,10 +463,13 @@ COMMENT ON TABLE transacciones IS 'Registro completo de todas las transacciones
 COMMENT ON TABLE metricas_operativas IS 'Métricas agregadas por hora para análisis de performance';
 COMMENT ON TABLE validaciones IS 'Histórico de validaciones automáticas y manuales';
 COMMENT ON TABLE logs_sistema IS 'Registro de eventos y errores del sistema';
+COMMENT ON MATERIALIZED VIEW mv_resumen_usuarios IS 'vista_resumen_usuarios precalculada; refrescar con scripts/refrescar_vistas.py';
+COMMENT ON MATERIALIZED VIEW mv_top_criptos IS 'vista_top_criptos precalculada (últimos 30 días al momento del refresco)';
 
 COMMENT ON COLUMN transacciones.tiempo_procesamiento IS 'Tiempo en segundos desde inicio hasta completado';
 COMMENT ON COLUMN transacciones.score_fraude IS 'Score de 0-100 donde >75 es sospechoso';
 COMMENT ON COLUMN metricas_operativas.tiempo_p95_procesamiento IS 'Percentil 95 de tiempos de procesamiento';
+COMMENT ON COLUMN metricas_operativas.sketch_tiempo IS 'Sketch de cuantiles (conteos por bucket logarítmico, alpha 1%) para combinar horas';
 
 -- ============================================
 -- FINALIZACIÓN
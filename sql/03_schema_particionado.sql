@@ -0,0 +1,300 @@
+-- ============================================
+-- CRYPTOOPS ANALYZER - transacciones particionada por mes
+-- Variante del schema de 01_schema_creation.sql (ejecutar después de 01)
+--
+-- Convierte transacciones en una tabla particionada por RANGE sobre
+-- timestamp_inicio, con una partición por mes (transacciones_pAAAA_MM) y
+-- una partición default para filas fuera de rango. Las consultas acotadas
+-- por fecha (última hora, últimos 30 días, >= '2024-07-01') leen solo las
+-- particiones del rango, y los meses viejos se separan con DETACH
+-- (scripts/gestor_particiones.py) sin DELETE masivo.
+--
+-- Las filas existentes se migran. Cambios respecto de 01:
+--   - PK (transaction_id, timestamp_inicio): la clave de partición debe
+--     formar parte de la PK; transaction_id sigue saliendo de la secuencia
+--   - validaciones y logs_sistema dejan de tener FK a transacciones (una FK
+--     necesitaría la PK completa, con timestamp_inicio)
+-- ============================================
+
+BEGIN;
+
+-- Objetos que dependen de transacciones (se recrean al final)
+DROP MATERIALIZED VIEW IF EXISTS mv_top_criptos;
+DROP MATERIALIZED VIEW IF EXISTS mv_resumen_usuarios;
+DROP VIEW IF EXISTS vista_resumen_usuarios;
+DROP VIEW IF EXISTS vista_metricas_tiempo_real;
+DROP VIEW IF EXISTS vista_top_criptos;
+
+ALTER TABLE validaciones DROP CONSTRAINT IF EXISTS validaciones_transaction_id_fkey;
+ALTER TABLE logs_sistema DROP CONSTRAINT IF EXISTS logs_sistema_transaction_id_fkey;
+
+ALTER TABLE transacciones RENAME TO transacciones_sin_particionar;
+
+-- Los índices y la PK conservan su nombre al renombrar la tabla: se liberan
+-- para la tabla nueva (la vieja solo se lee para migrar y después se borra)
+DO $$
+DECLARE
+    indice RECORD;
+BEGIN
+    FOR indice IN
+        SELECT i.indexrelid::regclass AS nombre, c.conname
+        FROM pg_index i
+        LEFT JOIN pg_constraint c ON c.conindid = i.indexrelid AND c.conrelid = i.indrelid
+        WHERE i.indrelid = 'transacciones_sin_particionar'::regclass
+    LOOP
+        IF indice.conname IS NULL THEN
+            EXECUTE format('DROP INDEX %s', indice.nombre);
+        ELSE
+            EXECUTE format(
+                'ALTER TABLE transacciones_sin_particionar RENAME CONSTRAINT %I TO %I',
+                indice.conname, left(indice.conname, 46) || '_sin_particionar'
+            );
+        END IF;
+    END LOOP;
+END $$;
+
+-- ============================================
+-- TABLA PARTICIONADA
+-- ============================================
+
+CREATE TABLE transacciones (
+    LIKE transacciones_sin_particionar INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS,
+    PRIMARY KEY (transaction_id, timestamp_inicio),
+    FOREIGN KEY (user_id) REFERENCES usuarios(user_id) ON DELETE CASCADE
+) PARTITION BY RANGE (timestamp_inicio);
+
+-- La secuencia de transaction_id pasa a la tabla nueva (si no, se borraría con la vieja)
+ALTER SEQUENCE transacciones_transaction_id_seq OWNED BY transacciones.transaction_id;
+
+CREATE TABLE transacciones_default PARTITION OF transacciones DEFAULT;
+
+-- Índices (se crean en cada partición, actual y futura)
+CREATE INDEX idx_transacciones_user_id ON transacciones(user_id);
+CREATE INDEX idx_transacciones_timestamp_inicio ON transacciones(timestamp_inicio);
+CREATE INDEX idx_transacciones_estado ON transacciones(estado);
+CREATE INDEX idx_transacciones_tipo_operacion ON transacciones(tipo_operacion);
+CREATE INDEX idx_transacciones_cripto ON transacciones(cripto);
+CREATE INDEX idx_transacciones_metodo_pago ON transacciones(metodo_pago);
+CREATE INDEX idx_transacciones_tiempo_procesamiento ON transacciones(tiempo_procesamiento);
+CREATE INDEX idx_transacciones_updated_at ON transacciones(updated_at);
+CREATE INDEX idx_transacciones_flagged_fraude ON transacciones(flagged_fraude) WHERE flagged_fraude = TRUE;
+CREATE INDEX idx_transacciones_hora_estado ON transacciones(
+    EXTRACT(HOUR FROM timestamp_inicio),
+    estado
+);
+
+-- ============================================
+-- FUNCIÓN: crear la partición de un mes
+-- ============================================
+
+-- Crea transacciones_pAAAA_MM para el mes de la fecha dada. Si la partición
+-- default tiene filas de ese mes, las mueve a la partición nueva (si no,
+-- PostgreSQL rechaza la creación). Devuelve el nombre, o NULL si ya existía.
+CREATE OR REPLACE FUNCTION crear_particion_transacciones(mes DATE)
+RETURNS TEXT AS $$
+DECLARE
+    desde TIMESTAMP := date_trunc('month', mes);
+    hasta TIMESTAMP := date_trunc('month', mes) + INTERVAL '1 month';
+    nombre TEXT := 'transacciones_p' || to_char(mes, 'YYYY_MM');
+    columnas TEXT;
+BEGIN
+    IF to_regclass(nombre) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM transacciones_default
+        WHERE timestamp_inicio >= desde AND timestamp_inicio < hasta
+    ) THEN
+        -- Columnas no generadas (p. ej. hora de 04_perfil_indices_tiempo.sql se recalcula)
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum)
+        INTO columnas
+        FROM pg_attribute
+        WHERE attrelid = 'transacciones'::regclass
+        AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE transacciones INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)',
+            nombre
+        );
+        EXECUTE format(
+            'WITH movidas AS (
+                DELETE FROM transacciones_default
+                WHERE timestamp_inicio >= %L AND timestamp_inicio < %L
+                RETURNING *
+            )
+            INSERT INTO %I (%s) SELECT %s FROM movidas', desde, hasta, nombre, columnas, columnas
+        );
+        EXECUTE format(
+            'ALTER TABLE transacciones ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            nombre, desde, hasta
+        );
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF transacciones FOR VALUES FROM (%L) TO (%L)',
+            nombre, desde, hasta
+        );
+    END IF;
+
+    RETURN nombre;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Particiones desde el primer mes con datos (o el actual) hasta 3 meses adelante
+DO $$
+DECLARE
+    mes DATE;
+BEGIN
+    SELECT date_trunc('month', COALESCE(MIN(timestamp_inicio), NOW()))::date
+    INTO mes
+    FROM transacciones_sin_particionar;
+
+    WHILE mes <= date_trunc('month', NOW() + INTERVAL '3 months') LOOP
+        PERFORM crear_particion_transacciones(mes);
+        mes := mes + INTERVAL '1 month';
+    END LOOP;
+END $$;
+
+-- Migración de datos y reemplazo de la tabla vieja
+INSERT INTO transacciones SELECT * FROM transacciones_sin_particionar;
+DROP TABLE transacciones_sin_particionar;
+
+-- ============================================
+-- TRIGGERS (mismas funciones que en 01)
+-- ============================================
+
+CREATE TRIGGER trigger_actualizar_tiempo_procesamiento
+    BEFORE UPDATE ON transacciones
+    FOR EACH ROW
+    EXECUTE FUNCTION actualizar_tiempo_procesamiento();
+
+CREATE TRIGGER trigger_actualizar_estadisticas_usuario
+    AFTER UPDATE ON transacciones
+    REFERENCING OLD TABLE AS anteriores NEW TABLE AS nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_usuario();
+
+CREATE TRIGGER trigger_notificar_transacciones_pendientes
+    AFTER INSERT ON transacciones
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_transacciones_pendientes();
+
+-- ============================================
+-- VISTAS (mismas definiciones que en 01)
+-- ============================================
+
+CREATE OR REPLACE VIEW vista_resumen_usuarios AS
+SELECT
+    u.user_id,
+    u.username,
+    u.email,
+    u.pais,
+    u.nivel_verificacion,
+    u.estado_cuenta,
+    u.fecha_registro,
+    COUNT(t.transaction_id) as total_transacciones,
+    COUNT(CASE WHEN t.estado = 'exitosa' THEN 1 END) as transacciones_exitosas,
+    COUNT(CASE WHEN t.estado = 'fallida' THEN 1 END) as transacciones_fallidas,
+    SUM(CASE WHEN t.estado = 'exitosa' THEN t.monto_usd ELSE 0 END) as volumen_total_usd,
+    AVG(CASE WHEN t.estado = 'exitosa' THEN t.tiempo_procesamiento END) as tiempo_promedio_procesamiento,
+    MAX(t.timestamp_inicio) as fecha_ultima_transaccion
+FROM usuarios u
+LEFT JOIN transacciones t ON u.user_id = t.user_id
+GROUP BY u.user_id, u.username, u.email, u.pais, u.nivel_verificacion, u.estado_cuenta, u.fecha_registro;
+
+CREATE OR REPLACE VIEW vista_metricas_tiempo_real AS
+SELECT
+    COUNT(*) as transacciones_ultima_hora,
+    COUNT(CASE WHEN estado = 'exitosa' THEN 1 END) as exitosas,
+    COUNT(CASE WHEN estado = 'fallida' THEN 1 END) as fallidas,
+    AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END) as tiempo_promedio,
+    SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_usd,
+    COUNT(DISTINCT user_id) as usuarios_activos
+FROM transacciones
+WHERE timestamp_inicio >= NOW() - INTERVAL '1 hour';
+
+CREATE OR REPLACE VIEW vista_top_criptos AS
+SELECT
+    cripto,
+    COUNT(*) as num_transacciones,
+    SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_total_usd,
+    AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END) as tiempo_promedio_seg,
+    COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*) as tasa_error_pct
+FROM transacciones
+WHERE timestamp_inicio >= NOW() - INTERVAL '30 days'
+GROUP BY cripto
+ORDER BY volumen_total_usd DESC;
+
+CREATE MATERIALIZED VIEW mv_resumen_usuarios AS
+WITH por_usuario AS (
+    SELECT
+        user_id,
+        COUNT(*) as total_transacciones,
+        COUNT(*) FILTER (WHERE estado = 'exitosa') as transacciones_exitosas,
+        COUNT(*) FILTER (WHERE estado = 'fallida') as transacciones_fallidas,
+        SUM(monto_usd) FILTER (WHERE estado = 'exitosa') as volumen_total_usd,
+        AVG(tiempo_procesamiento) FILTER (WHERE estado = 'exitosa') as tiempo_promedio_procesamiento,
+        MAX(timestamp_inicio) as fecha_ultima_transaccion
+    FROM transacciones
+    GROUP BY user_id
+)
+SELECT
+    u.user_id,
+    u.username,
+    u.email,
+    u.pais,
+    u.nivel_verificacion,
+    u.estado_cuenta,
+    u.fecha_registro,
+    COALESCE(p.total_transacciones, 0) as total_transacciones,
+    COALESCE(p.transacciones_exitosas, 0) as transacciones_exitosas,
+    COALESCE(p.transacciones_fallidas, 0) as transacciones_fallidas,
+    COALESCE(p.volumen_total_usd, 0) as volumen_total_usd,
+    p.tiempo_promedio_procesamiento,
+    p.fecha_ultima_transaccion
+FROM usuarios u
+LEFT JOIN por_usuario p ON p.user_id = u.user_id
+WITH DATA;
+
+CREATE UNIQUE INDEX idx_mv_resumen_usuarios_user_id ON mv_resumen_usuarios(user_id);
+CREATE INDEX idx_mv_resumen_usuarios_pais ON mv_resumen_usuarios(pais);
+CREATE INDEX idx_mv_resumen_usuarios_volumen ON mv_resumen_usuarios(volumen_total_usd DESC);
+
+CREATE MATERIALIZED VIEW mv_top_criptos AS
+SELECT
+    cripto,
+    COUNT(*) as num_transacciones,
+    SUM(CASE WHEN estado = 'exitosa' THEN monto_usd ELSE 0 END) as volumen_total_usd,
+    AVG(CASE WHEN estado = 'exitosa' THEN tiempo_procesamiento END) as tiempo_promedio_seg,
+    COUNT(CASE WHEN estado = 'fallida' THEN 1 END) * 100.0 / COUNT(*) as tasa_error_pct,
+    NOW() as actualizado_en
+FROM transacciones
+WHERE timestamp_inicio >= NOW() - INTERVAL '30 days'
+GROUP BY cripto
+WITH DATA;
+
+CREATE UNIQUE INDEX idx_mv_top_criptos_cripto ON mv_top_criptos(cripto);
+CREATE INDEX idx_mv_top_criptos_volumen ON mv_top_criptos(volumen_total_usd DESC);
+
+-- ============================================
+-- PERMISOS Y COMENTARIOS
+-- ============================================
+
+GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO cryptoops_user;
+GRANT EXECUTE ON ALL FUNCTIONS IN SCHEMA public TO cryptoops_user;
+
+COMMENT ON TABLE transacciones IS 'Registro completo de todas las transacciones crypto (particionada por mes de timestamp_inicio)';
+COMMENT ON TABLE transacciones_default IS 'Filas fuera de las particiones mensuales; crear_particion_transacciones las mueve';
+COMMENT ON MATERIALIZED VIEW mv_resumen_usuarios IS 'vista_resumen_usuarios precalculada; refrescar con scripts/refrescar_vistas.py';
+COMMENT ON MATERIALIZED VIEW mv_top_criptos IS 'vista_top_criptos precalculada (últimos 30 días al momento del refresco)';
+
+COMMIT;
+
+-- Resumen de particiones creadas
+SELECT
+    c.relname as particion,
+    pg_get_expr(c.relpartbound, c.oid) as rango
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'transacciones'::regclass
+ORDER BY c.relname;
@@ -0,0 +1,29 @@
+-- ============================================
+-- CRYPTOOPS ANALYZER - Perfil de índices para consultas por tiempo
+-- Opcional: ejecutar después de 01 (y de 03 si se usa el schema particionado)
+--
+-- Agrega a transacciones:
+--   - hora: columna generada (STORED) con la hora de timestamp_inicio, para
+--     agrupar por hora sin recalcular EXTRACT en cada fila
+--   - BRIN sobre timestamp_inicio: filtros por rango de fechas con un
+--     índice de pocas páginas (las filas se insertan en orden de llegada)
+--   - (estado, hora) INCLUDE (tiempo_procesamiento): las consultas por hora
+--     de exitosas/fallidas se resuelven con index-only scan
+--
+-- Agregar la columna reescribe la tabla. Después de ejecutarlo correr
+-- VACUUM (ANALYZE) transacciones para que el index-only scan no tenga que
+-- visitar la tabla. scripts/benchmark_perfil_indices.py mide el efecto.
+-- ============================================
+
+ALTER TABLE transacciones ADD COLUMN IF NOT EXISTS hora SMALLINT
+    GENERATED ALWAYS AS (EXTRACT(HOUR FROM timestamp_inicio)::SMALLINT) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_transacciones_timestamp_brin
+    ON transacciones USING brin (timestamp_inicio) WITH (pages_per_range = 32);
+
+CREATE INDEX IF NOT EXISTS idx_transacciones_estado_hora_tiempo
+    ON transacciones (estado, hora) INCLUDE (tiempo_procesamiento);
+
+COMMENT ON COLUMN transacciones.hora IS 'Hora de timestamp_inicio (columna generada, perfil 04_perfil_indices_tiempo)';
+
+ANALYZE transacciones;
@@ -3,4 +3,4 @@
 
 -- ============================================
 
-TRUNCATE TABLE transacciones, metricas_operativas, usuarios RESTART IDENTITY CASCADE;
\ No newline at end of file
+TRUNCATE TABLE transacciones, metricas_operativas, usuarios, cargas_transacciones RESTART IDENTITY CASCADE;
\ No newline at end of file